@@ -1,11 +1,34 @@
+import importlib
 import streamlit as st
-import views.mobile
-import views.desktop
-import views.compare
-import views.stats
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import profiler
+
+LAST_RERUN_KEY = "_profiler_last"
 
 st.set_page_config(page_title="Poker Trainer", layout="wide", initial_sidebar_state="collapsed")
 
+def _session_profiling():
+    # Переключатель в сайдбаре включает профайлер своей сессии; поток sync - вне рерана
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None: return None
+    return ctx.session_id, bool(st.session_state.get("profiler_on", False))
+
+profiler.set_session_gate(_session_profiling)
+
+def show_profiler_panel():
+    # Данные предыдущего рерана этой сессии: текущий ещё не закончился
+    with st.expander("🛠 Латентность", expanded=True):
+        last = st.session_state.get(LAST_RERUN_KEY)
+        if last:
+            st.caption("Последний реран, мс")
+            st.dataframe([{"фаза": e["name"], "мс": e["ms"]} for e in last], hide_index=True, use_container_width=True)
+        rows = profiler.summary()
+        if rows:
+            st.caption(f"Все замеры сессий с профайлером (последние {profiler.SAMPLE_SIZE} на имя)")
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        if st.button("Сбросить замеры"): profiler.reset()
+        st.caption(f"JSONL: {profiler.METRICS_PATH}")
+
 def main():
     with st.sidebar:
         st.title("Poker Trainer")
@@ -16,15 +39,25 @@ def main():
         if app_mode == "🎮 Trainer":
             view_type = st.radio("View Mode", ["Mobile", "Desktop"], index=0)
 
-    if app_mode == "🔬 Range Lab":
-        views.compare.show()
-    elif app_mode == "📊 Statistics":
-        views.stats.show()
-    else:
-        if view_type == "Mobile":
-            views.mobile.show()
-        else:
-            views.desktop.show()
+        st.markdown("---")
+        # Переключатель читается до рерана (start_rerun), поэтому замеры идут с этого же рерана
+        st.toggle("Профайлер", key="profiler_on",
+                  help="Фазы рерана - только этой сессии; запросы к Sheets фонового потока пишутся, "
+                       "пока открыта хоть одна сессия с профайлером. На весь процесс - TRAINER_PROFILE=1")
+        if profiler.enabled(): show_profiler_panel()
+
+    # Вью импортируем только выбранную: статистика тянет pandas, тренажёру он не нужен
+    if app_mode == "🔬 Range Lab": view = "compare"
+    elif app_mode == "📊 Statistics": view = "stats"
+    else: view = "mobile" if view_type == "Mobile" else "desktop"
+    with profiler.phase(f"import.views.{view}"):
+        module = importlib.import_module(f"views.{view}")
+    module.show()
 
 if __name__ == "__main__":
-    main()
+    profiler.start_rerun()
+    try:
+        main()
+    finally:
+        events = profiler.end_rerun()
+        if events is not None: st.session_state[LAST_RERUN_KEY] = events
@@ -0,0 +1,191 @@
+"""Режим пачки: раздачи проверяются в браузере, на сервер - один ответ на пачку.
+
+В обычном режиме каждый клик - это реран: ответ уходит на сервер, назад приходит
+HTML следующего стола. Здесь движок заранее разыгрывает BATCH_SIZE раздач с
+ключом ответа (RNG-ролл и верное действие), компонент сам показывает стол,
+проверяет ответ, раскрывает рендж и собирает оценку. В конце пачки (или по
+кнопке "Сохранить") приходит одно событие results = {id, items: [{i, action,
+rating, ts}]}; сервер перепроверяет ответы по своей копии пачки и пишет
+историю и SRS через utils.ingest_batch.
+
+Рендж для разбора - два вектора uint8 (raise и call, 0..100) в порядке клеток
+матрицы 13x13, base64: 2 * 228 байт на спот пачки вместо готового HTML сетки.
+"""
+import base64
+import time
+import numpy as np
+import streamlit as st
+import engine
+import profiler
+import range_algebra
+import utils
+from ranges import MATRIX_INDEX
+
+BATCH_SIZE = engine.BATCH_SIZE
+KEY = "m_batch"
+STATE_KEY = "_batch"
+_MATRIX_INDEX = np.asarray(MATRIX_INDEX, np.intp)
+
+_HTML = '<div class="bd-root"></div>'
+
+_CSS = """
+.bd-root { width: 100%; }
+.bd-head { display: flex; justify-content: space-between; align-items: center; color: #888; font-size: 12px; margin-bottom: 26px; font-family: monospace; }
+.bd-head button { background: none; border: 1px solid #555; color: #aaa; border-radius: 8px; padding: 2px 10px; font-size: 12px; }
+.bd-controls { display: flex; gap: 8px; margin-top: 30px; width: 100%; }
+.bd-controls button { flex: 1; min-width: 0; height: 65px; font-weight: 800; font-size: 18px; border-radius: 12px; border: none; text-transform: uppercase; cursor: pointer; }
+.bd-fold { background: #495057; color: #adb5bd; border: 1px solid #6c757d !important; }
+.bd-call { background: #28a745; color: white; box-shadow: 0 4px 0 #1e7e34; }
+.bd-raise { background: #d63384; color: white; box-shadow: 0 4px 0 #a02561; }
+.bd-open-raise { background: #2e7d32; color: white; box-shadow: 0 4px 0 #1b5e20; }
+.bd-controls .bd-rate { height: 50px; font-size: 13px; background: #343a40; color: #aaa; border: 1px solid #555; }
+.bd-msg { margin-top: 30px; padding: 12px 16px; border-radius: 8px; font-size: 15px; }
+.bd-ok { background: rgba(33, 195, 84, 0.15); color: #3dd56d; }
+.bd-err { background: rgba(255, 43, 43, 0.15); color: #ff4b4b; }
+.bd-range summary { cursor: pointer; color: #aaa; font-size: 14px; margin: 8px 0; }
+.bd-grid { display: grid; grid-template-columns: repeat(13, 1fr); gap: 1px; background: #111; padding: 1px; border: 1px solid #444; }
+.bd-cell { aspect-ratio: 1; display: flex; justify-content: center; align-items: center; font-size: 7px; color: #fff; }
+.bd-empty { color: #495057; }
+.bd-target { border: 1.5px solid #ffc107; z-index: 10; box-shadow: 0 0 4px #ffc107; }
+.bd-wait { text-align: center; color: #888; padding: 40px 0; }
+"""
+
+_JS = """
+const RANKS = "AKQJT98765432";
+const CELLS = [];
+for (let i = 0; i < 13; i++)
+  for (let j = 0; j < 13; j++)
+    CELLS.push(i === j ? RANKS[i] + RANKS[j] : i < j ? RANKS[i] + RANKS[j] + "s" : RANKS[j] + RANKS[i] + "o");
+
+function bytes(b64) {
+  const s = atob(b64);
+  const out = new Uint8Array(s.length);
+  for (let i = 0; i < s.length; i++) out[i] = s.charCodeAt(i);
+  return out;
+}
+
+function matrix(spot, hand) {
+  // Те же цвета, что у utils.render_range_matrix: raise слева, call следом, остаток - фолд
+  if (!spot.r) { spot.r = bytes(spot.raise); spot.c = bytes(spot.call); }
+  let html = '<div class="bd-grid">';
+  CELLS.forEach((h, k) => {
+    const rw = spot.r[k], cw = spot.c[k];
+    let bg, cls = "bd-cell";
+    if (!rw && !cw) { bg = "#2c3034"; cls += " bd-empty"; }
+    else if (rw >= 100) bg = "#d63384";
+    else if (cw >= 100) bg = "#28a745";
+    else bg = `linear-gradient(to right, #d63384 ${rw}%, #28a745 ${rw}% ${rw + cw}%, #2c3034 ${rw + cw}%)`;
+    if (h === hand) cls += " bd-target";
+    html += `<div class="${cls}" style="background:${bg}">${h}</div>`;
+  });
+  return html + "</div>";
+}
+
+function verdict(deal, action) {
+  if (action === deal.correct) return "✅ Correct";
+  return deal.defense ? `❌ Err! RNG ${deal.rng} -> ${deal.correct}` : "❌ Err";
+}
+
+export default function (component) {
+  const { data, setTriggerValue, parentElement } = component;
+  const root = parentElement.querySelector(".bd-root");
+  if (!root || !data) return;
+  // Реран с той же пачкой не сбрасывает прогресс
+  if (!root.bd || root.bd.id !== data.id) root.bd = { id: data.id, pos: 0, action: null, items: [], hits: 0, sent: false };
+  const st = root.bd;
+  const deals = data.deals;
+
+  function send() {
+    if (st.sent) return;
+    st.sent = true;
+    setTriggerValue("results", { id: st.id, items: st.items });
+    render();
+  }
+
+  function render() {
+    if (st.sent || st.pos >= deals.length) {
+      root.innerHTML = '<div class="bd-wait">Сохраняем пачку…</div>';
+      return;
+    }
+    const deal = deals[st.pos];
+    const spot = data.spots[deal.s];
+    let html = `<div class="bd-head"><span>${st.pos + 1}/${deals.length} · ✅ ${st.hits}</span>`;
+    if (st.items.length) html += '<button data-send="1">Сохранить</button>';
+    html += "</div>" + deal.html;
+    if (deal.defense) html += '<div class="rng-hint">📉 0..Freq → Action | 📈 Freq..100 → Fold</div>';
+    if (st.action === null) {
+      const acts = deal.defense
+        ? [["FOLD", "bd-fold"], ["CALL", "bd-call"], ["RAISE", "bd-raise"]]
+        : [["FOLD", "bd-fold"], ["RAISE", "bd-open-raise"]];
+      html += '<div class="bd-controls">' + acts.map(([a, cls]) => `<button class="${cls}" data-act="${a}">${a}</button>`).join("") + "</div>";
+    } else {
+      const ok = st.action === deal.correct;
+      html += `<div class="bd-msg ${ok ? "bd-ok" : "bd-err"}">${verdict(deal, st.action)}</div>`;
+      html += `<details class="bd-range"${ok ? "" : " open"}><summary>${ok ? "🔍 View" : "Show"} Range (${deal.correct})</summary>${matrix(spot, deal.hand)}</details>`;
+      html += '<div class="bd-controls">' + [["HARD", "hard"], ["NORM", "normal"], ["EASY", "easy"]]
+        .map(([label, r]) => `<button class="bd-rate" data-rate="${r}">${label}</button>`).join("") + "</div>";
+    }
+    root.innerHTML = html;
+  }
+
+  root.onclick = (e) => {
+    const btn = e.target.closest("button");
+    if (!btn || st.sent) return;
+    if (btn.dataset.send) return send();
+    if (btn.dataset.act && st.action === null) {
+      st.action = btn.dataset.act;
+      if (st.action === deals[st.pos].correct) st.hits++;
+    } else if (btn.dataset.rate && st.action !== null) {
+      st.items.push({ i: st.pos, action: st.action, rating: btn.dataset.rate, ts: Date.now() / 1000 });
+      st.pos++;
+      st.action = null;
+      if (st.pos >= deals.length) return send();
+    }
+    render();
+  };
+  render();
+}
+"""
+
+_component = st.components.v2.component("batch_drill", html=_HTML, css=_CSS, js=_JS, isolate_styles=False)
+
+def _b64(vec):
+    return base64.b64encode(vec.astype(np.uint8).tobytes()).decode("ascii")
+
+def spot_vectors(spot_data):
+    # Веса raise и call для матрицы разбора в порядке клеток
+    w = range_algebra.spot_actions(spot_data)
+    return _b64(np.rint(w["raise"])[_MATRIX_INDEX]), _b64(np.rint(w["call"])[_MATRIX_INDEX])
+
+def new_batch(eng, n=BATCH_SIZE):
+    with profiler.phase("batch.build"):
+        deals = eng.batch(n)
+        keys = list(dict.fromkeys(d["spot_key"] for d in deals))
+        slot = {k: i for i, k in enumerate(keys)}
+        spots = []
+        for k in keys:
+            w_raise, w_call = spot_vectors(eng.spot_data(k))
+            spots.append({"raise": w_raise, "call": w_call})
+        bid = f"{time.time_ns():x}"
+        data = {"id": bid, "spots": spots,
+                "deals": [{"s": slot[d["spot_key"]], "hand": d["hand"], "rng": d["rng"], "defense": d["defense"],
+                           "correct": d["correct"], "html": d["html"]} for d in deals]}
+    return {"id": bid, "pool": eng.pool, "issued": time.time(), "deals": deals, "data": data}
+
+def _on_results():
+    payload = st.session_state[KEY].get("results")
+    batch = st.session_state.get(STATE_KEY)
+    eng = st.session_state.get("_engine")
+    # Повтор события или ответ на старую пачку - игнорируем
+    if not isinstance(payload, dict) or batch is None or eng is None or payload.get("id") != batch["id"]: return
+    del st.session_state[STATE_KEY]
+    items = payload.get("items")
+    n, ok = utils.ingest_batch(eng, batch["deals"], items if isinstance(items, list) else [], batch["issued"])
+    if n: st.toast(f"Пачка сохранена: {n} решений, верно {ok}")
+
+def show(eng):
+    # Движок уже настроен вью: пул и рендерер стола (render_table мобильной версии)
+    batch = st.session_state.get(STATE_KEY)
+    if batch is None or batch["pool"] != eng.pool:
+        batch = st.session_state[STATE_KEY] = new_batch(eng)
+    _component(key=KEY, data=batch["data"], on_results_change=_on_results)
@@ -0,0 +1,302 @@
+"""Бенчмарки горячих путей на синтетической библиотеке ренджей.
+
+    python bench.py [--quick] [--spots N] [--history 100000,1000000,10000000]
+                    [--baseline bench_baseline.json] [--save-baseline] [--tolerance 0.25]
+
+Всё работает офлайн: споты, история и SRS генерируются во временную папку,
+Google Sheets подменяется fake_sheets. Результаты пишутся в JSON (--out);
+если есть базовый файл, любой замер медленнее базы больше чем на tolerance
+печатается как REGRESSION и процесс выходит с кодом 1.
+
+Время импорта модулей приложения меряется в отдельном процессе через
+python -X importtime: холодный старт контейнера - это в основном импорты.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import engine
+import fake_sheets
+import range_pack
+import ranges
+import scheduler
+import store
+import sync
+from ranges import ALL_HANDS
+
+SCENARIOS = ["Open Raise", "3bet", "BB def vs PFR", "Def vs 3bet"]
+POSITIONS = ["EP", "MP", "CO", "BTN", "SB", "BB"]
+SPOTS_PER_FILE = 100
+HISTORY_CHUNK = 200000
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMPORT_TARGETS = ("utils", "views.mobile", "views.desktop", "views.compare", "views.stats")
+HEAVY_DEPS = ("pandas", "gspread", "google.auth", "pyarrow")
+
+# --- ФИКСТУРЫ ---
+
+def gen_range(rng, density):
+    items = []
+    for h in ALL_HANDS:
+        if rng.random() >= density: continue
+        items.append(h if rng.random() < 0.7 else f"{h}:{rng.choice((0.25, 0.5, 0.75))}")
+    return ",".join(items)
+
+def gen_spot(rng, scenario):
+    hero, villain = rng.sample(POSITIONS, 2)
+    training = gen_range(rng, 0.3)
+    if scenario == "Open Raise":
+        return {"setup": {"hero_pos": hero, "villain_pos": None, "btn_pos": "BTN", "hero_bet": 2.5,
+                          "villain_bet": None, "is_3bet_pot": False},
+                "ranges": {"full": gen_range(rng, 0.25), "training": training}}
+    raise_key = "4bet" if scenario == "Def vs 3bet" else "3bet"
+    return {"setup": {"hero_pos": hero, "villain_pos": villain, "btn_pos": "BTN", "hero_bet": 2.5,
+                      "villain_bet": 7.5, "is_3bet_pot": scenario == "Def vs 3bet"},
+            "ranges": {raise_key: gen_range(rng, 0.08), "call": gen_range(rng, 0.15), "training": training}}
+
+def gen_spots_dir(path, n_spots, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    for f in range((n_spots + SPOTS_PER_FILE - 1) // SPOTS_PER_FILE):
+        scenario = SCENARIOS[f % len(SCENARIOS)]
+        count = min(SPOTS_PER_FILE, n_spots - f * SPOTS_PER_FILE)
+        spots = {f"{scenario} spot {f}-{i}": gen_spot(rng, scenario) for i in range(count)}
+        with open(os.path.join(path, f"synth_{f:04d}.json"), "w", encoding="utf-8") as fh:
+            json.dump({"source": f"Synth{f % 10}", "scenario": f"{scenario} {f}", "spots": spots}, fh)
+    return path
+
+def spot_keys(ranges_db):
+    return [f"{src}|{sc}|{sp}" for src, scs in ranges_db.items() for sc, sps in scs.items() for sp in sps]
+
+def gen_history(db, n_rows, spots, seed=0, days=365):
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=days)
+    step = days * 86400.0 / max(n_rows, 1)
+    done = 0
+    while done < n_rows:
+        chunk = []
+        for i in range(done, min(done + HISTORY_CHUNK, n_rows)):
+            ok = rng.random() < 0.7
+            chunk.append(((start + timedelta(seconds=i * step)).strftime("%Y-%m-%d %H:%M:%S"),
+                          rng.choice(spots), rng.choice(ALL_HANDS), str(int(ok)),
+                          rng.choice(("FOLD", "CALL", "RAISE"))))
+        db.import_history(chunk)
+        done += len(chunk)
+
+def gen_srs(db, keys, seed=0, now=None):
+    # Все 169 рук каждого спота: вес и, у трети карточек, состояние FSRS
+    rng = random.Random(seed)
+    now = time.time() if now is None else now
+    items = []
+    for sid in keys:
+        weights = [rng.choice((25, 50, 100, 150, 250, 625)) for _ in ALL_HANDS]
+        states = {i: scheduler.review(None, rng.choice(("hard", "normal", "easy")), now - rng.random() * 30 * scheduler.DAY)
+                  for i in range(len(ALL_HANDS)) if rng.random() < 0.33}
+        items.append((sid, weights, states))
+    db.merge_srs(items)
+
+# --- ЗАМЕРЫ ---
+
+def import_time(module):
+    # -> (микросекунды на импорт module, {все загруженные модули})
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    total, loaded = 0, set()
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line: continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        loaded.add(name)
+        if name == module: total = int(cumulative)
+    return total, loaded
+
+def measure(fn, number=1, repeat=5, setup=None):
+    # Время одной операции: медиана и минимум по repeat прогонам по number вызовов
+    times = []
+    for _ in range(repeat):
+        if setup is not None: setup()
+        t0 = time.perf_counter()
+        for _ in range(number): fn()
+        times.append((time.perf_counter() - t0) / number)
+    return {"per_op_s": statistics.median(times), "best_s": min(times), "ops": number * repeat}
+
+class Suite:
+    def __init__(self, workdir, quick=False):
+        self.workdir = workdir
+        self.quick = quick
+        self.results = {}
+
+    def record(self, name, res):
+        self.results[name] = res
+        print(f"  {name:<44} {res['per_op_s'] * 1e6:>14.1f} us/op  (best {res['best_s'] * 1e6:.1f})", flush=True)
+
+    def bench_imports(self):
+        # Каждая цель - в чистом интерпретаторе; время - cumulative из -X importtime
+        for mod in IMPORT_TARGETS:
+            times, heavy = [], []
+            for _ in range(1 if self.quick else 3):
+                us, loaded = import_time(mod)
+                times.append(us / 1e6); heavy = [d for d in HEAVY_DEPS if d in loaded]
+            self.record(f"import.{mod}", {"per_op_s": statistics.median(times), "best_s": min(times),
+                                          "ops": len(times), "heavy": heavy})
+            if heavy: print(f"    {mod} тянет: {', '.join(heavy)}")
+
+    def bench_ranges(self, pack):
+        rng = random.Random(1)
+        strings = list(pack.strings)
+        sample = [(rng.choice(ALL_HANDS), rng.choice(strings)) for _ in range(2000 if self.quick else 20000)]
+        distinct = strings[:500]
+
+        def cold():
+            ranges.set_packed_ranges({})
+            ranges._compile_range_cached.cache_clear()
+
+        self.record("get_weight.cold_compile", measure(
+            lambda: [ranges.get_weight("AKs", s) for s in distinct], setup=cold, repeat=3))
+        pack.activate()
+        self.record("get_weight.packed", measure(
+            lambda: [ranges.get_weight(h, s) for h, s in sample]))
+        self.record("parse_range_to_list", measure(
+            lambda: [ranges.parse_range_to_list(s) for s in distinct]))
+
+    def bench_render(self, pack):
+        import utils
+        db = pack.db
+        keys = spot_keys(db)[:200]
+        spots = [(k, db[k.split('|')[0]][k.split('|')[1]][k.split('|')[2]]) for k in keys]
+        self.record("render_range_matrix.cold", measure(
+            lambda: [utils.render_range_matrix(d, "AKs", k) for k, d in spots],
+            setup=utils._render_matrix_base.clear, repeat=3))
+        self.record("render_range_matrix.overlay", measure(
+            lambda: [utils.render_range_matrix(d, "72o", k) for k, d in spots]))
+
+    def bench_load(self, spots_dir):
+        pack_path = os.path.join(self.workdir, "bench.pack")
+
+        def drop():
+            if os.path.exists(pack_path): os.remove(pack_path)
+
+        self.record("load_ranges.cold_build", measure(
+            lambda: range_pack.load_pack(spots_dir, pack_path), setup=drop, repeat=2))
+        self.record("load_ranges.warm_open", measure(lambda: range_pack.load_pack(spots_dir, pack_path)))
+        first = sorted(os.listdir(spots_dir))[0]
+
+        def touch():
+            p = os.path.join(spots_dir, first)
+            st = os.stat(p)
+            os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+        self.record("load_ranges.one_file_changed", measure(
+            lambda: range_pack.load_pack(spots_dir, pack_path), setup=touch, repeat=3))
+        return range_pack.load_pack(spots_dir, pack_path)
+
+    def bench_engine(self, pack):
+        db = pack.db
+        keys = spot_keys(db)
+        storage = engine.MemoryStorage(history_maxlen=1000)
+        gen_srs(storage, [engine.srs_spot_id(k) for k in keys])
+        self.record(f"engine.configure[{len(keys)} spots]", measure(
+            lambda: engine.Engine(db, storage).configure(keys), repeat=3))
+        eng = engine.Engine(db, storage, rng=random.Random(2)).configure(keys)
+
+        def cycle():
+            d = eng.deal()
+            eng.grade(d["correct"] if eng.rng.random() < 0.7 else "FOLD")
+            eng.rate(eng.rng.choice(("hard", "normal", "easy")))
+        n = 2000 if self.quick else 20000
+        self.record("engine.deal_grade_rate", measure(cycle, number=n, repeat=3))
+
+        local = store.LocalStore(os.path.join(self.workdir, "engine.db"))
+        local.set_meta("srs_indexed", True)
+        sheets = fake_sheets.fake_worksheets()
+        leng = engine.Engine(db, local, rng=random.Random(3)).configure(keys[:500])
+
+        def lcycle():
+            d = leng.deal(); leng.grade(d["correct"]); leng.rate("normal")
+        self.record("engine.deal_grade_rate[sqlite]", measure(lcycle, number=200 if self.quick else 1000, repeat=3))
+
+        def batch():
+            sync.replicate_outbox(local, sheets)
+            for _ in range(sync.SYNC_BATCH_SIZE): lcycle()
+        self.record("sync.replicate_outbox", measure(lambda: sync.replicate_outbox(local, sheets), setup=batch))
+
+    def bench_stats(self, n_rows, keys):
+        path = os.path.join(self.workdir, f"history_{n_rows}.db")
+        db = store.LocalStore(path, replicate=False)
+        spots = [k.split('|')[2] for k in keys]
+        t0 = time.perf_counter()
+        gen_history(db, n_rows, spots)
+        print(f"  (история {n_rows} строк сгенерирована за {time.perf_counter() - t0:.1f}с)", flush=True)
+        since = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+        some = spots[:20]
+        self.record(f"stats.spot_stats.all[{n_rows}]", measure(lambda: db.spot_stats(), repeat=3))
+        self.record(f"stats.spot_stats.30d[{n_rows}]", measure(lambda: db.spot_stats(since), repeat=3))
+        self.record(f"stats.spot_stats.spots[{n_rows}]", measure(lambda: db.spot_stats(since, some), repeat=3))
+        self.record(f"stats.stats_spots[{n_rows}]", measure(db.stats_spots, repeat=3))
+        self.record(f"stats.history_log[{n_rows}]", measure(lambda: db.history_log(since, some, limit=1000), repeat=3))
+        db._conn.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix): os.remove(path + suffix)
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base: continue
+        ratio = res["per_op_s"] / base["per_op_s"] if base["per_op_s"] else 1.0
+        if ratio > 1.0 + tolerance: regressions.append((name, ratio))
+    return regressions
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--quick", action="store_true", help="маленькие фикстуры для быстрой проверки")
+    p.add_argument("--spots", type=int, default=None)
+    p.add_argument("--history", default=None, help="размеры истории через запятую")
+    p.add_argument("--out", default="bench_results.json")
+    p.add_argument("--baseline", default="bench_baseline.json")
+    p.add_argument("--save-baseline", action="store_true")
+    p.add_argument("--tolerance", type=float, default=0.25)
+    p.add_argument("--keep", action="store_true", help="не удалять временную папку с фикстурами")
+    args = p.parse_args(argv)
+
+    n_spots = args.spots or (1000 if args.quick else 10000)
+    sizes = [int(x) for x in (args.history or ("100000" if args.quick else "100000,1000000,10000000")).split(",")]
+    workdir = tempfile.mkdtemp(prefix="trainer-bench-")
+    suite = Suite(workdir, args.quick)
+    try:
+        suite.bench_imports()
+        print(f"Фикстуры: {n_spots} спотов, история {sizes} -> {workdir}", flush=True)
+        spots_dir = gen_spots_dir(os.path.join(workdir, "spots_data"), n_spots)
+        pack = suite.bench_load(spots_dir)
+        suite.bench_ranges(pack)
+        suite.bench_render(pack)
+        suite.bench_engine(pack)
+        for n in sizes: suite.bench_stats(n, spot_keys(pack.db))
+    finally:
+        if not args.keep: shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"meta": {"date": datetime.now().isoformat(timespec="seconds"), "python": sys.version.split()[0],
+                       "spots": n_spots, "history": sizes, "quick": args.quick},
+              "results": suite.results}
+    with open(args.out, "w", encoding="utf-8") as f: json.dump(report, f, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f: json.dump(report, f, indent=1)
+        print(f"Базовые значения сохранены в {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Нет {args.baseline} - сравнивать не с чем (запусти с --save-baseline)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)["results"]
+    regressions = compare(suite.results, baseline, args.tolerance)
+    for name, ratio in regressions:
+        print(f"REGRESSION {name}: x{ratio:.2f} медленнее базы (допуск {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
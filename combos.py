@@ -0,0 +1,157 @@
+"""Слой 1326 комбо: конкретные масти рук поверх 169 классов.
+
+Комбо одного класса лежат подряд в порядке ranges.ALL_HANDS (пара - 6, одномастная - 4,
+разномастная - 12), поэтому перевод в классы и обратно - одна операция NumPy:
+
+    to_classes(w)   - np.add.reduceat по отрезкам классов / число комбо (среднее);
+    from_classes(w) - w[..., COMBO_CLASS].
+
+ComboRange хранит, какие комбо перечислены, битсетом (166 байт) и веса 0..100
+массивом float64[1326]. compile_combos разбирает ту же нотацию, что и
+ranges.compile_range (конкретные комбо вида "AsKs" тоже), с тем же LRU-кэшем;
+рендж без конкретных комбо строится из скомпилированного 169-вектора.
+
+Горячий путь (раздача и проверка) слой 1326 обходит, если рендж задан только
+классами (CompiledRange.mixed ложно, флаг хранится в паке): combo_weight - вес
+класса из пака, sample_combo - равновероятная масть.
+"""
+import functools
+import numpy as np
+from ranges import (ALL_HANDS, HAND_INDEX, RANKS, SUITS, RANGE_CACHE_SIZE, combo_count,
+                    compile_range, tokenize_range)
+
+SUIT_SYMBOLS = {'s': '♠', 'h': '♥', 'd': '♦', 'c': '♣'}
+
+def _class_combos(hand):
+    r1, r2 = hand[0], hand[1]
+    if len(hand) == 2:
+        return [r1 + a + r2 + b for i, a in enumerate(SUITS) for b in SUITS[i + 1:]]
+    if hand[2] == 's': return [r1 + a + r2 + a for a in SUITS]
+    return [r1 + a + r2 + b for a in SUITS for b in SUITS if a != b]
+
+ALL_COMBOS = [c for h in ALL_HANDS for c in _class_combos(h)]
+COMBO_INDEX = {c: i for i, c in enumerate(ALL_COMBOS)}
+N_COMBOS = len(ALL_COMBOS)
+COMBO_CLASS = np.repeat(np.arange(len(ALL_HANDS)), [combo_count(h) for h in ALL_HANDS])
+CLASS_OFFSETS = np.concatenate(([0], np.cumsum([combo_count(h) for h in ALL_HANDS])))
+CLASS_COMBOS = np.diff(CLASS_OFFSETS).astype(np.float64)
+# Карты комбо - индексы 0..51 (ранг * 4 + масть): для блокеров и проверки пересечений
+_CARD = {r + s: i * 4 + j for i, r in enumerate(RANKS) for j, s in enumerate(SUITS)}
+COMBO_CARDS = np.array([(_CARD[c[:2]], _CARD[c[2:]]) for c in ALL_COMBOS], np.uint8)
+for _a in (COMBO_CLASS, CLASS_OFFSETS, CLASS_COMBOS, COMBO_CARDS): _a.flags.writeable = False
+# Списки для скалярного доступа на горячем пути (без numpy-скаляров)
+_COMBO_CLASS = COMBO_CLASS.tolist()
+_OFFSETS = CLASS_OFFSETS.tolist()
+
+# --- ПЕРЕВОД 169 <-> 1326 ---
+
+def to_classes(weights):
+    # [..., 1326] -> [..., 169]: вес класса - среднее по его комбо
+    w = np.asarray(weights, np.float64)
+    return np.add.reduceat(w, CLASS_OFFSETS[:-1], axis=-1) / CLASS_COMBOS
+
+def from_classes(weights):
+    # [..., 169] -> [..., 1326]: каждое комбо получает вес своего класса
+    return np.asarray(weights, np.float64)[..., COMBO_CLASS]
+
+def listed_classes(listed):
+    # Маска комбо -> маска классов: класс перечислен, если перечислено хоть одно его комбо
+    return np.logical_or.reduceat(np.asarray(listed, bool), CLASS_OFFSETS[:-1], axis=-1)
+
+# --- РЕНДЖ ПО КОМБО ---
+
+class ComboRange:
+    """Рендж по 1326 комбо: битсет перечисленных комбо + веса 0..100."""
+    __slots__ = ("bits", "weights", "uniform")
+
+    def __init__(self, listed, weights, uniform=False):
+        self.bits = np.packbits(np.asarray(listed, bool))
+        self.weights = weights
+        # uniform - внутри каждого класса веса комбо одинаковы (рендж задан классами)
+        self.uniform = uniform
+        self.bits.flags.writeable = False
+        self.weights.flags.writeable = False
+
+    @property
+    def listed(self):
+        return np.unpackbits(self.bits, count=N_COMBOS).astype(bool)
+
+    def __contains__(self, combo):
+        i = COMBO_INDEX.get(combo)
+        return i is not None and bool(self.bits[i >> 3] & (0x80 >> (i & 7)))
+
+    def weight(self, combo):
+        i = COMBO_INDEX.get(combo)
+        return float(self.weights[i]) if i is not None else 0.0
+
+    def class_weights(self):
+        return to_classes(self.weights)
+
+    def combos(self):
+        return [ALL_COMBOS[i] for i in np.flatnonzero(self.listed)]
+
+    def mixed_classes(self):
+        # Классы, где комбо играются по-разному (например, только пиковые)
+        if self.uniform: return np.zeros(len(ALL_HANDS), bool)
+        w = self.weights
+        lo = np.minimum.reduceat(w, CLASS_OFFSETS[:-1])
+        hi = np.maximum.reduceat(w, CLASS_OFFSETS[:-1])
+        return hi > lo
+
+def _from_compiled(cr):
+    return ComboRange(from_classes(cr.listed).astype(bool), from_classes(cr.weights), uniform=True)
+
+@functools.lru_cache(maxsize=RANGE_CACHE_SIZE)
+def _compile_combos_cached(range_str):
+    # Только для ренджей с конкретными комбо (mixed)
+    tokens = tokenize_range(range_str)
+    weights = np.zeros(N_COMBOS, np.float64)
+    listed = np.zeros(N_COMBOS, bool)
+    for hands, combo, weight in tokens:
+        if combo is not None:
+            i = COMBO_INDEX[combo]
+            if not listed[i]: weights[i] = weight; listed[i] = True
+            continue
+        for h in hands:
+            # Класс заполняет только ещё не упомянутые комбо
+            sl = slice(CLASS_OFFSETS[HAND_INDEX[h]], CLASS_OFFSETS[HAND_INDEX[h] + 1])
+            free = ~listed[sl]
+            weights[sl][free] = weight
+            listed[sl] = True
+    return ComboRange(listed, weights)
+
+_EMPTY = _from_compiled(compile_range(""))
+
+def compile_combos(range_str):
+    if not range_str or not isinstance(range_str, str): return _EMPTY
+    cr = compile_range(range_str)
+    # Рендж из классов - из 169-вектора (для спотов он уже в паке), без разбора и LRU
+    return _compile_combos_cached(range_str) if cr.mixed else _from_compiled(cr)
+
+def combo_weight(combo, range_str):
+    if not range_str or not isinstance(range_str, str): return 0.0
+    cr = compile_range(range_str)
+    if cr.mixed: return _compile_combos_cached(range_str).weight(combo)
+    i = COMBO_INDEX.get(combo)
+    return float(cr.weights[_COMBO_CLASS[i]]) if i is not None else 0.0
+
+# --- ВЫБОР КОМБО ---
+
+def sample_combo(rng, hand, range_str=None):
+    """Комбо класса hand пропорционально весам комбо в range_str (обычно тренировочный рендж).
+
+    Рендж, заданный классами, и класс с нулевыми весами - равновероятно, без слоя
+    1326; иначе searchsorted по накопленным весам отрезка класса.
+    """
+    h = HAND_INDEX[hand]
+    lo, hi = _OFFSETS[h], _OFFSETS[h + 1]
+    if range_str and isinstance(range_str, str) and compile_range(range_str).mixed:
+        cr = _compile_combos_cached(range_str)
+        cum = np.cumsum(cr.weights[lo:hi])
+        if cum[-1] > 0:
+            return ALL_COMBOS[lo + min(int(np.searchsorted(cum, rng.random() * cum[-1], side='right')), hi - lo - 1)]
+    return ALL_COMBOS[lo + int(rng.random() * (hi - lo))]
+
+def combo_suits(combo):
+    # "AhKd" -> ['♥', '♦'] для рендера карт
+    return [SUIT_SYMBOLS[combo[1]], SUIT_SYMBOLS[combo[3]]]
@@ -0,0 +1,320 @@
+"""Движок тренировки без Streamlit: раздача, проверка ответа и оценка SRS.
+
+Engine работает с любым хранилищем в духе store.LocalStore (таблица srs_pack.SrsTable,
+методы set_srs/set_srs_many и add_history/add_history_many) и любым генератором с random/randint/choice, поэтому
+его можно гонять в бенчмарках и симуляторе без браузера. Вью только рисуют
+engine.current и передают в движок нажатия кнопок.
+
+    python engine.py [решений] [seed]  - симуляция: раздач в секунду и сходимость SRS
+"""
+import math
+import random
+import sys
+import time
+from collections import deque
+from datetime import datetime
+import profiler
+import sampler
+import scheduler
+import srs_pack
+from combos import combo_suits, combo_weight, sample_combo
+from ranges import get_weight
+
+DEAL_LOOKAHEAD = 5
+DEAL_INVALIDATE_RATIO = 0.1
+ACTIONS = ("FOLD", "CALL", "RAISE")
+RATINGS = ("hard", "normal", "easy")
+BATCH_SIZE = 50
+MIN_SRS_WEIGHT = 1
+MAX_SRS_WEIGHT = 2000
+
+def srs_spot_id(spot_key):
+    src, sc, sp = spot_key.split('|')
+    return f"{src}_{sc}_{sp}".replace(" ", "_")
+
+def training_range(spot_data):
+    r_data = spot_data.get("ranges", spot_data)
+    return r_data.get("training", r_data.get("source", r_data.get("full", "")))
+
+def is_defense_spot(spot_data):
+    r_data = spot_data.get("ranges", spot_data)
+    # Спот защиты - если есть оппонент или слово call в диапазонах
+    return bool(spot_data.get("setup", {}).get("villain_pos") is not None or "call" in r_data or "Call" in r_data)
+
+def resolve_action(spot_data, hand, rng, combo=None):
+    # С комбо ("AhKd") - вес именно этих мастей, иначе - вес класса
+    r_data = spot_data.get("ranges", spot_data)
+    weight = get_weight if combo is None else combo_weight
+    key = hand if combo is None else combo
+    if is_defense_spot(spot_data):
+        w_c = weight(key, r_data.get("call", r_data.get("Call", "")))
+        w_raise_val = weight(key, r_data.get("4bet", r_data.get("3bet", r_data.get("Raise", ""))))
+        if rng < w_raise_val: return "RAISE"
+        if rng < (w_raise_val + w_c): return "CALL"
+        return "FOLD"
+    return "RAISE" if weight(key, r_data.get("full", r_data.get("Full", ""))) > 0 else "FOLD"
+
+def next_weight(w, rating):
+    if rating == 'hard': w *= 2.5
+    elif rating == 'normal': w = w / 1.5 if w > 100 else w * 1.2
+    elif rating == 'easy': w /= 4.0
+    return int(max(MIN_SRS_WEIGHT, min(w, MAX_SRS_WEIGHT)))
+
+def apply_rating(storage, registry, spot_id, hand, rating, now):
+    # Вес - для исследования, состояние FSRS - для очереди "к повтору"
+    old_w = storage.srs.get(spot_id, hand)
+    w = next_weight(old_w, rating)
+    item = scheduler.review(storage.srs.state(spot_id, hand), rating, now)
+    storage.set_srs(spot_id, hand, w, item)
+    registry.update(spot_id, hand, w, item.due)
+    return old_w, w
+
+def apply_ratings(storage, registry, ratings):
+    # ratings: [(spot_id, рука, оценка, время)] по порядку; запись в хранилище одной пачкой
+    cards, out = {}, []
+    for spot_id, hand, rating, now in ratings:
+        key = (spot_id, hand)
+        old_w, state = cards.get(key) or (storage.srs.get(spot_id, hand), storage.srs.state(spot_id, hand))
+        w = next_weight(old_w, rating)
+        cards[key] = (w, scheduler.review(state, rating, now))
+        out.append((spot_id, hand, old_w, w))
+    if cards: storage.set_srs_many([(s, h, w, item) for (s, h), (w, item) in cards.items()])
+    for (s, h), (w, item) in cards.items(): registry.update(s, h, w, item.due)
+    return out
+
+def history_row(deal, correct, ts):
+    date = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+    return [date, deal["spot_key"].split('|')[2], deal["hand"], str(int(correct)), deal["correct"]]
+
+class MemoryStorage:
+    """Хранилище в памяти с интерфейсом LocalStore - для симулятора и бенчмарков."""
+
+    def __init__(self, history_maxlen=None):
+        self.srs = srs_pack.SrsTable()
+        self.history = deque(maxlen=history_maxlen)
+
+    def set_srs(self, spot_id, hand, weight, sched=None):
+        self.srs.set(spot_id, hand, weight, sched)
+
+    def set_srs_many(self, items):
+        for spot_id, hand, weight, sched in items: self.srs.set(spot_id, hand, weight, sched)
+
+    def merge_srs(self, items):
+        for spot, w, states in items: self.srs.merge(spot, w, states)
+
+    def add_history(self, row):
+        self.history.append(row)
+
+    def add_history_many(self, rows):
+        self.history.extend(rows)
+
+class Engine:
+    def __init__(self, ranges_db, storage, rng=None, clock=time.time, registry=None, lookahead=DEAL_LOOKAHEAD):
+        self.ranges_db = ranges_db
+        self.storage = storage
+        self.rng = rng if rng is not None else random.Random()
+        self.clock = clock
+        self.registry = registry if registry is not None else sampler.SamplerRegistry(storage.srs)
+        self.lookahead = lookahead
+        self.pool = ()
+        self.render = None
+        self.queue = []
+        self.current = None
+        self.graded = None
+        self._sampler = None
+
+    def spot_data(self, spot_key):
+        src, sc, sp = spot_key.split('|')
+        return self.ranges_db[src][sc][sp]
+
+    def configure(self, pool, render=None):
+        # Пул спотов и рендерер стола; при смене сбрасываются заготовки
+        pool = tuple(pool)
+        if pool != self.pool:
+            self.pool = pool
+            self._sampler = self.registry.pool(
+                [(k, srs_spot_id(k), training_range(self.spot_data(k))) for k in pool]) if pool else None
+            self.queue = []
+            if self.current is not None and self.current["spot_key"] not in pool: self.skip()
+        if render is not self.render:
+            self.render = render
+            self.queue = []
+            if self.current is not None:
+                self.current.pop("html", None)
+                if render is not None: self.current["html"] = render(self.spot_data(self.current["spot_key"]), self.current)
+        return self
+
+    def reload(self):
+        # Веса подменили целиком (гидратация из таблицы) - пересобираем сэмплер пула
+        pool, self.pool = self.pool, ()
+        return self.configure(pool, self.render)
+
+    def resolve(self, spot_key, hand):
+        # Раздача целиком: комбо (масти по весам тренировочного ренджа), RNG-ролл,
+        # верное действие для этого комбо и (если есть рендерер) HTML стола
+        data = self.spot_data(spot_key)
+        roll = self.rng.randint(0, 99)
+        combo = sample_combo(self.rng, hand, training_range(data))
+        deal = {
+            "spot_key": spot_key,
+            "srs_id": srs_spot_id(spot_key),
+            "hand": hand,
+            "combo": combo,
+            "rng": roll,
+            "suits": combo_suits(combo),
+            "defense": is_defense_spot(data),
+            "correct": resolve_action(data, hand, roll, combo),
+        }
+        if self.render is not None:
+            with profiler.phase("html"):
+                deal["html"] = self.render(data, deal)
+        return deal
+
+    def sample(self, explore_only=False):
+        # Сначала самая просроченная карточка по всем выбранным спотам (куча по due),
+        # если ничего не просрочено - спот пропорционально сумме весов, рука по весам SRS
+        return self._sampler.sample(self.rng, None if explore_only else self.clock())
+
+    def due_card(self):
+        return self._sampler.due_card(self.clock())
+
+    def deal(self):
+        if self.current is None:
+            if self._sampler is None: raise ValueError("Пул спотов пуст")
+            # Просроченная карточка важнее заготовки: проверка кучи - O(log n)
+            due_key, due_hand = self.due_card()
+            if due_key is not None: self.current = self.resolve(due_key, due_hand)
+            elif self.queue: self.current = self.queue.pop(0)
+            else: self.current = self.resolve(*self.sample())
+            self.graded = None
+        return self.current
+
+    def refill(self):
+        # Заготовки - только исследование: просроченные карточки проверяются при выдаче
+        while self._sampler is not None and len(self.queue) < self.lookahead:
+            self.queue.append(self.resolve(*self.sample(explore_only=True)))
+
+    def skip(self):
+        self.current = None
+        self.graded = None
+
+    def grade(self, action):
+        deal = self.deal()
+        correct = action == deal["correct"]
+        self.graded = {"action": action, "correct": correct}
+        self.storage.add_history(history_row(deal, correct, self.clock()))
+        return correct
+
+    def rate(self, rating):
+        deal = self.current
+        if deal is None: raise ValueError("Нет текущей раздачи")
+        old_w, w = apply_rating(self.storage, self.registry, deal["srs_id"], deal["hand"], rating, self.clock())
+        self.invalidate(deal["srs_id"], deal["hand"], old_w, w)
+        self.skip()
+        return w
+
+    def batch(self, n=BATCH_SIZE):
+        # Пачка для проверки в браузере: сначала просроченные карточки, остаток - исследование.
+        # Ключ ответа (ролл и верное действие) разыгран заранее, как у заготовок очереди
+        if self._sampler is None: raise ValueError("Пул спотов пуст")
+        cards = self._sampler.due_cards(self.clock(), n)
+        cards += [self.sample(explore_only=True) for _ in range(n - len(cards))]
+        return [self.resolve(k, h) for k, h in cards]
+
+    def ingest(self, deals, results, since=None):
+        """Ответы пачки [{"i", "action", "rating", "ts"}] -> история и SRS, по транзакции на каждое.
+
+        Верность ответа пересчитывается по своей копии deals, клиенту не верим;
+        время ответа прижимается к [since, сейчас]. Возвращает (решений, верных).
+        """
+        now = self.clock()
+        since = now if since is None else since
+        rows, ratings, seen = [], [], set()
+        for r in results:
+            try:
+                i = int(r["i"]); ts = float(r.get("ts") or now)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not 0 <= i < len(deals) or i in seen: continue
+            if r.get("action") not in ACTIONS or r.get("rating") not in RATINGS: continue
+            seen.add(i)
+            deal = deals[i]
+            ts = min(max(ts, since), now)
+            rows.append(history_row(deal, r["action"] == deal["correct"], ts))
+            ratings.append((deal["srs_id"], deal["hand"], r["rating"], ts))
+        if rows: self.storage.add_history_many(rows)
+        for spot_id, hand, old_w, w in apply_ratings(self.storage, self.registry, ratings):
+            self.invalidate(spot_id, hand, old_w, w)
+        return len(rows), sum(r[3] == "1" for r in rows)
+
+    def invalidate(self, spot_id, hand, old_w, new_w):
+        # Заготовка устарела, если оценили её руку или вес спота сдвинулся заметно
+        if not self.queue: return
+        total = self.registry.spot_total(spot_id)
+        spot_changed = total > 0 and abs(new_w - old_w) / total > DEAL_INVALIDATE_RATIO
+        self.queue = [d for d in self.queue
+                      if d["srs_id"] != spot_id or (not spot_changed and d["hand"] != hand)]
+
+# --- СИМУЛЯТОР ---
+
+class SimClock:
+    def __init__(self, start=0.0, step=30.0):
+        self.now = float(start)
+        self.step = step
+
+    def __call__(self):
+        return self.now
+
+    def tick(self):
+        self.now += self.step
+
+def simulate(ranges_db, pool=None, decisions=100000, seed=0, skill=0.6, memory=600.0, step=30.0, windows=10):
+    """Синтетический игрок с кривой забывания: шанс ответить верно падает от 1 до skill
+    с постоянной memory секунд, удачный повтор удлиняет память, ошибка - укорачивает.
+
+    Возвращает скорость (раздач/с) и точность по окнам - по ней видно, сходится ли SRS.
+    """
+    rng = random.Random(seed)
+    clock = SimClock(step=step)
+    storage = MemoryStorage(history_maxlen=1000)
+    eng = Engine(ranges_db, storage, rng=rng, clock=clock)
+    if pool is None:
+        pool = [f"{src}|{sc}|{sp}" for src, scs in ranges_db.items() for sc, sps in scs.items() for sp in sps]
+    eng.configure(pool)
+    known = {}
+    window = max(1, decisions // windows)
+    accuracy, hits = [], 0
+    started = time.perf_counter()
+    for i in range(1, decisions + 1):
+        deal = eng.deal()
+        key = (deal["srs_id"], deal["hand"])
+        strength, last = known.get(key, (memory, None))
+        p = skill if last is None else skill + (1.0 - skill) * math.exp(-(clock.now - last) / strength)
+        if rng.random() < p: action = deal["correct"]
+        else: action = rng.choice([a for a in (ACTIONS if deal["defense"] else ("FOLD", "RAISE")) if a != deal["correct"]])
+        ok = eng.grade(action)
+        hits += ok
+        eng.rate('hard' if not ok else 'easy' if p > 0.9 else 'normal')
+        known[key] = (strength * 2.5 if ok else max(strength / 2.0, memory), clock.now)
+        eng.refill()
+        clock.tick()
+        if i % window == 0:
+            accuracy.append(hits / window); hits = 0
+    elapsed = time.perf_counter() - started
+    return {
+        "decisions": decisions,
+        "seconds": elapsed,
+        "deals_per_sec": decisions / elapsed if elapsed else float("inf"),
+        "accuracy": accuracy,
+        "cards": len(storage.srs),
+        "due": storage.srs.due_count(clock.now),
+    }
+
+if __name__ == "__main__":
+    import range_pack
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    res = simulate(range_pack.load_pack('spots_data', 'ranges.pack').db, decisions=n, seed=seed)
+    print(f"{res['decisions']} решений за {res['seconds']:.1f}с: {res['deals_per_sec']:.0f} раздач/с, "
+          f"карточек {res['cards']}, к повтору {res['due']}")
+    print("точность по окнам: " + " ".join(f"{a:.0%}" for a in res["accuracy"]))
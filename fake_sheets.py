@@ -0,0 +1,193 @@
+"""Лист Google Sheets в памяти - для бенчмарков и прогонов без сети.
+
+FakeWorksheet повторяет то подмножество gspread.Worksheet, которым пользуются
+utils и sync: чтение всего листа, столбца и диапазона A1, batch_get, update,
+batch_update, append_rows, clear/batch_clear и delete_rows. Значения хранятся
+строками, как их возвращает API.
+
+FaultyWorksheet оборачивает любой лист и имитирует сеть: задержку с разбросом,
+случайные 5xx и квоту запросов в минуту с ответом 429. Генератор и часы
+передаются снаружи, поэтому прогон воспроизводим.
+"""
+import random
+import re
+import threading
+import time
+from collections import deque
+from store import HISTORY_COLUMNS
+from srs_pack import SRS_HEADER
+
+_A1 = re.compile(r"^([A-Z]+)(\d+)?(?::([A-Z]+)(\d+)?)?$")
+
+def _col(letters):
+    n = 0
+    for ch in letters: n = n * 26 + ord(ch) - 64
+    return n
+
+def parse_a1(rng):
+    # "A2:E" -> (строка 2, столбец 1, строка None, столбец 5), всё 1-based
+    m = _A1.match(rng.split('!')[-1].replace('$', ''))
+    if m is None: raise ValueError(f"Неподдерживаемый диапазон: {rng}")
+    c1, r1, c2, r2 = m.groups()
+    c2 = c2 or c1
+    return int(r1 or 1), _col(c1), (int(r2) if r2 else (int(r1) if r1 and not m.group(3) else None)), _col(c2)
+
+class _Cell:
+    def __init__(self, value):
+        self.value = value
+
+class FakeWorksheet:
+    def __init__(self, title, rows=None):
+        self.title = title
+        self.rows = [[str(v) for v in r] for r in (rows or [])]
+        self.calls = 0
+
+    @property
+    def row_count(self):
+        # У настоящего листа всегда есть запас пустых строк
+        return len(self.rows) + 1000
+
+    def _slice(self, rng):
+        r1, c1, r2, c2 = parse_a1(rng)
+        out = [r[c1 - 1:c2] for r in self.rows[r1 - 1:r2]]
+        # API обрезает пустые хвосты справа и снизу
+        out = [r[:max((i + 1 for i, v in enumerate(r) if v != ""), default=0)] for r in out]
+        while out and not out[-1]: out.pop()
+        return out
+
+    def _write(self, r1, c1, values):
+        for i, vals in enumerate(values):
+            while len(self.rows) < r1 + i: self.rows.append([])
+            row = self.rows[r1 + i - 1]
+            while len(row) < c1 - 1 + len(vals): row.append("")
+            row[c1 - 1:c1 - 1 + len(vals)] = [str(v) for v in vals]
+
+    def get_all_values(self):
+        self.calls += 1
+        return [list(r) for r in self.rows]
+
+    def col_values(self, col):
+        self.calls += 1
+        vals = [r[col - 1] if len(r) >= col else "" for r in self.rows]
+        while vals and vals[-1] == "": vals.pop()
+        return vals
+
+    def acell(self, label):
+        self.calls += 1
+        r, c, _, _ = parse_a1(label)
+        row = self.rows[r - 1] if r <= len(self.rows) else []
+        return _Cell(row[c - 1] if len(row) >= c else None)
+
+    def get(self, range_name):
+        self.calls += 1
+        return self._slice(range_name)
+
+    def batch_get(self, ranges):
+        self.calls += 1
+        return [self._slice(r) for r in ranges]
+
+    def update(self, values=None, range_name="A1"):
+        self.calls += 1
+        r1, c1, _, _ = parse_a1(range_name)
+        self._write(r1, c1, values)
+
+    def update_acell(self, label, value):
+        self.update([[value]], label)
+
+    def batch_update(self, data):
+        self.calls += 1
+        for d in data:
+            r1, c1, _, _ = parse_a1(d["range"])
+            self._write(r1, c1, d["values"])
+
+    def append_rows(self, values, **kwargs):
+        self.calls += 1
+        while self.rows and not any(self.rows[-1]): self.rows.pop()
+        start = len(self.rows) + 1
+        self.rows.extend([str(v) for v in r] for r in values)
+        return {"updates": {"updatedRange": f"'{self.title}'!A{start}:Z{len(self.rows)}",
+                            "updatedRows": len(values)}}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def clear(self):
+        self.calls += 1
+        self.rows = []
+
+    def batch_clear(self, ranges):
+        self.calls += 1
+        for rng in ranges:
+            r1, c1, r2, c2 = parse_a1(rng)
+            for row in self.rows[r1 - 1:r2]:
+                row[c1 - 1:c2] = [""] * len(row[c1 - 1:c2])
+        while self.rows and not any(self.rows[-1]): self.rows.pop()
+
+    def delete_rows(self, start_index, end_index=None):
+        self.calls += 1
+        del self.rows[start_index - 1:end_index or start_index]
+
+def fake_worksheets(history=(), srs=(), settings=None):
+    # Тот же словарь листов, что отдаёт utils.get_worksheets
+    return {
+        "SRS": FakeWorksheet("SRS", [SRS_HEADER] + [list(r) for r in srs]),
+        "Settings": FakeWorksheet("Settings", [[settings]] if settings else []),
+        "History": FakeWorksheet("History", [HISTORY_COLUMNS] + [list(r) for r in history]),
+    }
+
+# --- ИМИТАЦИЯ СЕТИ ---
+
+class SheetsAPIError(Exception):
+    """Ошибка API в стиле gspread.exceptions.APIError: code 429 - квота, 5xx - сбой."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+
+class FaultInjector:
+    # Общий на все листы таблицы: квота Sheets считается на проект, а не на лист
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, quota_per_minute=None,
+                 seed=None, clock=time.monotonic, sleep=time.sleep):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.rng = random.Random(seed)
+        self.clock = clock
+        self.sleep = sleep
+        self.calls = 0
+        self.throttled = 0
+        self.failed = 0
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+            now = self.clock()
+            if self.quota_per_minute is not None:
+                while self._window and self._window[0] <= now - 60.0: self._window.popleft()
+                if len(self._window) >= self.quota_per_minute:
+                    self.throttled += 1
+                    raise SheetsAPIError(429, "Quota exceeded for quota metric 'Read/Write requests' per minute")
+                self._window.append(now)
+            fail = self.error_rate and self.rng.random() < self.error_rate
+        if delay > 0: self.sleep(delay)
+        if fail:
+            with self._lock: self.failed += 1
+            raise SheetsAPIError(503, "The service is currently unavailable")
+
+class FaultyWorksheet:
+    def __init__(self, ws, faults):
+        self._ws = ws
+        self._faults = faults
+
+    def __getattr__(self, name):
+        attr = getattr(self._ws, name)
+        if name.startswith("_") or not callable(attr): return attr
+
+        def call(*args, **kwargs):
+            self._faults.before_call()
+            return attr(*args, **kwargs)
+        return call
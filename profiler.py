@@ -0,0 +1,209 @@
+"""Профайлер фаз рерана и вызовов Google Sheets.
+
+Переменная окружения TRAINER_PROFILE=1 включает его на весь процесс,
+переключатель в сайдбаре - в своей сессии: app.py ставит set_session_gate,
+флаг сессии читается раз за реран и кэшируется в потоке рерана. Фоновые
+потоки (синхронизация с Sheets) пишут замеры, пока хоть одна сессия с
+профайлером была активна за последние SESSION_TTL секунд.
+Выключенный профайлер - проверка флага: phase() отдаёт общий пустой
+контекстный менеджер, прокси листа сразу зовёт метод gspread.
+Включённый копит последние SAMPLE_SIZE замеров на имя (счётчик, байты,
+p50/p95/p99) и дописывает события в ротируемый JSONL-файл METRICS_PATH.
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+METRICS_PATH = 'metrics.jsonl'
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+METRICS_BACKUPS = 3
+SAMPLE_SIZE = 1000
+SESSION_TTL = 600.0
+
+_enabled = os.environ.get("TRAINER_PROFILE", "") not in ("", "0")
+_session_gate = None
+_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+_stats = {}
+_pending = []
+_sessions = {}  # id сессии с профайлером -> время её последнего рерана
+
+def _session_flag():
+    # Флаг сессии потока рерана (и отметка о ней для фоновых потоков); None - фоновый поток
+    s = _session_gate() if _session_gate is not None else None
+    if s is None: return None
+    sid, on = s
+    with _lock:
+        if on: _sessions[sid] = time.monotonic()
+        else: _sessions.pop(sid, None)
+    return on
+
+def _any_session():
+    now = time.monotonic()
+    with _lock:
+        return any(now - t < SESSION_TTL for t in _sessions.values())
+
+def enabled():
+    # Для текущего потока: на весь процесс, в сессии его рерана или (фоновый поток) в любой сессии
+    if _enabled: return True
+    on = getattr(_local, "on", None)
+    if on is None:
+        on = _session_flag()
+        if on is None: return _any_session()
+        _local.on = on
+    return on
+
+def enable(on=True):
+    # На весь процесс (скрипты и бенчмарки); UI включает только свою сессию
+    global _enabled
+    _enabled = bool(on)
+
+def set_session_gate(fn):
+    # fn() -> (id сессии, включён ли в ней профайлер) для потока рерана, вне рерана - None
+    global _session_gate
+    _session_gate = fn
+
+class _NullPhase:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL_PHASE = _NullPhase()
+
+class _Phase:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record("phase", self.name, time.perf_counter() - self.t0)
+        return False
+
+def phase(name):
+    return _Phase(name) if enabled() else _NULL_PHASE
+
+def record(kind, name, seconds, nbytes=0, error=None):
+    ev = {"ts": round(time.time(), 3), "kind": kind, "name": name, "ms": round(seconds * 1000, 3)}
+    if nbytes: ev["bytes"] = nbytes
+    if error: ev["error"] = error
+    run = getattr(_local, "run", None)
+    if run is not None:
+        ev["rerun"] = run["id"]
+        run["events"].append(ev)
+    key = (kind, name)
+    with _lock:
+        s = _stats.get(key)
+        if s is None:
+            s = _stats[key] = {"count": 0, "bytes": 0, "errors": 0, "samples": deque(maxlen=SAMPLE_SIZE)}
+        s["count"] += 1
+        s["bytes"] += nbytes
+        s["errors"] += bool(error)
+        s["samples"].append(seconds)
+        _pending.append(ev)
+
+# --- РЕРАН ---
+
+def start_rerun():
+    # Флаг сессии перечитывается в начале каждого полного рерана (переключатель мог смениться)
+    _local.on = None
+    _local.run = {"id": next(_ids), "t0": time.perf_counter(), "events": []} if enabled() else None
+
+def end_rerun():
+    # Возвращает события рерана (None, если профайлер выключен) - их хранит сессия
+    run = getattr(_local, "run", None)
+    if run is None: return None
+    record("rerun", "total", time.perf_counter() - run["t0"])
+    _local.run = None
+    flush()
+    return run["events"]
+
+# --- АГРЕГАТЫ ---
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals: return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+def summary():
+    with _lock:
+        items = [(k, dict(s, samples=sorted(s["samples"]))) for k, s in _stats.items()]
+    rows = []
+    for (kind, name), s in sorted(items):
+        v = s["samples"]
+        rows.append({"kind": kind, "name": name, "count": s["count"],
+                     "p50_ms": round(_percentile(v, 0.50) * 1000, 2),
+                     "p95_ms": round(_percentile(v, 0.95) * 1000, 2),
+                     "p99_ms": round(_percentile(v, 0.99) * 1000, 2),
+                     "bytes": s["bytes"], "errors": s["errors"]})
+    return rows
+
+def reset():
+    with _lock:
+        _stats.clear(); _pending.clear()
+
+# --- JSONL ---
+
+def _rotate(path):
+    try:
+        if os.path.getsize(path) < METRICS_MAX_BYTES: return
+    except OSError:
+        return
+    for i in range(METRICS_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"): os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+def flush(path=METRICS_PATH):
+    with _lock:
+        events = _pending[:]
+        _pending.clear()
+    if not events: return
+    try:
+        _rotate(path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events))
+    except OSError:
+        pass  # Метрики не должны ронять приложение
+
+# --- SHEETS ---
+
+def _payload_size(obj):
+    if obj is None: return 0
+    try:
+        return len(json.dumps(obj, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+def timed_call(label, fn, *args, **kwargs):
+    # Один вызов API: время, объём запроса и ответа, тип ошибки
+    if not enabled(): return fn(*args, **kwargs)
+    t0 = time.perf_counter()
+    try:
+        res = fn(*args, **kwargs)
+    except Exception as e:
+        record("sheets", label, time.perf_counter() - t0, error=type(e).__name__)
+        raise
+    record("sheets", label, time.perf_counter() - t0, _payload_size([args, kwargs]) + _payload_size(res))
+    return res
+
+class InstrumentedWorksheet:
+    """Прокси gspread.Worksheet: время, объём и ошибки каждого вызова API."""
+
+    def __init__(self, ws):
+        self._ws = ws
+
+    def __getattr__(self, name):
+        attr = getattr(self._ws, name)
+        if name.startswith("_") or not callable(attr): return attr
+        label = f"{getattr(self._ws, 'title', '?')}.{name}"
+
+        def call(*args, **kwargs):
+            return timed_call(label, attr, *args, **kwargs)
+        return call
@@ -0,0 +1,126 @@
+"""Алгебра ренджей на NumPy: вектор весов 0..100 по 169 рукам (или по 1326 комбо).
+
+Все операции поэлементные по последней оси, поэтому стопка (k, 169) из всех
+спотов сценария считается одним проходом, без цикла по рукам:
+
+    union / intersection - max / min весов: рука в A или B / в обоих;
+    difference           - A без B, clip(A - B, 0);
+    diff                 - A - B со знаком (тепловая карта разницы);
+    scale / normalize    - умножение весов / подгонка под заданную частоту.
+
+Частоты взвешены числом комбо: пара - 6, одномастная - 4, разномастная - 12,
+всего 1326. У вектора из 1326 комбо каждое весит 1.
+"""
+import numpy as np
+from ranges import ALL_HANDS, compile_range
+
+FULL_WEIGHT = 100.0
+N_HANDS = len(ALL_HANDS)
+N_COMBOS = 1326
+NORMALIZE_STEPS = 48
+ACTIONS = ("raise", "call", "play")
+
+HAND_COMBOS = np.array([6 if len(h) == 2 else 4 if h[2] == 's' else 12 for h in ALL_HANDS], np.float64)
+HAND_COMBOS.flags.writeable = False
+_UNIT_COMBOS = np.ones(N_COMBOS)
+_UNIT_COMBOS.flags.writeable = False
+
+def combo_counts(n):
+    # Сколько комбо стоит за слотом вектора длины n
+    if n == N_HANDS: return HAND_COMBOS
+    if n == N_COMBOS: return _UNIT_COMBOS
+    raise ValueError(f"Вектор ренджа: {n} слотов вместо {N_HANDS} или {N_COMBOS}")
+
+def as_weights(r):
+    # Строка нотации, CompiledRange или массив [..., n] -> float64 веса
+    if isinstance(r, str): return compile_range(r).weights
+    return np.asarray(getattr(r, "weights", r), np.float64)
+
+# --- ОПЕРАЦИИ ---
+
+def union(a, b):
+    return np.maximum(as_weights(a), as_weights(b))
+
+def intersection(a, b):
+    return np.minimum(as_weights(a), as_weights(b))
+
+def difference(a, b):
+    return np.clip(as_weights(a) - as_weights(b), 0.0, FULL_WEIGHT)
+
+def diff(a, b):
+    return as_weights(a) - as_weights(b)
+
+def scale(a, k):
+    # k - число или массив формы [..., 1] для стопки
+    return np.clip(as_weights(a) * k, 0.0, FULL_WEIGHT)
+
+def combos(a):
+    # Число комбо в ренджах (вес 50 у пары - 3 комбо)
+    w = as_weights(a)
+    return w @ combo_counts(w.shape[-1]) / FULL_WEIGHT
+
+def frequency(a):
+    # Доля всех 1326 комбо, %
+    return combos(a) * (100.0 / N_COMBOS)
+
+def normalize(a, freq=100.0):
+    """Масштаб весов, при котором частота ренджа равна freq (%).
+
+    Веса упираются в 100, поэтому множитель ищется бисекцией (сразу для всей
+    стопки); недостижимая частота даёт 100 на всех сыгранных руках.
+    """
+    w = as_weights(a)
+    counts = combo_counts(w.shape[-1])
+    target = np.asarray(freq, np.float64) * (N_COMBOS / 100.0) * FULL_WEIGHT
+    smallest = np.where(w > 0, w, np.inf).min(axis=-1)
+    lo = np.zeros(w.shape[:-1])
+    hi = np.where(np.isfinite(smallest), FULL_WEIGHT / smallest, 0.0)
+    for _ in range(NORMALIZE_STEPS):
+        mid = (lo + hi) / 2
+        below = np.clip(w * mid[..., None], 0.0, FULL_WEIGHT) @ counts < target
+        lo = np.where(below, mid, lo)
+        hi = np.where(below, hi, mid)
+    return scale(w, hi[..., None])
+
+# --- СРАВНЕНИЕ ---
+
+def overlap(a, b):
+    # Пересечение / объединение по комбо, % (0, если оба пустые)
+    inter, uni = combos(intersection(a, b)), combos(union(a, b))
+    return np.divide(inter * 100.0, uni, out=np.zeros_like(uni), where=uni > 0)
+
+def coverage(a, b):
+    # Какая доля комбо A сыграна и в B, %
+    inter, own = combos(intersection(a, b)), combos(a)
+    return np.divide(inter * 100.0, own, out=np.zeros_like(own), where=own > 0)
+
+def pairwise_overlap(stack):
+    # Стопка (k, n) -> матрица (k, k) перекрытий всех пар за один проход
+    w = as_weights(stack)
+    counts = combo_counts(w.shape[-1])
+    inter = np.minimum(w[:, None, :], w[None, :, :]) @ counts
+    uni = np.maximum(w[:, None, :], w[None, :, :]) @ counts
+    return np.divide(inter * 100.0, uni, out=np.zeros_like(uni), where=uni > 0)
+
+# --- РЕНДЖИ СПОТА ---
+
+def spot_actions(spot_data):
+    """{"raise", "call", "play"} -> веса спота; правила те же, что у матрицы разбора.
+
+    Raise - 4bet/3bet/Raise, иначе full; если raise + call больше 100, оба
+    ужимаются пропорционально. Play - всё, кроме фолда.
+    """
+    r = spot_data.get("ranges", spot_data)
+    w_call = compile_range(r.get("call", r.get("Call", ""))).weights
+    w_raise = compile_range(r.get("4bet", r.get("3bet", r.get("Raise", "")))).weights
+    w_full = compile_range(r.get("full", r.get("Full", ""))).weights
+    w_raise = np.where(w_raise > 0, w_raise, w_full)
+    total = w_raise + w_call
+    k = np.where(total > FULL_WEIGHT, FULL_WEIGHT / np.maximum(total, 1e-9), 1.0)
+    w_raise, w_call = w_raise * k, w_call * k
+    return {"raise": w_raise, "call": w_call, "play": w_raise + w_call}
+
+def spot_stack(spots, action="play"):
+    # [spot_data] -> (k, 169) веса одного действия
+    if not spots: return np.zeros((0, N_HANDS))
+    return np.stack([spot_actions(d)[action] for d in spots])
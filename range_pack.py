@@ -0,0 +1,213 @@
+"""Бинарный пак ренджей: все spots_data/*.json, скомпилированные в один файл.
+
+Формат: MAGIC | uint32 длина заголовка | uint32 число строк | JSON-заголовок |
+выравнивание | float64[n, 169] веса | bool[n, 169] маски рук.
+Заголовок хранит индекс спотов, setup/stats, sha256 каждого исходника и номера
+строк с конкретными комбо (mixed);
+вектора читаются через read-only memmap и не копируются в сессии.
+
+Сборка вручную: python range_pack.py [spots_dir] [pack_path]
+"""
+import os
+import sys
+import json
+import time
+import struct
+import hashlib
+import tempfile
+import numpy as np
+from ranges import ALL_HANDS, CompiledRange, compile_range, set_packed_ranges
+
+PACK_MAGIC = b'RPK1'
+PACK_VERSION = 3
+N_HANDS = len(ALL_HANDS)
+_PREFIX = struct.Struct('<4sII')
+_ALIGN = 64
+STALE_CHECK_INTERVAL = 2.0
+
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _scan_sources(spots_dir):
+    out = {}
+    if not os.path.isdir(spots_dir): return out
+    for entry in os.scandir(spots_dir):
+        if entry.name.endswith('.json') and entry.is_file():
+            st_ = entry.stat()
+            out[entry.name] = (st_.st_mtime_ns, st_.st_size)
+    return out
+
+def _parse_source(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {
+        "source": data.get("source", "Unknown"),
+        "scenario": data.get("scenario", "Unknown"),
+        "spots": data.get("spots", {}),
+        "error": None,
+    }
+
+def _iter_range_strings(file_entry):
+    for spot in file_entry["spots"].values():
+        if not isinstance(spot, dict): continue
+        r_data = spot.get("ranges", spot)
+        if not isinstance(r_data, dict): continue
+        for v in r_data.values():
+            if isinstance(v, str) and v: yield v
+
+class RangePack:
+    def __init__(self, path, header, weights, listed):
+        self.path = path
+        self.header = header
+        self.weights = weights
+        self.listed = listed
+        self.strings = header["strings"]
+        self.mixed = frozenset(header.get("mixed", ()))
+        self.row_of = {s: i for i, s in enumerate(self.strings)}
+        self._checked_at = time.monotonic()
+        self.db, self.spot_keys, self.errors = self._build_db()
+
+    def _build_db(self):
+        db = {}; keys = []; errors = []
+        for name in sorted(self.header["files"]):
+            fe = self.header["files"][name]
+            if fe["error"]:
+                errors.append((name, fe["error"])); continue
+            src, sc = fe["source"], fe["scenario"]
+            if src not in db: db[src] = {}
+            if sc not in db[src]: db[src][sc] = {}
+            db[src][sc].update(fe["spots"])
+        for src, sc_dict in db.items():
+            for sc, sp_dict in sc_dict.items():
+                for sp in sp_dict: keys.append(f"{src}|{sc}|{sp}")
+        return db, keys, errors
+
+    def compiled(self, range_str):
+        i = self.row_of.get(range_str)
+        if i is None: return compile_range(range_str)
+        return CompiledRange(self.weights[i], self.listed[i], i in self.mixed)
+
+    def activate(self):
+        # Все get_weight/parse_range_to_list/матрицы начинают читать вектора прямо из пака
+        set_packed_ranges({s: CompiledRange(self.weights[i], self.listed[i], i in self.mixed)
+                           for i, s in enumerate(self.strings)})
+        return self
+
+    def is_stale(self, spots_dir):
+        now = time.monotonic()
+        if now - self._checked_at < STALE_CHECK_INTERVAL: return False
+        self._checked_at = now
+        return not _is_current(self.header, _scan_sources(spots_dir))
+
+def _is_current(header, scanned):
+    # Заголовок пака совпадает с исходниками по составу, mtime и размеру
+    if header is None or scanned.keys() != header["files"].keys(): return False
+    files = header["files"]
+    return all((files[n]["mtime_ns"], files[n]["size"]) == sig for n, sig in scanned.items())
+
+def _read_header(pack_path):
+    try:
+        with open(pack_path, 'rb') as f:
+            magic, hlen, n = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != PACK_MAGIC: return None, 0, 0
+            header = json.loads(f.read(hlen).decode('utf-8'))
+    except (OSError, ValueError, struct.error):
+        return None, 0, 0
+    if header.get("version") != PACK_VERSION or header.get("hands") != N_HANDS: return None, 0, 0
+    data_off = -(-(_PREFIX.size + hlen) // _ALIGN) * _ALIGN
+    return header, n, data_off
+
+def _map_arrays(pack_path, n, data_off):
+    if n == 0:
+        return np.zeros((0, N_HANDS), dtype=np.float64), np.zeros((0, N_HANDS), dtype=np.bool_)
+    weights = np.memmap(pack_path, dtype='<f8', mode='r', offset=data_off, shape=(n, N_HANDS))
+    listed = np.memmap(pack_path, dtype=np.bool_, mode='r', offset=data_off + n * N_HANDS * 8, shape=(n, N_HANDS))
+    return weights, listed
+
+def build_pack(spots_dir, pack_path, old_header=None, old_arrays=None):
+    old_files = (old_header or {}).get("files", {})
+    old_rows = {s: i for i, s in enumerate((old_header or {}).get("strings", []))}
+    old_mixed = set((old_header or {}).get("mixed", ()))
+    files = {}
+    for name, (mtime_ns, size) in sorted(_scan_sources(spots_dir).items()):
+        path = os.path.join(spots_dir, name)
+        prev = old_files.get(name)
+        if prev and (prev["mtime_ns"], prev["size"]) == (mtime_ns, size):
+            files[name] = prev; continue
+        digest = _file_sha256(path)
+        if prev and prev["sha256"] == digest:
+            entry = dict(prev)
+        else:
+            try:
+                entry = _parse_source(path)
+            except Exception as e:
+                entry = {"source": None, "scenario": None, "spots": {}, "error": str(e)}
+        entry.update(sha256=digest, mtime_ns=mtime_ns, size=size)
+        files[name] = entry
+
+    strings = []; seen = set()
+    for name in sorted(files):
+        for s in _iter_range_strings(files[name]):
+            if s not in seen: seen.add(s); strings.append(s)
+
+    weights = np.zeros((len(strings), N_HANDS), dtype='<f8')
+    listed = np.zeros((len(strings), N_HANDS), dtype=np.bool_)
+    mixed = []
+    for i, s in enumerate(strings):
+        j = old_rows.get(s)
+        if j is not None and old_arrays is not None:
+            weights[i], listed[i] = old_arrays[0][j], old_arrays[1][j]
+            if j in old_mixed: mixed.append(i)
+        else:
+            cr = compile_range(s)
+            weights[i], listed[i] = cr.weights, cr.listed
+            if cr.mixed: mixed.append(i)
+
+    header = {"version": PACK_VERSION, "hands": N_HANDS, "files": files, "strings": strings, "mixed": mixed}
+    hbytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    data_off = -(-(_PREFIX.size + len(hbytes)) // _ALIGN) * _ALIGN
+    tmp = f"{pack_path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_PREFIX.pack(PACK_MAGIC, len(hbytes), len(strings)))
+        f.write(hbytes)
+        f.write(b'\0' * (data_off - _PREFIX.size - len(hbytes)))
+        f.write(weights.tobytes())
+        f.write(listed.tobytes())
+    # Атомарная подмена: уже открытые memmap продолжают смотреть на старый файл
+    os.replace(tmp, pack_path)
+    return header
+
+def _fallback_path(pack_path):
+    # Папка пака только для чтения - пак живёт в системном tmp под тем же именем
+    return os.path.join(tempfile.gettempdir(), os.path.basename(pack_path))
+
+def load_pack(spots_dir, pack_path):
+    scanned = _scan_sources(spots_dir)
+    # Сначала готовый пак: на месте или (папка только для чтения) собранный раньше в tmp
+    candidates = [pack_path, _fallback_path(pack_path)]
+    old = None
+    for path in candidates:
+        header, n, data_off = _read_header(path)
+        if header is None: continue
+        if _is_current(header, scanned): return RangePack(path, header, *_map_arrays(path, n, data_off)).activate()
+        if old is None: old = (header, _map_arrays(path, n, data_off))
+    header, arrays = old or (None, None)
+    for path in candidates:
+        try:
+            build_pack(spots_dir, path, header, arrays)
+            break
+        except OSError:
+            if path == candidates[-1]: raise
+    header, n, data_off = _read_header(path)
+    return RangePack(path, header, *_map_arrays(path, n, data_off)).activate()
+
+if __name__ == "__main__":
+    spots_dir = sys.argv[1] if len(sys.argv) > 1 else 'spots_data'
+    pack_path = sys.argv[2] if len(sys.argv) > 2 else 'ranges.pack'
+    pack = load_pack(spots_dir, pack_path)
+    print(f"{pack_path}: {len(pack.spot_keys)} spots, {len(pack.strings)} range vectors")
+    for name, err in pack.errors: print(f"  ! {name}: {err}")
@@ -0,0 +1,208 @@
+import functools
+import re
+import numpy as np
+
+RANKS = 'AKQJT98765432'
+
+ALL_HANDS = []
+for i, r1 in enumerate(RANKS):
+    for j, r2 in enumerate(RANKS):
+        if i < j: ALL_HANDS.append(r1 + r2 + 's'); ALL_HANDS.append(r1 + r2 + 'o')
+        elif i == j: ALL_HANDS.append(r1 + r2)
+
+# Канонический индекс руки: слот в 169-векторе весов
+HAND_INDEX = {h: i for i, h in enumerate(ALL_HANDS)}
+
+# Порядок клеток матрицы 13x13 (строка r1, колонка r2) -> индекс руки
+MATRIX_HANDS = []
+for i, r1 in enumerate(RANKS):
+    for j, r2 in enumerate(RANKS):
+        if i == j: MATRIX_HANDS.append(r1 + r2)
+        elif i < j: MATRIX_HANDS.append(r1 + r2 + 's')
+        else: MATRIX_HANDS.append(r2 + r1 + 'o')
+MATRIX_INDEX = [HAND_INDEX[h] for h in MATRIX_HANDS]
+
+class CompiledRange:
+    """Рендж, распарсенный один раз: 169 весов (0..100) + маска явно перечисленных рук.
+
+    mixed - веса задают и конкретные комбо (масти внутри класса играются по-разному);
+    только для таких ренджей нужен слой combos.
+    """
+    __slots__ = ("weights", "listed", "mixed")
+
+    def __init__(self, weights, listed, mixed=False):
+        self.weights = weights
+        self.listed = listed
+        self.mixed = mixed
+
+    def weight(self, hand):
+        idx = HAND_INDEX.get(hand)
+        return float(self.weights[idx]) if idx is not None else 0.0
+
+    def hands(self):
+        return [ALL_HANDS[i] for i in np.flatnonzero(self.listed)]
+
+# --- КОМПИЛЯТОР НОТАЦИИ ---
+#
+# Рендж - список через запятую, у элемента необязательный вес после ':'
+# (0..1 - доля, больше 1 или с '%' - проценты, по умолчанию 100):
+#
+#     AA, AKs, AKo, AK       - пара, одномастная, разномастная, обе сразу;
+#     77+, ATs+, K9+         - от указанной руки вверх (у непар растёт кикер до старшей-1);
+#     22-55, KTo-K8o         - отрезок; у непар старшая карта общая;
+#     AsKs, Ah Kd -> AhKd    - конкретное комбо: доля 1/6, 1/4 или 1/12 класса;
+#     ALL                    - все 169 рук.
+#
+# Побеждает первое упоминание комбо: "AsKs:0, AKs" - AsKs не играется, остальные
+# три AKs на 100. Вес класса - среднее по его комбо (слой комбо - модуль combos).
+# Нераспознанные элементы пропускаются, как и раньше.
+
+RANGE_CACHE_SIZE = 4096
+SUITS = 'shdc'
+_SUIT_ALIASES = {'♠': 's', '♥': 'h', '♦': 'd', '♣': 'c'}
+_RANK_POS = {r: i for i, r in enumerate(RANKS)}  # 0 - туз
+_CLASS_RE = re.compile(r"^([AKQJT2-9])([AKQJT2-9])([so]?)(\+?)$")
+_COMBO_RE = re.compile(r"^([AKQJT2-9])([shdc])([AKQJT2-9])([shdc])$")
+_ALL_TOKENS = frozenset(("ALL", "*", "ANY"))
+
+def _parse_item_weight(w_part):
+    w_part = w_part.strip()
+    try:
+        if w_part.endswith('%'): weight = float(w_part[:-1])
+        else:
+            weight = float(w_part)
+            if weight <= 1.0: weight *= 100
+    except ValueError:
+        weight = 100.0
+    return min(max(weight, 0.0), 100.0)
+
+def _class_hand(hi, lo, suited):
+    # Позиции рангов (0 - туз) -> имя класса; hi старше lo
+    if hi == lo: return RANKS[hi] * 2
+    return RANKS[hi] + RANKS[lo] + suited
+
+def _class_token(tok):
+    # "ATs" -> (старшая, младшая, 's'/'o'/'', плюс) или None
+    m = _CLASS_RE.match(tok)
+    if m is None: return None
+    hi, lo = _RANK_POS[m.group(1)], _RANK_POS[m.group(2)]
+    if hi > lo: hi, lo = lo, hi
+    if hi == lo and m.group(3): return None
+    return hi, lo, m.group(3), bool(m.group(4))
+
+def _expand(hi, lo, suited, lo_end=None):
+    # Классы от (hi, lo) до (hi, lo_end) включительно; для пар lo_end - вторая пара
+    if hi == lo:
+        top = 0 if lo_end is None else lo_end
+        return [RANKS[r] * 2 for r in range(min(hi, top), max(hi, top) + 1)]
+    top = hi + 1 if lo_end is None else lo_end
+    kinds = (suited,) if suited else ('s', 'o')
+    return [_class_hand(hi, k, x) for k in range(min(lo, top), max(lo, top) + 1) for x in kinds]
+
+def _normalize_token(tok):
+    # Ранги - заглавные, масти и суффиксы s/o - строчные
+    if len(tok) == 4 and tok[1].lower() in SUITS and tok[3].lower() in SUITS:
+        return tok[0].upper() + tok[1].lower() + tok[2].upper() + tok[3].lower()
+    return tok[:2].upper() + tok[2:].lower()
+
+def tokenize_range(range_str):
+    """Строка ренджа -> [(классы, комбо или None, вес)].
+
+    Для класса (и отрезков) - список имён рук; для конкретного комбо - имя его
+    класса и само комбо вида "AhKd".
+    """
+    out = []
+    cleaned = range_str.replace('\n', ' ').replace('\r', '')
+    if not cleaned.isascii():
+        for ch, s in _SUIT_ALIASES.items(): cleaned = cleaned.replace(ch, s)
+    for item in cleaned.split(','):
+        item = item.strip()
+        if not item: continue
+        if ':' in item:
+            h_part, w_part = item.split(':', 1)
+            weight = _parse_item_weight(w_part)
+        else:
+            h_part, weight = item, 100.0
+        # Обычная рука - без разбора (таких в ренджах подавляющее большинство)
+        if h_part in HAND_INDEX:
+            out.append(((h_part,), None, weight)); continue
+        tok = _normalize_token(h_part.replace(' ', ''))
+        if tok.upper() in _ALL_TOKENS:
+            out.append((list(ALL_HANDS), None, weight)); continue
+        m = _COMBO_RE.match(tok)
+        if m is not None:
+            r1, s1, r2, s2 = m.groups()
+            if (r1, s1) == (r2, s2): continue
+            if _RANK_POS[r1] > _RANK_POS[r2]: r1, s1, r2, s2 = r2, s2, r1, s1
+            hand = _class_hand(_RANK_POS[r1], _RANK_POS[r2], 's' if s1 == s2 else 'o')
+            out.append(([hand], r1 + s1 + r2 + s2, weight)); continue
+        if '-' in tok:
+            a, _, b = tok.partition('-')
+            ta, tb = _class_token(a), _class_token(_normalize_token(b))
+            if ta is None or tb is None or ta[3] or tb[3] or ta[2] != tb[2]: continue
+            if (ta[0] == ta[1]) != (tb[0] == tb[1]): continue
+            if ta[0] == ta[1]: out.append((_expand(ta[0], ta[0], '', tb[0]), None, weight))
+            elif ta[0] == tb[0]: out.append((_expand(ta[0], ta[1], ta[2], tb[1]), None, weight))
+            continue
+        t = _class_token(tok)
+        if t is None: continue
+        hi, lo, suited, plus = t
+        if plus: out.append((_expand(hi, lo, suited), None, weight))
+        elif hi == lo: out.append(([RANKS[hi] * 2], None, weight))
+        else: out.append(([_class_hand(hi, lo, x) for x in ((suited,) if suited else ('s', 'o'))], None, weight))
+    return out
+
+def combo_count(hand):
+    return 6 if len(hand) == 2 else 4 if hand[2] == 's' else 12
+
+@functools.lru_cache(maxsize=RANGE_CACHE_SIZE)
+def _compile_range_cached(range_str):
+    weights = np.zeros(len(ALL_HANDS), dtype=np.float64)
+    listed = np.zeros(len(ALL_HANDS), dtype=bool)
+    partial = {}  # класс -> {комбо: вес}, пока класс не закрыт целиком
+    mixed = False
+    for hands, combo, weight in tokenize_range(range_str):
+        if combo is not None:
+            idx = HAND_INDEX[hands[0]]
+            if not listed[idx]: partial.setdefault(idx, {}).setdefault(combo, weight); mixed = True
+            continue
+        for h in hands:
+            idx = HAND_INDEX[h]
+            if listed[idx]: continue
+            seen = partial.pop(idx, None)
+            if seen: weight_idx = (sum(seen.values()) + (combo_count(h) - len(seen)) * weight) / combo_count(h)
+            else: weight_idx = weight
+            weights[idx] = weight_idx
+            listed[idx] = True
+    for idx, seen in partial.items():
+        weights[idx] = sum(seen.values()) / combo_count(ALL_HANDS[idx])
+        listed[idx] = True
+    weights.flags.writeable = False
+    listed.flags.writeable = False
+    return CompiledRange(weights, listed, mixed)
+
+_EMPTY_RANGE = _compile_range_cached("")
+
+# Готовые вектора из бинарного пака (range_pack) - строка вообще не парсится
+_PACKED = {}
+
+def set_packed_ranges(mapping):
+    global _PACKED
+    _PACKED = mapping
+
+def compile_range(range_str):
+    if not range_str or not isinstance(range_str, str): return _EMPTY_RANGE
+    packed = _PACKED.get(range_str)
+    if packed is not None: return packed
+    return _compile_range_cached(range_str)
+
+def get_weight(hand, range_str):
+    return compile_range(range_str).weight(hand)
+
+def parse_range_to_list(range_str):
+    # Пустой или нераспознанный рендж - тренируем все руки
+    hand_list = compile_range(range_str).hands()
+    if not hand_list:
+        return ALL_HANDS.copy()
+
+    return hand_list
@@ -0,0 +1,141 @@
+"""Общий на процесс лимитер запросов к Sheets и склейка одинаковых чтений.
+
+Квота Sheets считается на проект и пользователя в минуту, а листы у всех
+сессий общие, поэтому и лимитер один: два токен-бакета (чтение и запись).
+Когда токенов нет, вызов ждёт (backpressure) до QUEUE_TIMEOUT, потом
+RateLimited. Ответ 429 обнуляет бакет и ставит паузу QUOTA_COOLDOWN для всех.
+
+Одинаковые чтения, пришедшие пока первое ещё в полёте, не уходят в сеть:
+ждут результат первого (single-flight). Записи склеивать здесь не нужно -
+их собирает в пачки единственный поток sync.SyncWorker.
+"""
+import copy
+import threading
+import time
+import profiler
+
+READS_PER_MINUTE = 60
+WRITES_PER_MINUTE = 60
+QUEUE_TIMEOUT = 30.0
+QUOTA_COOLDOWN = 60.0
+READ_METHODS = frozenset(("get_all_values", "col_values", "acell", "get", "batch_get"))
+
+class RateLimited(Exception):
+    pass
+
+def is_quota_error(e):
+    # gspread.exceptions.APIError хранит ответ, fake_sheets.SheetsAPIError - код
+    code = getattr(e, "code", None)
+    if code is None: code = getattr(getattr(e, "response", None), "status_code", None)
+    return code == 429
+
+class TokenBucket:
+    def __init__(self, per_minute, burst=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, per_minute // 6))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, n=1, timeout=None):
+        with self._cond:
+            deadline = None if timeout is None else self.clock() + timeout
+            while True:
+                now = self.clock()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= n:
+                    self.tokens -= n
+                    return True
+                wait = max(self.blocked_until - now, (n - self.tokens) / self.rate)
+                if deadline is not None and now + wait > deadline: return False
+                self._cond.wait(wait)
+
+    def penalize(self, seconds):
+        with self._cond:
+            self._refill(self.clock())
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class RequestLimiter:
+    def __init__(self, reads_per_minute=READS_PER_MINUTE, writes_per_minute=WRITES_PER_MINUTE,
+                 burst=None, timeout=QUEUE_TIMEOUT, cooldown=QUOTA_COOLDOWN):
+        self.reads = TokenBucket(reads_per_minute, burst)
+        self.writes = TokenBucket(writes_per_minute, burst)
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.coalesced = 0
+        self.throttled = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def call(self, bucket, fn):
+        t0 = time.perf_counter()
+        if not bucket.acquire(timeout=self.timeout):
+            raise RateLimited(f"Очередь к Sheets дольше {self.timeout:g}с - квота исчерпана")
+        waited = time.perf_counter() - t0
+        if waited > 0.001 and profiler.enabled(): profiler.record("phase", "ratelimit.wait", waited)
+        try:
+            return fn()
+        except Exception as e:
+            if is_quota_error(e):
+                self.throttled += 1
+                self.reads.penalize(self.cooldown); self.writes.penalize(self.cooldown)
+            raise
+
+    def read(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader: flight = self._flights[key] = _Flight()
+            else: self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None: raise flight.error
+            return copy.deepcopy(flight.result)
+        try:
+            flight.result = self.call(self.reads, fn)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock: self._flights.pop(key, None)
+            flight.done.set()
+
+class LimitedWorksheet:
+    """Прокси листа: каждый вызов берёт токен, одинаковые чтения склеиваются."""
+
+    def __init__(self, ws, limiter):
+        self._ws = ws
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self._ws, name)
+        if name.startswith("_") or not callable(attr): return attr
+        lim = self._limiter
+        if name in READ_METHODS:
+            title = getattr(self._ws, "title", "?")
+
+            def call(*args, **kwargs):
+                return lim.read((title, name, repr(args), repr(sorted(kwargs.items()))), lambda: attr(*args, **kwargs))
+        else:
+            def call(*args, **kwargs):
+                return lim.call(lim.writes, lambda: attr(*args, **kwargs))
+        return call
+
+def limit_worksheets(sheets, limiter):
+    return {name: LimitedWorksheet(ws, limiter) for name, ws in sheets.items()}
@@ -0,0 +1,207 @@
+"""Взвешенный выбор рук для SRS за O(log n).
+
+FenwickSampler - дерево Фенвика над весами слотов: обновление и выбор за O(log n).
+SpotSampler - дерево над 169 руками одного спота (вес 0 у рук вне тренировочного ренджа).
+PoolSampler - дерево над спотами пула, вес спота = сумма весов его рук; выбор
+сразу по всем выбранным спотам, без random.choice(pool) и пересборки весов.
+
+Поверх весов - очередь "к повтору": у спота куча (due, рука), у пула куча
+(минимальный due спота, спот). Самая просроченная карточка берётся за O(log n),
+устаревшие записи кучи отбрасываются лениво по номеру версии.
+"""
+import heapq
+import threading
+import weakref
+import numpy as np
+from ranges import ALL_HANDS, HAND_INDEX, parse_range_to_list
+from srs_pack import DEFAULT_SRS_WEIGHT
+
+class FenwickSampler:
+    __slots__ = ("n", "tree", "weights", "_top")
+
+    def __init__(self, weights):
+        self.n = len(weights)
+        self.weights = [float(w) for w in weights]
+        self.tree = [0.0] * (self.n + 1)
+        # Построение за O(n): каждый узел отдаёт свою сумму родителю
+        for i, w in enumerate(self.weights, 1):
+            self.tree[i] += w
+            j = i + (i & -i)
+            if j <= self.n: self.tree[j] += self.tree[i]
+        self._top = 1 << (self.n.bit_length() - 1) if self.n else 0
+
+    def total(self):
+        s = 0.0; i = self.n
+        while i > 0:
+            s += self.tree[i]; i -= i & -i
+        return s
+
+    def update(self, idx, weight):
+        delta = float(weight) - self.weights[idx]
+        if delta == 0: return
+        self.weights[idx] = float(weight)
+        i = idx + 1
+        while i <= self.n:
+            self.tree[i] += delta; i += i & -i
+
+    def find(self, u):
+        # Первый слот, у которого префиксная сумма > u
+        pos = 0; step = self._top
+        while step:
+            nxt = pos + step
+            if nxt <= self.n and self.tree[nxt] <= u:
+                pos = nxt; u -= self.tree[nxt]
+            step >>= 1
+        # Защита от накопленной погрешности float: не возвращаем слот с нулевым весом
+        if pos >= self.n or self.weights[pos] <= 0:
+            pos = max((i for i in range(self.n) if self.weights[i] > 0), default=min(pos, self.n - 1))
+        return pos
+
+    def sample(self, rng):
+        return self.find(rng.random() * self.total())
+
+class SpotSampler:
+    def __init__(self, srs_id, training_range, srs):
+        # srs - srs_pack.SrsTable: веса спота берём одним массивом, а не 169 ключами
+        self.srs_id = srs_id
+        self.hands = parse_range_to_list(training_range)
+        self.mask = {HAND_INDEX[h] for h in self.hands if h in HAND_INDEX}
+        self.load(srs)
+
+    def load(self, srs):
+        # Веса и очередь "к повтору" из таблицы; повторно - когда таблицу подменили целиком
+        idx = np.fromiter(sorted(self.mask), np.intp, len(self.mask))
+        weights = np.zeros(len(ALL_HANDS))
+        stored = srs.spot_weights(self.srs_id)
+        weights[idx] = DEFAULT_SRS_WEIGHT if stored is None else np.where(stored[idx] > 0, stored[idx], DEFAULT_SRS_WEIGHT)
+        states = srs.spot_states(self.srs_id)
+        self.due_heap = [(states[i][2], i, 0) for i in self.mask if i in states]
+        self._due_ver = {}
+        heapq.heapify(self.due_heap)
+        self.tree = FenwickSampler(weights.tolist())
+
+    @property
+    def total(self):
+        return self.tree.total()
+
+    def set_weight(self, hand, weight, due=None):
+        idx = HAND_INDEX.get(hand)
+        if idx is None or idx not in self.mask: return False
+        self.tree.update(idx, weight)
+        if due is not None:
+            ver = self._due_ver.get(idx, 0) + 1
+            self._due_ver[idx] = ver
+            heapq.heappush(self.due_heap, (due, idx, ver))
+        return True
+
+    def min_due(self):
+        h = self.due_heap
+        while h and self._due_ver.get(h[0][1], 0) != h[0][2]:
+            heapq.heappop(h)
+        return h[0][:2] if h else None
+
+    def due_items(self, now):
+        # Все актуальные записи кучи с due <= now (кучу не трогаем)
+        return [(due, idx) for due, idx, ver in self.due_heap if due <= now and self._due_ver.get(idx, 0) == ver]
+
+    def sample(self, rng):
+        return ALL_HANDS[self.tree.sample(rng)]
+
+class PoolSampler:
+    def __init__(self, registry, entries):
+        # entries: [(spot_key, spot_sampler)]
+        self.registry = registry
+        self.keys = [k for k, _ in entries]
+        self.spots = [s for _, s in entries]
+        self.tree = FenwickSampler([s.total for s in self.spots])
+        self._slots = {}
+        for i, s in enumerate(self.spots): self._slots.setdefault(id(s), []).append(i)
+        self._slot_ver = [0] * len(self.spots)
+        self.due_heap = []
+        for i, s in enumerate(self.spots):
+            md = s.min_due()
+            if md is not None: self.due_heap.append((md[0], i, 0))
+        heapq.heapify(self.due_heap)
+
+    def _refresh(self, spot):
+        total = spot.total
+        md = spot.min_due()
+        for i in self._slots.get(id(spot), ()):
+            self.tree.update(i, total)
+            self._slot_ver[i] += 1
+            if md is not None: heapq.heappush(self.due_heap, (md[0], i, self._slot_ver[i]))
+
+    def next_due(self):
+        h = self.due_heap
+        while h and self._slot_ver[h[0][1]] != h[0][2]:
+            heapq.heappop(h)
+        return h[0][:2] if h else None
+
+    def due_card(self, now):
+        with self.registry.lock:
+            top = self.next_due()
+            if top is None or top[0] > now: return None, None
+            return self.keys[top[1]], ALL_HANDS[self.spots[top[1]].min_due()[1]]
+
+    def due_cards(self, now, limit):
+        # До limit самых просроченных карточек пула - для пачки раздач, O(размер куч)
+        with self.registry.lock:
+            items, seen = [], set()
+            for i, s in enumerate(self.spots):
+                if id(s) in seen: continue
+                seen.add(id(s))
+                items.extend((due, i, idx) for due, idx in s.due_items(now))
+            return [(self.keys[i], ALL_HANDS[idx]) for _, i, idx in heapq.nsmallest(limit, items)]
+
+    def sample(self, rng, now=None):
+        with self.registry.lock:
+            if now is not None:
+                key, hand = self.due_card(now)
+                if key is not None: return key, hand
+            # Ничего не просрочено - взвешенное исследование
+            i = self.tree.sample(rng)
+            return self.keys[i], self.spots[i].sample(rng)
+
+class SamplerRegistry:
+    """Процессный реестр деревьев: строится один раз, обновляется из update_srs_smart."""
+
+    def __init__(self, srs):
+        self.srs = srs
+        self.lock = threading.RLock()
+        self._spots = {}
+        self._pools = {}
+
+    def spot(self, srs_id, training_range):
+        with self.lock:
+            by_range = self._spots.setdefault(srs_id, {})
+            s = by_range.get(training_range)
+            if s is None:
+                s = by_range[training_range] = SpotSampler(srs_id, training_range, self.srs)
+            return s
+
+    def pool(self, entries):
+        # entries: [(spot_key, srs_id, training_range)]
+        with self.lock:
+            p = PoolSampler(self, [(k, self.spot(sid, tr)) for k, sid, tr in entries])
+            for s in p.spots:
+                self._pools.setdefault(id(s), weakref.WeakSet()).add(p)
+            return p
+
+    def spot_total(self, srs_id):
+        with self.lock:
+            return max((s.total for s in self._spots.get(srs_id, {}).values()), default=0.0)
+
+    def update(self, srs_id, hand, weight, due=None):
+        with self.lock:
+            for s in self._spots.get(srs_id, {}).values():
+                if s.set_weight(hand, weight, due):
+                    for p in list(self._pools.get(id(s), ())): p._refresh(s)
+
+    def reload(self):
+        # Таблицу подменили (гидратация): деревья перечитываются на месте, поэтому
+        # пулы, которые уже держат сессии, продолжают получать update
+        with self.lock:
+            for by_range in self._spots.values():
+                for s in by_range.values():
+                    s.load(self.srs)
+                    for p in list(self._pools.get(id(s), ())): p._refresh(s)
@@ -0,0 +1,59 @@
+"""Интервальное повторение в стиле FSRS для пар (спот, рука).
+
+Состояние карточки: стабильность S (дней, при которой вспомним с p=0.9),
+сложность D (1..10), время следующего повтора и последнего ответа.
+HARD = провал (короткий шаг обучения), NORM = "помню", EASY = "легко".
+"""
+import math
+from collections import namedtuple
+
+DAY = 86400.0
+LEARN_STEP = 10 * 60.0
+TARGET_RETENTION = 0.9
+GRADES = {'hard': 1, 'normal': 3, 'easy': 4}
+INIT_STABILITY = {1: LEARN_STEP / DAY, 3: 1.0, 4: 4.0}
+MAX_STABILITY = 365.0
+
+ItemState = namedtuple("ItemState", ["stability", "difficulty", "due", "last", "reps", "lapses"])
+
+def _clamp(x, lo, hi):
+    return max(lo, min(x, hi))
+
+def _init_difficulty(g):
+    return _clamp(5.0 - 1.2 * (g - 3), 1.0, 10.0)
+
+def _next_difficulty(d, g):
+    d = d - 0.8 * (g - 3)
+    # Возврат к среднему, чтобы D не залипала на границах
+    return _clamp(0.9 * d + 0.1 * _init_difficulty(3), 1.0, 10.0)
+
+def retrievability(elapsed_days, stability):
+    return (1.0 + elapsed_days / (9.0 * stability)) ** -1
+
+def interval_days(stability):
+    return 9.0 * stability * (1.0 / TARGET_RETENTION - 1.0)
+
+def review(state, rating, now):
+    g = GRADES.get(rating, 3)
+    if state is None:
+        s, d = INIT_STABILITY[g], _init_difficulty(g)
+        reps, lapses = 1, int(g == 1)
+    else:
+        state = ItemState._make(state)
+        r = retrievability(max(now - state.last, 0.0) / DAY, state.stability)
+        d = _next_difficulty(state.difficulty, g)
+        reps, lapses = state.reps + 1, state.lapses + int(g == 1)
+        if g == 1:
+            s = min(state.stability, 0.5 * d ** -0.3 * ((state.stability + 1.0) ** 0.3 - 1.0) * math.exp(1.0 - r))
+        else:
+            growth = math.exp(1.5) * (11.0 - d) * state.stability ** -0.2 * (math.exp(1.0 - r) - 1.0)
+            s = state.stability * (1.0 + growth * (1.5 if g == 4 else 1.0))
+    s = _clamp(s, LEARN_STEP / DAY, MAX_STABILITY)
+    due = now + max(interval_days(s) * DAY, LEARN_STEP)
+    return ItemState(s, d, due, now, reps, lapses)
+
+def restore(stability, difficulty, due):
+    # Из реплики в Sheets: время последнего ответа восстанавливаем по интервалу
+    s = _clamp(float(stability), LEARN_STEP / DAY, MAX_STABILITY)
+    due = float(due)
+    return ItemState(s, _clamp(float(difficulty), 1.0, 10.0), due, due - max(interval_days(s) * DAY, LEARN_STEP), 1, 0)
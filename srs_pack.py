@@ -0,0 +1,162 @@
+"""Компактное хранение SRS: спот - маленький int, веса спота - uint16 на 169 рук.
+
+Раньше карточка была отдельным ключом "<spot_id>_<hand>": строка в dict
+каждой сессии и строка в листе SRS. Теперь SrsTable интернирует spot_id в
+индекс, а у спота два поля:
+
+    weights[i] - np.uint16[169] по индексам ranges.ALL_HANDS, 0 = вес не задан;
+    states[i]  - {индекс руки: (stability, difficulty, due, last, reps, lapses)}.
+
+В локальной базе и в листе SRS - одна строка на спот: Spot | Weights | Sched,
+массивы упакованы (в листе - base64). Строки старого формата
+"Key, Weight, Stability, Difficulty, Due" переводит migrate_legacy_rows.
+"""
+import base64
+import logging
+import numpy as np
+import scheduler
+from ranges import ALL_HANDS, HAND_INDEX
+
+_log = logging.getLogger(__name__)
+
+DEFAULT_SRS_WEIGHT = 100
+SRS_HEADER = ["Spot", "Weights", "Sched"]
+LEGACY_KEY_HEADER = "Key"
+N_HANDS = len(ALL_HANDS)
+
+_WEIGHTS_DTYPE = np.dtype("<u2")
+_STATE_DTYPE = np.dtype([("hand", "u1"), ("stability", "<f8"), ("difficulty", "<f8"), ("due", "<f8"),
+                         ("last", "<f8"), ("reps", "<u4"), ("lapses", "<u4")])
+
+class SrsTable:
+    """Веса и состояния планировщика всех спотов процесса."""
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.weights = []
+        self.states = []
+
+    def __len__(self):
+        # Карточек с заданным весом
+        return sum(int(np.count_nonzero(w)) for w in self.weights)
+
+    def intern(self, spot_id):
+        i = self.ids.get(spot_id)
+        if i is None:
+            i = self.ids[spot_id] = len(self.names)
+            self.names.append(spot_id)
+            self.weights.append(np.zeros(N_HANDS, np.uint16))
+            self.states.append({})
+        return i
+
+    def get(self, spot_id, hand, default=DEFAULT_SRS_WEIGHT):
+        i = self.ids.get(spot_id)
+        if i is None: return default
+        return int(self.weights[i][HAND_INDEX[hand]]) or default
+
+    def state(self, spot_id, hand):
+        i = self.ids.get(spot_id)
+        return None if i is None else self.states[i].get(HAND_INDEX[hand])
+
+    def set(self, spot_id, hand, weight, state=None):
+        i = self.intern(spot_id)
+        h = HAND_INDEX[hand]
+        self.weights[i][h] = weight
+        if state is not None: self.states[i][h] = tuple(state)
+        return i
+
+    def merge(self, spot_id, weights, states=None):
+        # Облачные значения только в пустые слоты: локальные записи важнее
+        i = self.intern(spot_id)
+        w = self.weights[i]
+        np.copyto(w, np.asarray(weights, np.uint16), where=(w == 0))
+        for h, st in (states or {}).items(): self.states[i].setdefault(h, tuple(st))
+        return i
+
+    def spot_weights(self, spot_id):
+        i = self.ids.get(spot_id)
+        return None if i is None else self.weights[i]
+
+    def spot_states(self, spot_id):
+        i = self.ids.get(spot_id)
+        return {} if i is None else self.states[i]
+
+    def due_count(self, now):
+        return sum(1 for states in self.states for st in states.values() if st[2] <= now)
+
+# --- УПАКОВКА ---
+
+def pack_weights(weights):
+    return np.asarray(weights, _WEIGHTS_DTYPE).tobytes()
+
+def unpack_weights(blob):
+    w = np.frombuffer(blob, _WEIGHTS_DTYPE)
+    if len(w) != N_HANDS: raise ValueError(f"Массив весов SRS: {len(w)} слотов вместо {N_HANDS}")
+    return w.astype(np.uint16)
+
+def pack_states(states):
+    items = sorted(dict(states).items())
+    arr = np.empty(len(items), _STATE_DTYPE)
+    for j, (h, st) in enumerate(items): arr[j] = (h,) + tuple(st)
+    return arr.tobytes()
+
+def unpack_states(blob):
+    return {int(r[0]): scheduler.ItemState(float(r[1]), float(r[2]), float(r[3]), float(r[4]), int(r[5]), int(r[6]))
+            for r in np.frombuffer(blob, _STATE_DTYPE)}
+
+def _b64(blob):
+    return base64.b64encode(blob).decode("ascii")
+
+def row_cells(table, spot_id):
+    # Ячейки Weights и Sched строки спота в листе SRS
+    i = table.ids[spot_id]
+    states = table.states[i]
+    return [_b64(pack_weights(table.weights[i])), _b64(pack_states(states)) if states else ""]
+
+def parse_row(row):
+    # Строка листа нового формата -> (spot_id, веса, состояния)
+    spot, w = row[0], row[1]
+    states = unpack_states(base64.b64decode(row[2])) if len(row) > 2 and row[2] else {}
+    if any(not 0 <= h < N_HANDS for h in states): raise ValueError(f"Состояния SRS спота {spot}: рука вне 0..{N_HANDS - 1}")
+    return str(spot), unpack_weights(base64.b64decode(w)), states
+
+# --- МИГРАЦИЯ СТАРОГО ФОРМАТА ---
+
+def split_key(key):
+    # "Jayser_Open_Raise_EP_open_raise_AKs" -> ("Jayser_Open_Raise_EP_open_raise", "AKs")
+    spot, _, hand = key.rpartition('_')
+    return (spot, hand) if spot and hand in HAND_INDEX else (None, None)
+
+def is_legacy_sheet(values):
+    return bool(values and values[0] and values[0][0] == LEGACY_KEY_HEADER)
+
+def migrate_legacy_rows(rows):
+    # [key, weight, stability, difficulty, due] -> [(spot_id, веса, состояния)]
+    table = SrsTable()
+    bad = 0
+    for r in rows:
+        if len(r) < 2 or not r[1]: continue
+        spot, hand = split_key(str(r[0]))
+        if spot is None: continue
+        try:
+            state = scheduler.restore(*r[2:5]) if len(r) >= 5 and all(r[2:5]) else None
+            table.set(spot, hand, int(r[1]), state)
+        except (TypeError, ValueError):
+            bad += 1
+    if bad: _log.warning("SRS: пропущено строк старого формата с битыми значениями: %d", bad)
+    return [(s, table.weights[i], table.states[i]) for i, s in enumerate(table.names)]
+
+def parse_sheet(values):
+    # Весь лист SRS (с заголовком) -> (спотов, старый ли формат)
+    # Битая ячейка Weights/Sched пропускает только свою строку, а не всю гидратацию
+    if is_legacy_sheet(values): return migrate_legacy_rows(values[1:]), True
+    spots, bad = [], []
+    for r in values[1:]:
+        if len(r) < 2 or not r[0] or not r[1]: continue
+        try:
+            spots.append(parse_row(r))
+        except ValueError:  # binascii.Error - тоже ValueError
+            bad.append(str(r[0]))
+    if bad: _log.warning("SRS: пропущены строки с битыми Weights/Sched (%d): %s", len(bad), ", ".join(bad[:10]))
+    return spots, False
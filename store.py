@@ -0,0 +1,354 @@
+"""Локальное хранилище SRS/истории/настроек (SQLite в режиме WAL).
+
+Это основная база: каждое действие пишется сюда одной транзакцией, а в
+таблицу outbox кладётся запись для репликации в Google Sheets. Outbox
+переживает рестарт процесса - если синхронизация упала, данные не теряются.
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+import srs_pack
+from ranges import HAND_INDEX
+
+HISTORY_COLUMNS = ["Date", "Spot", "Hand", "Result", "CorrectAction"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS srs_spots (
+    spot TEXT PRIMARY KEY,
+    weights BLOB NOT NULL,
+    states BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    spot TEXT NOT NULL,
+    hand TEXT NOT NULL,
+    result TEXT NOT NULL,
+    correct_action TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_date ON history(date);
+CREATE TABLE IF NOT EXISTS history_agg (
+    spot TEXT NOT NULL,
+    hand TEXT NOT NULL,
+    day TEXT NOT NULL,
+    action TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    PRIMARY KEY (spot, hand, day, action)
+);
+CREATE INDEX IF NOT EXISTS history_agg_day ON history_agg(day);
+CREATE TABLE IF NOT EXISTS srs_spot_rows (
+    spot TEXT PRIMARY KEY,
+    row INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+"""
+
+AGG_VERSION = 1
+
+# Строки с битой датой статистика отбрасывает (как раньше pd.to_datetime(errors='coerce'))
+_VALID_DATE = "date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+_IS_CORRECT = "CASE WHEN CAST(result AS REAL) = 1 THEN 1 ELSE 0 END"
+
+_AGG_UPSERT = """
+INSERT INTO history_agg(spot, hand, day, action, total, correct) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(spot, hand, day, action) DO UPDATE SET total = total + excluded.total, correct = correct + excluded.correct
+"""
+
+def _is_correct(result):
+    try:
+        return 1 if float(result) == 1 else 0
+    except (TypeError, ValueError):
+        return 0
+
+def _valid_day(date):
+    d = str(date)[:10]
+    return d if len(d) == 10 and d[4] == '-' and d[7] == '-' and d[:4].isdigit() else None
+
+def _next_day(day):
+    return (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+class LocalStore:
+    def __init__(self, path, replicate=True):
+        self.path = path
+        self.replicate = replicate
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        if self.get_meta("agg_version") != AGG_VERSION:
+            self._tx(self._rebuild_agg)
+            self.set_meta("agg_version", AGG_VERSION)
+        self._migrate_legacy_srs()
+        # Зеркало SRS в памяти: спот - индекс, веса - uint16[169] (см. srs_pack)
+        self.srs = srs_pack.SrsTable()
+        for spot, w, st in self._conn.execute("SELECT spot, weights, states FROM srs_spots"):
+            i = self.srs.intern(spot)
+            self.srs.weights[i] = srs_pack.unpack_weights(w)
+            self.srs.states[i] = srs_pack.unpack_states(st)
+
+    def _migrate_legacy_srs(self):
+        # Старая схема: строка на карточку (srs, srs_sched, srs_rows) -> строка на спот
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'srs'").fetchone() is None: return
+        table = srs_pack.SrsTable()
+        for key, w in self._conn.execute("SELECT key, weight FROM srs"):
+            spot, hand = srs_pack.split_key(key)
+            if spot is not None: table.set(spot, hand, w)
+        for r in self._conn.execute("SELECT key, stability, difficulty, due, last, reps, lapses FROM srs_sched"):
+            spot, hand = srs_pack.split_key(r[0])
+            if spot is not None and spot in table.ids: table.states[table.ids[spot]][HAND_INDEX[hand]] = tuple(r[1:])
+
+        def op(c):
+            c.executemany("INSERT OR REPLACE INTO srs_spots(spot, weights, states) VALUES (?, ?, ?)",
+                          [(s, srs_pack.pack_weights(table.weights[i]), srs_pack.pack_states(table.states[i]))
+                           for i, s in enumerate(table.names)])
+            c.execute("DROP TABLE srs"); c.execute("DROP TABLE IF EXISTS srs_sched"); c.execute("DROP TABLE IF EXISTS srs_rows")
+            # Лист SRS ещё в старом формате: вместо точечных правок - одна полная перезапись
+            had_srs = c.execute("DELETE FROM outbox WHERE kind = 'srs'").rowcount
+            if had_srs or self.get_meta("hydrated"): self._enqueue(c, "srs_compact", None)
+            c.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('srs_indexed', 'false')")
+        self._tx(op)
+
+    def _tx(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                res = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return res
+
+    def _enqueue(self, c, kind, payload):
+        if not self.replicate: return
+        c.execute("INSERT INTO outbox(kind, payload) VALUES (?, ?)", (kind, json.dumps(payload, ensure_ascii=False)))
+
+    # --- META ---
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    # --- SRS ---
+
+    def _save_spot(self, c, i):
+        c.execute("INSERT OR REPLACE INTO srs_spots(spot, weights, states) VALUES (?, ?, ?)",
+                  (self.srs.names[i], srs_pack.pack_weights(self.srs.weights[i]), srs_pack.pack_states(self.srs.states[i])))
+
+    def set_srs(self, spot_id, hand, weight, sched=None):
+        def op(c):
+            i = self.srs.set(spot_id, hand, weight, sched)
+            self._save_spot(c, i)
+            self._enqueue(c, "srs", spot_id)
+        self._tx(op)
+
+    def set_srs_many(self, items):
+        # items: [(spot_id, рука, вес, состояние)] по порядку; спот пишется и ставится в очередь один раз
+        def op(c):
+            touched = {}
+            for spot_id, hand, weight, sched in items: touched[spot_id] = self.srs.set(spot_id, hand, weight, sched)
+            for spot_id, i in touched.items():
+                self._save_spot(c, i)
+                self._enqueue(c, "srs", spot_id)
+        self._tx(op)
+
+    def merge_srs(self, items):
+        # items: [(spot_id, веса uint16[169], {рука: состояние})]; облако не затирает локальное
+        def op(c):
+            for spot, w, states in items: self._save_spot(c, self.srs.merge(spot, w, states))
+        self._tx(op)
+
+    def request_srs_compact(self):
+        def op(c):
+            self._enqueue(c, "srs_compact", None)
+            c.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('srs_indexed', 'false')")
+        self._tx(op)
+
+    # Индекс "спот -> номер строки в листе SRS" для точечных обновлений
+    def get_srs_rows(self, spots):
+        spots = list(spots)
+        out = {}
+        with self._lock:
+            for i in range(0, len(spots), 500):
+                chunk = spots[i:i + 500]
+                out.update(self._conn.execute(
+                    f"SELECT spot, row FROM srs_spot_rows WHERE spot IN ({','.join('?' * len(chunk))})", chunk).fetchall())
+        return out
+
+    def set_srs_rows(self, mapping, replace=False):
+        def op(c):
+            if replace: c.execute("DELETE FROM srs_spot_rows")
+            c.executemany("INSERT OR REPLACE INTO srs_spot_rows(spot, row) VALUES (?, ?)", list(mapping.items()))
+        self._tx(op)
+
+    # --- НАСТРОЙКИ ---
+
+    def get_settings(self):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM settings WHERE key = 'user'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_settings(self, settings, replicate=True):
+        def op(c):
+            c.execute("INSERT OR REPLACE INTO settings(key, value) VALUES ('user', ?)", (json.dumps(settings, ensure_ascii=False),))
+            if replicate: self._enqueue(c, "settings", None)
+        self._tx(op)
+
+    # --- ИСТОРИЯ ---
+
+    def add_history(self, row):
+        self.add_history_many([row])
+
+    def add_history_many(self, rows):
+        # Пачка решений - одна транзакция; в очередь на отправку каждая строка своим id
+        def op(c):
+            for row in rows:
+                cur = c.execute("INSERT INTO history(date, spot, hand, result, correct_action) VALUES (?, ?, ?, ?, ?)", row)
+                self._enqueue(c, "history", cur.lastrowid)
+            self._bump_agg(c, rows)
+        self._tx(op)
+
+    def import_history(self, rows):
+        def op(c):
+            c.executemany("INSERT INTO history(date, spot, hand, result, correct_action) VALUES (?, ?, ?, ?, ?)", rows)
+            self._bump_agg(c, rows)
+        self._tx(op)
+
+    def replace_history(self, rows):
+        # Строки, ещё ждущие отправки в outbox, остаются: набор читаем в той же транзакции,
+        # иначе ответ, записанный между чтением и удалением, пропал бы
+        def op(c):
+            keep = {json.loads(p) for (p,) in c.execute("SELECT payload FROM outbox WHERE kind = 'history'")}
+            ids = [i for (i,) in c.execute("SELECT id FROM history") if i not in keep]
+            c.executemany("DELETE FROM history WHERE id = ?", [(i,) for i in ids])
+            c.executemany("INSERT INTO history(date, spot, hand, result, correct_action) VALUES (?, ?, ?, ?, ?)", rows)
+            self._rebuild_agg(c)
+        self._tx(op)
+
+    def history_rows(self, since=None, max_id=None):
+        sql = "SELECT date, spot, hand, result, correct_action FROM history"
+        cond, args = [], []
+        if since is not None: cond.append("date >= ?"); args.append(since)
+        if max_id is not None: cond.append("id <= ?"); args.append(max_id)
+        if cond: sql += " WHERE " + " AND ".join(cond)
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY id", args).fetchall()
+
+    def history_by_ids(self, ids):
+        out = []
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                out += self._conn.execute(
+                    f"SELECT date, spot, hand, result, correct_action FROM history WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY id",
+                    chunk).fetchall()
+        return out
+
+    def delete_history(self, before=None):
+        def op(c):
+            if before is None:
+                c.execute("DELETE FROM history")
+                c.execute("DELETE FROM history_agg")
+                self._enqueue(c, "history_clear", None)
+            else:
+                c.execute("DELETE FROM history WHERE date < ?", (before,))
+                self._trim_agg(c, before)
+                self._enqueue(c, "history_trim", {"before": before})
+        self._tx(op)
+
+    # --- АГРЕГАТЫ СТАТИСТИКИ: (спот, рука, день, верное действие) -> всего / верно ---
+
+    def _bump_agg(self, c, rows):
+        acc = {}
+        for date, spot, hand, result, action in rows:
+            day = _valid_day(date)
+            if day is None: continue
+            k = (spot, hand, day, action)
+            t, ok = acc.get(k, (0, 0))
+            acc[k] = (t + 1, ok + _is_correct(result))
+        c.executemany(_AGG_UPSERT, [k + v for k, v in acc.items()])
+
+    def _rebuild_agg(self, c):
+        c.execute("DELETE FROM history_agg")
+        c.execute(f"""INSERT INTO history_agg(spot, hand, day, action, total, correct)
+            SELECT spot, hand, substr(date, 1, 10), correct_action, COUNT(*), SUM({_IS_CORRECT})
+            FROM history WHERE {_VALID_DATE} GROUP BY spot, hand, substr(date, 1, 10), correct_action""")
+
+    def _trim_agg(self, c, before):
+        # Целые дни до отсечки просто удаляем, пограничный день пересчитываем по сырым строкам
+        day = before[:10]
+        c.execute("DELETE FROM history_agg WHERE day <= ?", (day,))
+        c.execute(f"""INSERT INTO history_agg(spot, hand, day, action, total, correct)
+            SELECT spot, hand, substr(date, 1, 10), correct_action, COUNT(*), SUM({_IS_CORRECT})
+            FROM history WHERE date >= ? AND date < ? AND {_VALID_DATE}
+            GROUP BY spot, hand, substr(date, 1, 10), correct_action""", (day, _next_day(day)))
+
+    def stats_spots(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT spot FROM history_agg ORDER BY spot")]
+
+    def spot_stats(self, since=None, spots=None):
+        # Окно [since, now]: полные дни из агрегатов + хвост пограничного дня по индексу date
+        spot_cond, spot_args = "", []
+        if spots is not None:
+            spot_cond = f" AND spot IN ({','.join('?' * len(spots))})"; spot_args = list(spots)
+        out = {}
+        with self._lock:
+            if since is None:
+                q = self._conn.execute(f"SELECT spot, SUM(total), SUM(correct) FROM history_agg WHERE 1{spot_cond} GROUP BY spot", spot_args)
+            else:
+                day = since[:10]
+                q = self._conn.execute(f"SELECT spot, SUM(total), SUM(correct) FROM history_agg WHERE day > ?{spot_cond} GROUP BY spot", [day] + spot_args)
+            for spot, t, ok in q: out[spot] = [t, ok]
+            if since is not None:
+                q = self._conn.execute(
+                    f"SELECT spot, COUNT(*), SUM({_IS_CORRECT}) FROM history WHERE date >= ? AND date < ? AND {_VALID_DATE}{spot_cond} GROUP BY spot",
+                    [since, _next_day(since[:10])] + spot_args)
+                for spot, t, ok in q:
+                    cur = out.setdefault(spot, [0, 0]); cur[0] += t; cur[1] += ok
+        return {k: tuple(v) for k, v in out.items()}
+
+    def history_log(self, since=None, spots=None, result=None, limit=1000):
+        cond, args = [_VALID_DATE], []
+        if since is not None: cond.append("date >= ?"); args.append(since)
+        if spots is not None: cond.append(f"spot IN ({','.join('?' * len(spots))})"); args += list(spots)
+        if result is not None: cond.append(f"{_IS_CORRECT} = ?"); args.append(result)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT date, spot, hand, correct_action, result FROM history WHERE {' AND '.join(cond)} ORDER BY date DESC LIMIT ?",
+                args + [limit]).fetchall()
+
+    # --- OUTBOX ---
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def peek_outbox(self, limit=None):
+        sql = "SELECT id, kind, payload FROM outbox ORDER BY id"
+        if limit: sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [(i, k, json.loads(p)) for i, k, p in self._conn.execute(sql)]
+
+    def ack_outbox(self, ids):
+        self._tx(lambda c: c.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids]))
@@ -0,0 +1,322 @@
+"""Фоновая репликация локального outbox в Google Sheets.
+
+Один поток на процесс: UI-сессии только пишут в SQLite и будят воркер,
+а он пачкой (по размеру или по таймеру) отправляет накопленное от всех
+сессий, с экспоненциальным backoff при ошибках и финальным сбросом на выходе.
+На пустой базе воркер сначала гидратирует её из таблицы (hydrate) и до
+этого outbox не трогает: без индекса строк SRS отправка затёрла бы лист.
+"""
+import re
+import json
+import time
+import atexit
+import random
+import threading
+import profiler
+import ratelimit
+import srs_pack
+from store import HISTORY_COLUMNS
+
+SYNC_BATCH_SIZE = 25
+SYNC_MAX_DELAY = 15.0
+SYNC_BACKOFF_BASE = 2.0
+SYNC_BACKOFF_MAX = 300.0
+SHUTDOWN_FLUSH_TIMEOUT = 10.0
+HISTORY_PULL_INTERVAL = 60.0
+
+TRIM_SEARCH_FANOUT = 64
+
+def _find_first_row_since(ws, before, last_row):
+    # Лог в листе только дописывается, значит даты идут по возрастанию:
+    # ищем первую строку с date >= before k-арным поиском, одна пачка проб на раунд
+    lo, hi = 2, last_row + 1
+    while lo < hi:
+        if hi - lo <= TRIM_SEARCH_FANOUT:
+            probes = list(range(lo, hi))
+        else:
+            step = (hi - lo) / TRIM_SEARCH_FANOUT
+            probes = sorted({lo + int(i * step) for i in range(TRIM_SEARCH_FANOUT)})
+        new_lo, new_hi = lo, hi
+        for r, vr in zip(probes, ws.batch_get([f"A{r}" for r in probes])):
+            cell = vr[0][0] if vr and vr[0] else ""
+            if cell and cell < before: new_lo = r + 1
+            else: new_hi = r; break
+        lo, hi = new_lo, new_hi
+    return lo
+
+def _trim_sheet_history(db, ws, before):
+    known = db.get_meta("history_sheet_rows")
+    last_row = known if known is not None else ws.row_count
+    first_keep = _find_first_row_since(ws, before, last_row)
+    if first_keep > 2:
+        # Один запрос на удаление непрерывного диапазона старых строк
+        ws.delete_rows(2, first_keep - 1)
+        if known is not None:
+            db.set_meta("history_sheet_rows", max(known - (first_keep - 2), 1))
+
+def _updated_rows(resp):
+    m = re.search(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?", ((resp or {}).get("updates") or {}).get("updatedRange", ""))
+    if not m: return None, None
+    return int(m.group(1)), int(m.group(2) or m.group(1))
+
+def _first_updated_row(resp):
+    return _updated_rows(resp)[0]
+
+def _norm_history_row(r):
+    return tuple((list(r) + [""] * 5)[:5])
+
+# --- ИНКРЕМЕНТАЛЬНОЕ ЧТЕНИЕ ИСТОРИИ ---
+# meta.history_sheet_rows - сколько строк листа History (с заголовком) уже есть в локальной базе.
+# Свои строки учитываем по ответу append_rows, чужие (другой инстанс) докачиваем хвостом.
+
+def append_history_rows(db, ws, rows):
+    known = db.get_meta("history_sheet_rows")
+    start, end = _updated_rows(ws.append_rows(rows))
+    if known is None or start is None:
+        db.set_meta("history_sheet_rows", None)
+        return
+    if start > known + 1:
+        # Между нашими строками вклинился кто-то ещё - забираем только этот зазор
+        gap = ws.get(f"A{known + 1}:E{start - 1}")
+        db.import_history([_norm_history_row(r) for r in gap if r])
+    db.set_meta("history_sheet_rows", end)
+
+def refetch_history(db, ws):
+    # Полная перекачка: только когда счётчик строк потерян (инвалидация)
+    vals = ws.get_all_values()
+    # Неотправленные строки replace_history сохранит сама, в своей транзакции
+    db.replace_history([_norm_history_row(r) for r in vals[1:] if r])
+    db.set_meta("history_sheet_rows", max(len(vals), 1))
+
+def pull_history_tail(db, ws):
+    known = db.get_meta("history_sheet_rows")
+    if known is None:
+        return refetch_history(db, ws)
+    tail = ws.get(f"A{known + 1}:E")
+    if not tail: return
+    db.import_history([_norm_history_row(r) for r in tail if r])
+    db.set_meta("history_sheet_rows", known + len(tail))
+
+SRS_HEADER = srs_pack.SRS_HEADER
+
+# --- ХОЛОДНЫЙ СТАРТ ---
+# SRS целиком, Settings!A1 и первая строка данных History (есть ли что докачивать) -
+# столбец дат целиком был бы O(истории) байт на холодном старте
+HYDRATE_RANGES = ("SRS!A1:E", "Settings!A1", "History!A2:E2")
+
+def hydrate(db, batch_get):
+    # Один values:batchGet вместо цепочки чтений; локальные записи важнее облачных.
+    # Сами строки истории докачивает pull_history_tail - возвращаем, нужен ли он
+    srs_vals, set_vals, hist_first = batch_get(list(HYDRATE_RANGES))
+    spots, legacy = srs_pack.parse_sheet(srs_vals)
+    db.merge_srs(spots)
+    if legacy:
+        # Лист в формате "строка на карточку" - перепишем его целиком в новом формате
+        db.request_srs_compact()
+    else:
+        db.set_srs_rows({str(r[0]): i + 2 for i, r in enumerate(srs_vals[1:]) if r and r[0]}, replace=True)
+        db.set_meta("srs_indexed", True)
+    if db.get_settings() is None:
+        set_val = set_vals[0][0] if set_vals and set_vals[0] else ""
+        db.save_settings(json.loads(set_val) if set_val else {}, replicate=False)
+    db.set_meta("history_sheet_rows", 1)
+    db.set_meta("hydrated", True)
+    return bool(hist_first)
+
+def push_srs_delta(db, ws, spots):
+    # Меняем только строки изменившихся спотов одним batch_update, новые споты - append
+    rows = db.get_srs_rows(spots)
+    known = [s for s in sorted(spots) if s in db.srs.ids]
+    updates = [{"range": f"B{rows[s]}:C{rows[s]}", "values": [srs_pack.row_cells(db.srs, s)]}
+               for s in known if s in rows]
+    new_spots = [s for s in known if s not in rows]
+    if updates:
+        ws.batch_update(updates)
+    if new_spots:
+        start = _first_updated_row(ws.append_rows([[s] + srs_pack.row_cells(db.srs, s) for s in new_spots]))
+        if start is None:
+            # Не знаем, куда легли строки - следующая синхронизация перечитает индекс
+            db.set_meta("srs_indexed", False)
+        else:
+            db.set_srs_rows({s: start + i for i, s in enumerate(new_spots)})
+
+def index_srs_sheet(db, ws):
+    # Индекс строк по колонке спотов - одно чтение; False - лист в старом формате
+    keys = ws.col_values(1)
+    if keys and keys[0] != SRS_HEADER[0]: return False
+    db.set_srs_rows({k: i + 2 for i, k in enumerate(keys[1:]) if k}, replace=True)
+    db.set_meta("srs_indexed", True)
+    return True
+
+def compact_srs_sheet(db, ws):
+    # Полная перезапись листа SRS: явная компактизация, миграция формата или потерянный индекс
+    spots = sorted(db.srs.names)
+    ws.update(values=[SRS_HEADER] + [[s] + srs_pack.row_cells(db.srs, s) for s in spots], range_name="A1")
+    # Хвост и лишние столбцы (старый формат был шире)
+    ws.batch_clear([f"A{len(spots) + 2}:E", "D1:E"])
+    db.set_srs_rows({s: i + 2 for i, s in enumerate(spots)}, replace=True)
+    db.set_meta("srs_indexed", True)
+
+def replicate_outbox(db, sheets):
+    # Отправляем outbox по порядку; каждая запись удаляется только после успешной отправки
+    entries = db.peek_outbox()
+    hist_ids, hist_entry_ids = [], []
+    srs_entry_ids, settings_entry_ids = [], []
+    srs_spots = set()
+    compact = False
+
+    def flush_history():
+        if hist_ids:
+            rows = [list(r) for r in db.history_by_ids(hist_ids)]
+            if rows: append_history_rows(db, sheets["History"], rows)
+            db.ack_outbox(hist_entry_ids)
+            hist_ids.clear(); hist_entry_ids.clear()
+
+    for entry_id, kind, payload in entries:
+        if kind == "history":
+            hist_ids.append(payload); hist_entry_ids.append(entry_id)
+        elif kind == "history_clear":
+            hist_ids.clear(); db.ack_outbox(hist_entry_ids); hist_entry_ids.clear()
+            sheets["History"].clear()
+            sheets["History"].append_row(HISTORY_COLUMNS)
+            db.set_meta("history_sheet_rows", 1)
+            db.ack_outbox([entry_id])
+        elif kind == "history_trim":
+            flush_history()
+            _trim_sheet_history(db, sheets["History"], payload["before"])
+            db.ack_outbox([entry_id])
+        elif kind == "srs":
+            srs_entry_ids.append(entry_id); srs_spots.add(payload)
+        elif kind == "srs_compact":
+            srs_entry_ids.append(entry_id); compact = True
+        elif kind == "settings":
+            settings_entry_ids.append(entry_id)
+    flush_history()
+
+    if srs_entry_ids:
+        # Индекс потерян - перечитываем колонку спотов; старый формат листа - полная перезапись
+        if not compact and (db.get_meta("srs_indexed") or index_srs_sheet(db, sheets["SRS"])):
+            push_srs_delta(db, sheets["SRS"], srs_spots)
+        else:
+            compact_srs_sheet(db, sheets["SRS"])
+        db.ack_outbox(srs_entry_ids)
+    if settings_entry_ids:
+        sheets["Settings"].update_acell('A1', json.dumps(db.get_settings() or {}))
+        db.ack_outbox(settings_entry_ids)
+
+class SyncWorker:
+    def __init__(self, db, sheets_factory, batch_size=SYNC_BATCH_SIZE, max_delay=SYNC_MAX_DELAY, bootstrap=None):
+        self.db = db
+        self.sheets_factory = sheets_factory
+        self.bootstrap = bootstrap
+        self.hydrated = threading.Event()
+        if bootstrap is None: self.hydrated.set()
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.last_error = None
+        self.last_sync_at = None
+        self.failures = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._urgent = False
+        self._pull_requested = False
+        self.last_pull_at = None
+        self._first_pending_at = time.monotonic() if db.pending_count() else None
+        self._retry_at = 0.0
+        # notify() из UI и сброс таймера в flush() - под одним замком, иначе запись,
+        # сделанная между проверкой outbox и сбросом, ждала бы следующего notify
+        self._pending_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="sheets-sync", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def notify(self, urgent=False):
+        # Вызывается из UI: никаких сетевых запросов, только сигнал потоку
+        with self._pending_lock:
+            if self._first_pending_at is None: self._first_pending_at = time.monotonic()
+        if urgent: self._urgent = True
+        self._wake.set()
+
+    def request_history_pull(self):
+        if self.last_pull_at is not None and time.monotonic() - self.last_pull_at < HISTORY_PULL_INTERVAL: return
+        self._pull_requested = True
+        self._wake.set()
+
+    def _due(self, now):
+        if now < self._retry_at: return False
+        if self._pull_requested or not self.hydrated.is_set(): return True
+        if self._first_pending_at is None: return False
+        if self._urgent or now - self._first_pending_at >= self.max_delay: return True
+        return self.db.pending_count() >= self.batch_size
+
+    def _next_wakeup(self, now):
+        if not self.hydrated.is_set(): return self._retry_at - now
+        if self._first_pending_at is None: return None
+        return max(self._retry_at, self._first_pending_at + self.max_delay) - now
+
+    def _reset_pending(self):
+        # Счётчик перечитываем под замком notify(): новая запись не потеряет таймер
+        with self._pending_lock:
+            pending = self.db.pending_count()
+            self._first_pending_at = time.monotonic() if pending else None
+        return pending
+
+    def flush(self):
+        hydrating = not self.hydrated.is_set()
+        if not hydrating and not self._pull_requested and self.db.pending_count() == 0:
+            self._urgent = False
+            if self._reset_pending() == 0: return True
+        pending = self.db.pending_count()
+        try:
+            with profiler.phase("sync.flush"):
+                if hydrating:
+                    if self.bootstrap(): self._pull_requested = True
+                    self.hydrated.set()
+                    pending = self.db.pending_count()
+                if pending or self._pull_requested:
+                    sheets = self.sheets_factory()
+                    if pending: replicate_outbox(self.db, sheets)
+                    if self._pull_requested:
+                        # Сначала отправили своё, потом докачиваем чужой хвост - свои строки не задвоятся
+                        pull_history_tail(self.db, sheets["History"])
+                        self._pull_requested = False
+                        self.last_pull_at = time.monotonic()
+        except BaseException as e:  # get_gspread_client может кинуть st.stop()
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            delay = min(SYNC_BACKOFF_BASE * 2 ** (self.failures - 1), SYNC_BACKOFF_MAX)
+            # Упёрлись в квоту - раньше конца минутного окна повторять бессмысленно
+            if ratelimit.is_quota_error(e) or isinstance(e, ratelimit.RateLimited):
+                delay = max(delay, ratelimit.QUOTA_COOLDOWN)
+            self._retry_at = time.monotonic() + delay * random.uniform(0.8, 1.2)
+            return False
+        self.failures = 0
+        self.last_error = None
+        self.last_sync_at = time.time()
+        self._retry_at = 0.0
+        self._urgent = False
+        self._reset_pending()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if self._due(now):
+                self.flush()
+                profiler.flush()
+                continue
+            timeout = self._next_wakeup(now)
+            self._wake.wait(None if timeout is None else max(timeout, 0.05))
+            self._wake.clear()
+
+    def stop(self):
+        if self._stop.is_set(): return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=SHUTDOWN_FLUSH_TIMEOUT)
+        # Поток завис в сетевом запросе - второй flush параллельно с ним задвоил бы
+        # отправку; всё неотправленное останется в outbox до следующего запуска
+        if self._thread.is_alive(): return
+        # Финальный сброс
+        self._retry_at = 0.0
+        if self.hydrated.is_set(): self.flush()
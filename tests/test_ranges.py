@@ -0,0 +1,53 @@
+import pytest
+from ranges import compile_range, get_weight, parse_range_to_list, tokenize_range
+
+# --- ДИАПАЗОНЫ ---
+
+@pytest.mark.parametrize("notation, hands", [
+    ("77+", ["AA", "KK", "QQ", "JJ", "TT", "99", "88", "77"]),
+    ("ATs+", ["AKs", "AQs", "AJs", "ATs"]),
+    ("K9+", ["KQs", "KQo", "KJs", "KJo", "KTs", "KTo", "K9s", "K9o"]),
+    ("22-55", ["55", "44", "33", "22"]),
+    ("KTo-K8o", ["KTo", "K9o", "K8o"]),
+])
+def test_spans(notation, hands):
+    assert parse_range_to_list(notation) == hands
+    w = compile_range(notation)
+    assert all(w.weight(h) == 100.0 for h in hands)
+    assert int(w.listed.sum()) == len(hands)
+
+# --- ВЕСА ---
+
+@pytest.mark.parametrize("notation", ["AA:0.5", "AA:50", "AA:50%"])
+def test_weight_forms(notation):
+    assert get_weight("AA", notation) == 50.0
+
+def test_weight_bounds():
+    assert get_weight("AA", "AA:1") == 100.0
+    assert get_weight("AA", "AA:150") == 100.0
+    assert get_weight("KK", "AA") == 0.0
+
+# --- КОМБО ---
+
+def test_combo_is_class_share():
+    assert tokenize_range("AsKs") == [(["AKs"], "AsKs", 100.0)]
+    assert get_weight("AKs", "AsKs") == 25.0
+    # Разномастная: 12 комбо, (100 + 50) / 12
+    assert get_weight("AKo", "AsKd, AhKc:50") == 12.5
+    # Класс с хотя бы одним упомянутым комбо считается перечисленным
+    cr = compile_range("AsKs")
+    assert cr.mixed and parse_range_to_list("AsKs") == ["AKs"] and int(cr.listed.sum()) == 1
+
+def test_class_only_range_is_not_mixed():
+    assert not compile_range("AA, AKs:50, T9o+").mixed
+
+# --- ПЕРВОЕ УПОМИНАНИЕ ---
+
+def test_first_mention_wins():
+    assert get_weight("AA", "AA:50, AA") == 50.0
+    assert get_weight("AA", "77+:30, AA") == 30.0
+    # Комбо до класса: класс заполняет только оставшиеся 3 комбо
+    assert get_weight("AKs", "AsKs:0, AKs") == 75.0
+    # Класс до комбо: комбо уже закрыто классом
+    assert get_weight("AKs", "AKs, AsKs:0") == 100.0
+    assert not compile_range("AKs, AsKs:0").mixed
@@ -0,0 +1,81 @@
+import sqlite3
+import pytest
+import scheduler
+import srs_pack
+import store
+
+SPOT = "Jayser_Open_Raise_EP_open_raise"
+
+def _same_state(a, b):
+    assert a is not None and b is not None
+    assert tuple(a) == pytest.approx(tuple(b))
+
+# --- СТАРАЯ ТАБЛИЦА SQLITE ---
+
+def _legacy_db(path):
+    # Схема до перехода на строку на спот: строка на карточку
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE srs (key TEXT PRIMARY KEY, weight INTEGER NOT NULL);
+        CREATE TABLE srs_sched (key TEXT PRIMARY KEY, stability REAL NOT NULL, difficulty REAL NOT NULL,
+                                due REAL NOT NULL, last REAL NOT NULL, reps INTEGER NOT NULL, lapses INTEGER NOT NULL);
+        CREATE TABLE srs_rows (key TEXT PRIMARY KEY, row INTEGER NOT NULL);
+        CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL);
+    """)
+    conn.executemany("INSERT INTO srs(key, weight) VALUES (?, ?)",
+                     [(f"{SPOT}_AA", 400), (f"{SPOT}_AKs", 150), ("Other_spot_72o", 90), ("broken_key", 10)])
+    conn.execute("INSERT INTO srs_sched VALUES (?, 3.5, 5.0, 1700000000.0, 1699900000.0, 2, 1)", (f"{SPOT}_AA",))
+    conn.execute("INSERT INTO outbox(kind, payload) VALUES ('srs', '\"x\"')")
+    conn.commit(); conn.close()
+
+def test_legacy_table_migrates_to_packed(tmp_path):
+    path = str(tmp_path / "trainer.db")
+    _legacy_db(path)
+    db = store.LocalStore(path)
+    assert db.srs.get(SPOT, "AA") == 400 and db.srs.get(SPOT, "AKs") == 150
+    assert db.srs.get("Other_spot", "72o") == 90
+    assert "broken" not in db.srs.ids
+    _same_state(db.srs.state(SPOT, "AA"), scheduler.ItemState(3.5, 5.0, 1700000000.0, 1699900000.0, 2, 1))
+    # Старые точечные правки листа заменяет одна компактизация
+    assert [k for _, k, _ in db.peek_outbox()] == ["srs_compact"]
+    assert db.get_meta("srs_indexed") is False
+    tables = {n for (n,) in db._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert not tables & {"srs", "srs_sched", "srs_rows"}
+
+    # Упакованные строки переживают переоткрытие базы
+    again = store.LocalStore(path)
+    assert again.srs.get(SPOT, "AA") == 400
+    _same_state(again.srs.state(SPOT, "AA"), db.srs.state(SPOT, "AA"))
+
+# --- СТАРЫЙ ЛИСТ ---
+
+def test_legacy_sheet_round_trips_to_packed():
+    values = [["Key", "Weight", "Stability", "Difficulty", "Due"],
+              [f"{SPOT}_AA", "400", "3.5", "5", "1700000000"],
+              [f"{SPOT}_KK", "150", "", "", ""],
+              ["not_a_hand_XX", "90", "", "", ""]]
+    spots, legacy = srs_pack.parse_sheet(values)
+    assert legacy and [s for s, _, _ in spots] == [SPOT]
+
+    table = srs_pack.SrsTable()
+    for spot, w, states in spots: table.merge(spot, w, states)
+    assert table.get(SPOT, "AA") == 400 and table.get(SPOT, "KK") == 150
+    _same_state(table.state(SPOT, "AA"), scheduler.restore(3.5, 5, 1700000000))
+    assert table.state(SPOT, "KK") is None
+
+    # Новый формат: строка на спот, веса и состояния в base64 - и обратно без потерь
+    sheet = [srs_pack.SRS_HEADER] + [[s] + srs_pack.row_cells(table, s) for s in table.names]
+    parsed, legacy = srs_pack.parse_sheet(sheet)
+    assert not legacy and len(parsed) == 1
+    spot, w, states = parsed[0]
+    assert spot == SPOT and (w == table.spot_weights(SPOT)).all()
+    assert states.keys() == table.spot_states(SPOT).keys()
+    for h, st in states.items(): _same_state(st, table.spot_states(SPOT)[h])
+
+def test_malformed_sheet_rows_are_skipped():
+    good = srs_pack.SrsTable(); good.set(SPOT, "AA", 300)
+    values = [srs_pack.SRS_HEADER, [SPOT] + srs_pack.row_cells(good, SPOT),
+              ["Bad_spot", srs_pack.row_cells(good, SPOT)[0], "!!not base64!!"],
+              ["Short_spot", "QUJD", ""]]
+    spots, legacy = srs_pack.parse_sheet(values)
+    assert not legacy and [s for s, _, _ in spots] == [SPOT]
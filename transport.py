@@ -0,0 +1,176 @@
+"""Транспорт реплики: откуда берутся листы SRS, Settings и History.
+
+Лист - это подмножество gspread.Worksheet, которым пользуются utils и sync
+(эталон - fake_sheets.FakeWorksheet): чтение, batch update, append и clear. Реализации:
+
+    gspread - настоящая Google-таблица (по умолчанию, если есть ключ);
+    sqlite  - локальный файл, те же листы построчно в SQLite;
+    memory  - таблица в памяти процесса с имитацией задержек, 5xx и 429.
+
+Кроме листов транспорт умеет batch_get: несколько диапазонов разных листов
+одним запросом values:batchGet (холодный старт читает всё нужное за раз).
+
+Выбор - из настроек: секция [storage] в secrets или переменные окружения
+TRAINER_STORAGE (backend) и TRAINER_STORAGE_PATH.
+"""
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+import profiler
+from fake_sheets import FakeWorksheet, FaultInjector, FaultyWorksheet, parse_a1
+from store import HISTORY_COLUMNS
+from srs_pack import SRS_HEADER
+
+SHEETS = ("SRS", "Settings", "History")
+BACKENDS = ("gspread", "sqlite", "memory", "none")
+DEFAULT_SQLITE_PATH = 'sheets.db'
+_INITIAL_ROWS = {"SRS": [SRS_HEADER], "Settings": [], "History": [HISTORY_COLUMNS]}
+
+class Transport(ABC):
+    # Бэкенд без любого из методов падает уже при создании, а не на первом запросе
+    name = None
+
+    @abstractmethod
+    def worksheets(self):
+        # {"SRS": ..., "Settings": ..., "History": ...}
+        ...
+
+    @abstractmethod
+    def batch_get(self, ranges):
+        # ["SRS!A1:E", "Settings!A1"] -> список значений на каждый диапазон, один запрос
+        ...
+
+def _sheet_title(rng):
+    return rng.split('!')[0].strip("'")
+
+def _batch_slice(sheets, ranges):
+    return [sheets[_sheet_title(r)]._slice(r) for r in ranges]
+
+class GspreadTransport(Transport):
+    name = "gspread"
+
+    def __init__(self, client, spreadsheet_id):
+        self.client = client
+        self.spreadsheet_id = spreadsheet_id
+
+    def worksheets(self):
+        sh = self.client.open_by_key(self.spreadsheet_id)
+        # Прокси считает время и объём каждого вызова API (когда включён профайлер)
+        return {name: profiler.InstrumentedWorksheet(sh.worksheet(name)) for name in SHEETS}
+
+    def batch_get(self, ranges):
+        # Запрос по id таблицы: без open_by_key и лишнего чтения метаданных
+        resp = profiler.timed_call("values.batchGet", self.client.http_client.values_batch_get,
+                                   self.spreadsheet_id, list(ranges))
+        return [vr.get("values", []) for vr in resp.get("valueRanges", [])]
+
+class SqliteWorksheet(FakeWorksheet):
+    # Строки листа в памяти, каждая запись сразу дублируется в файл
+    def __init__(self, conn, lock, title):
+        self._conn = conn
+        self._lock = lock
+        rows = [json.loads(v) for (v,) in conn.execute(
+            "SELECT vals FROM cells WHERE sheet = ? ORDER BY idx", (title,))]
+        super().__init__(title, rows)
+
+    def _save(self, start=0, end=None):
+        end = len(self.rows) if end is None else min(end, len(self.rows))
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO cells(sheet, idx, vals) VALUES (?, ?, ?)",
+                                   [(self.title, i, json.dumps(self.rows[i], ensure_ascii=False)) for i in range(start, end)])
+
+    def _save_all(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cells WHERE sheet = ?", (self.title,))
+        self._save()
+
+    def update(self, values=None, range_name="A1"):
+        super().update(values, range_name)
+        r1 = parse_a1(range_name)[0]
+        self._save(r1 - 1, r1 - 1 + len(values))
+
+    def batch_update(self, data):
+        super().batch_update(data)
+        for d in data:
+            r1 = parse_a1(d["range"])[0]
+            self._save(r1 - 1, r1 - 1 + len(d["values"]))
+
+    def append_rows(self, values, **kwargs):
+        before = len(self.rows)
+        res = super().append_rows(values, **kwargs)
+        if len(self.rows) - len(values) != before: self._save_all()  # срезали пустой хвост
+        else: self._save(before)
+        return res
+
+    def clear(self):
+        super().clear()
+        self._save_all()
+
+    def batch_clear(self, ranges):
+        super().batch_clear(ranges)
+        self._save_all()
+
+    def delete_rows(self, start_index, end_index=None):
+        super().delete_rows(start_index, end_index)
+        self._save_all()
+
+class SqliteTransport(Transport):
+    name = "sqlite"
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS cells(sheet TEXT, idx INTEGER, vals TEXT, PRIMARY KEY(sheet, idx))")
+            for name, rows in _INITIAL_ROWS.items():
+                if rows and self._conn.execute("SELECT 1 FROM cells WHERE sheet = ? LIMIT 1", (name,)).fetchone() is None:
+                    self._conn.executemany("INSERT INTO cells(sheet, idx, vals) VALUES (?, ?, ?)",
+                                           [(name, i, json.dumps(r)) for i, r in enumerate(rows)])
+        self._raw = None
+        self._sheets = None
+
+    def worksheets(self):
+        if self._sheets is None:
+            self._raw = {name: SqliteWorksheet(self._conn, self._lock, name) for name in SHEETS}
+            self._sheets = {name: profiler.InstrumentedWorksheet(ws) for name, ws in self._raw.items()}
+        return self._sheets
+
+    def batch_get(self, ranges):
+        self.worksheets()
+        return profiler.timed_call("values.batchGet", _batch_slice, self._raw, ranges)
+
+class MemoryTransport(Transport):
+    name = "memory"
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, quota_per_minute=None, seed=None, **fault_kwargs):
+        self.faults = FaultInjector(latency, jitter, error_rate, quota_per_minute, seed, **fault_kwargs)
+        self.sheets = {name: FakeWorksheet(name, rows) for name, rows in _INITIAL_ROWS.items()}
+
+    def worksheets(self):
+        return {name: profiler.InstrumentedWorksheet(FaultyWorksheet(ws, self.faults))
+                for name, ws in self.sheets.items()}
+
+    def batch_get(self, ranges):
+        def call():
+            # Один запрос - одна задержка и одно место в квоте
+            self.faults.before_call()
+            return _batch_slice(self.sheets, ranges)
+        return profiler.timed_call("values.batchGet", call)
+
+def make_transport(settings, gspread_client=None, spreadsheet_id=None):
+    # settings: {"backend": ..., плюс параметры бэкенда}; клиент gspread создаёт вызывающий
+    backend = settings.get("backend", "none")
+    if backend == "gspread":
+        return GspreadTransport(gspread_client, spreadsheet_id)
+    if backend == "sqlite":
+        return SqliteTransport(settings.get("path", DEFAULT_SQLITE_PATH))
+    if backend == "memory":
+        return MemoryTransport(latency=float(settings.get("latency_ms", 0)) / 1000.0,
+                               jitter=float(settings.get("jitter_ms", 0)) / 1000.0,
+                               error_rate=float(settings.get("error_rate", 0.0)),
+                               quota_per_minute=int(settings["quota_per_minute"]) if settings.get("quota_per_minute") else None,
+                               seed=settings.get("seed"))
+    if backend == "none": return None
+    raise ValueError(f"Неизвестный backend хранилища: {backend} (варианты: {', '.join(BACKENDS)})")
@@ -1,14 +1,28 @@
 import streamlit as st
 import json
-import pandas as pd
 import os
 import random
+import hashlib
+import time
 from datetime import datetime, timedelta
-import gspread
-from google.oauth2.service_account import Credentials
+import numpy as np
+import combos
+import range_pack
+import store
+import sync
+import transport
+import ratelimit
+import sampler
+import engine
+import profiler
+from store import HISTORY_COLUMNS
+from engine import srs_spot_id, training_range, is_defense_spot, resolve_action
+from ranges import (RANKS, ALL_HANDS, HAND_INDEX, MATRIX_HANDS, MATRIX_INDEX, CompiledRange,
+                    compile_range, get_weight, parse_range_to_list)
 
 SPOTS_DIR = 'spots_data'
-RANKS = 'AKQJT98765432'
+PACK_PATH = 'ranges.pack'
+DB_PATH = 'trainer.db'
 
 # --- GOOGLE SHEETS CORE ---
 SCOPES = [
@@ -19,6 +33,9 @@ SPREADSHEET_ID = '15ouWJYZuQET1-sy7k5Wrn1fAzNUX6ssk5K8SOM9uYOc'
 
 @st.cache_resource
 def get_gspread_client():
+    # gspread и google-auth грузим только когда реально идём в Sheets: это секунда холодного старта
+    import gspread
+    from google.oauth2.service_account import Credentials
     try:
         creds_dict = json.loads(st.secrets["GOOGLE_JSON"])
         credentials = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
@@ -27,61 +44,201 @@ def get_gspread_client():
         st.error(f"Ошибка подключения к Google Sheets: Проверь секреты в Streamlit! {e}")
         st.stop()
 
+def storage_settings():
+    # Секция [storage] в secrets, переменные окружения важнее; без настроек -
+    # gspread, если есть ключ сервис-аккаунта, иначе только локальная база
+    try:
+        conf = dict(st.secrets.get("storage", {}))
+        has_key = "GOOGLE_JSON" in st.secrets
+    except Exception:
+        conf, has_key = {}, False
+    if os.environ.get("TRAINER_STORAGE"): conf["backend"] = os.environ["TRAINER_STORAGE"]
+    if os.environ.get("TRAINER_STORAGE_PATH"): conf["path"] = os.environ["TRAINER_STORAGE_PATH"]
+    conf.setdefault("backend", "gspread" if has_key else "none")
+    return conf
+
+@st.cache_resource
+def get_transport():
+    conf = storage_settings()
+    client = get_gspread_client() if conf["backend"] == "gspread" else None
+    return transport.make_transport(conf, client, SPREADSHEET_ID)
+
+@st.cache_resource
+def get_rate_limiter():
+    # Один на процесс: квота Sheets общая для всех сессий
+    conf = storage_settings()
+    return ratelimit.RequestLimiter(int(conf.get("reads_per_minute", ratelimit.READS_PER_MINUTE)),
+                                    int(conf.get("writes_per_minute", ratelimit.WRITES_PER_MINUTE)))
+
 # Кэшируем сами листы таблицы, чтобы убить скрытые запросы метаданных!
 @st.cache_resource
 def get_worksheets():
-    client = get_gspread_client()
-    sh = client.open_by_key(SPREADSHEET_ID)
-    return {
-        "SRS": sh.worksheet("SRS"),
-        "Settings": sh.worksheet("Settings"),
-        "History": sh.worksheet("History")
-    }
+    return ratelimit.limit_worksheets(get_transport().worksheets(), get_rate_limiter())
+
+def sheets_enabled():
+    return storage_settings()["backend"] != "none"
+
+# --- ЛОКАЛЬНАЯ БАЗА (ОСНОВНОЕ ХРАНИЛИЩЕ, SHEETS - РЕПЛИКА) ---
+
+@st.cache_resource
+def get_local_store():
+    return store.LocalStore(DB_PATH, replicate=sheets_enabled())
+
+def sheets_batch_get(ranges):
+    # Несколько диапазонов одним values:batchGet, через общий лимитер
+    tr = get_transport()
+    return get_rate_limiter().read(("batchGet",) + tuple(ranges), lambda: tr.batch_get(ranges))
+
+def _hydrate_from_sheets():
+    # Пустая локальная база (новый контейнер): гидратирует фоновый воркер, UI не ждёт
+    db = get_local_store()
+    more_history = sync.hydrate(db, sheets_batch_get)
+    get_srs_samplers().reload()
+    return more_history
+
+def compact_srs():
+    # Явная компактизация: полную перезапись листа SRS делает воркер через outbox -
+    # по очереди с остальными записями и через общий лимитер
+    if not sheets_enabled(): return
+    get_local_store().request_srs_compact()
+    get_sync_worker().notify(urgent=True)
 
 # --- ИНИЦИАЛИЗАЦИЯ (СТРОГО ОДНО ЧТЕНИЕ ЗА СЕССИЮ) ---
 def init_cloud_data():
     if "app_initialized" not in st.session_state:
-        sheets = get_worksheets()
-        
-        # 1. Загружаем веса SRS в память
-        try:
-            srs_vals = sheets["SRS"].get_all_values()
-            st.session_state["srs_data"] = {str(r[0]): int(r[1]) for r in srs_vals[1:]} if len(srs_vals) > 1 else {}
-        except:
-            st.session_state["srs_data"] = {}
-            
-        # 2. Загружаем Настройки в память
-        try:
-            set_val = sheets["Settings"].acell('A1').value
-            st.session_state["user_settings"] = json.loads(set_val) if set_val else {}
-        except:
-            st.session_state["user_settings"] = {}
-            
-        # Буферы для записи
-        st.session_state["history_buffer"] = []
-        st.session_state["unsaved_count"] = 0
-        st.session_state["app_initialized"] = True
+        with profiler.phase("init_cloud_data"):
+            db = get_local_store()
+            ready = True
+            if sheets_enabled():
+                # Поднимаем воркер сразу: он гидратирует пустую базу и дошлёт outbox с прошлого запуска.
+                # Первая раздача идёт из локальной базы, не дожидаясь таблицы; индекс листа SRS
+                # воркер строит сам перед первой отправкой весов
+                ready = get_sync_worker().hydrated.is_set()
+
+            st.session_state["user_settings"] = db.get_settings() or {}
+            st.session_state["_replica_ready"] = ready
+            st.session_state["app_initialized"] = True
+    elif not st.session_state["_replica_ready"]:
+        _reconcile_session()
+
+def _reconcile_session():
+    # Таблица догрузилась после первой раздачи: подхватываем её настройки и веса
+    worker = get_sync_worker()
+    if not worker.hydrated.is_set():
+        _report_sync_error(worker)
+        return
+    st.session_state["_replica_ready"] = True
+    if not st.session_state["user_settings"]:
+        st.session_state["user_settings"] = get_local_store().get_settings() or {}
+        for k in [k for k in st.session_state if k.startswith(("m_chk_", "d_chk_"))]: del st.session_state[k]
+    eng = st.session_state.get("_engine")
+    if eng is not None: eng.reload()
 
 # --- БЕСКОНТАКТНЫЕ ФУНКЦИИ (0 API-ЗАПРОСОВ НА ЧТЕНИЕ ПРИ ИГРЕ) ---
 
 def load_srs_data():
+    # Общая на процесс srs_pack.SrsTable, в сессию не копируется
     init_cloud_data()
-    return st.session_state.get("srs_data", {})
+    return get_local_store().srs
 
 def update_srs_smart(spot_id, hand, rating):
     init_cloud_data()
-    data = st.session_state["srs_data"]
-    key = f"{spot_id}_{hand}"
-    w = data.get(key, 100)
-    
-    if rating == 'hard': w *= 2.5
-    elif rating == 'normal': w = w / 1.5 if w > 100 else w * 1.2
-    elif rating == 'easy': w /= 4.0
-    
-    data[key] = int(max(1, min(w, 2000)))
-    st.session_state["unsaved_count"] += 1
+    db = get_local_store()
+    old_w, w = engine.apply_rating(db, get_srs_samplers(), spot_id, hand, rating, time.time())
+    eng = st.session_state.get("_engine")
+    if eng is not None: eng.invalidate(spot_id, hand, old_w, w)
+    check_auto_sync()
+
+# --- ДВИЖОК ТРЕНИРОВКИ (ВЫБОР РУКИ - ДЕРЕВЬЯ ФЕНВИКА, O(log n)) ---
+
+@st.cache_resource
+def get_srs_samplers():
+    db = get_local_store()
+    return sampler.SamplerRegistry(db.srs)
+
+def get_engine(ranges_db, pool, render=None):
+    # Движок живёт в сессии: текущая раздача и заготовки переживают реран
+    init_cloud_data()
+    eng = st.session_state.get("_engine")
+    if eng is None or eng.ranges_db is not ranges_db:
+        eng = st.session_state["_engine"] = engine.Engine(ranges_db, get_local_store(), rng=random,
+                                                          registry=get_srs_samplers())
+    return eng.configure(pool, render)
+
+def _replica_pending():
+    return not st.session_state.get("_replica_ready", True)
+
+def _click_scope(pending, reruns):
+    # Таблица догрузилась, пока сессия кликала во фрагментах: полный реран, чтобы
+    # init_cloud_data (_reconcile_session) подхватил её настройки и веса во всей вью
+    return "app" if pending and get_sync_worker().hydrated.is_set() else reruns
+
+def answer_click(eng, action, reruns):
+    # Колбэк кнопки ответа: перерисовываются только перечисленные фрагменты вью
+    pending = _replica_pending()
+    answer_deal(eng, action)
+    st.rerun(_click_scope(pending, reruns))
+
+def rate_click(eng, rating, reruns):
+    pending = _replica_pending()
+    rate_deal(eng, rating)
+    st.rerun(_click_scope(pending, reruns))
+
+_SCENARIOS = ["Open Raise", "BB def vs PFR", "Def vs 3bet"]
+_scenario_cache = (None, None)
+
+def get_scenario_map(ranges_db):
+    # Группы спотов для фильтров; пересчёт только при смене базы ренджей
+    global _scenario_cache
+    if _scenario_cache[0] is ranges_db: return _scenario_cache[1]
+    with profiler.phase("scenario_map"):
+        scenario_map = {}
+        for src, sc_dict in ranges_db.items():
+            for sc, sp_dict in sc_dict.items():
+                mapped_sc = sc
+                sc_lower = sc.lower()
+                if "3bet" in sc_lower: mapped_sc = "Def vs 3bet"
+                elif "pfr" in sc_lower or "bbvsbu" in sc_lower or "bb def" in sc_lower: mapped_sc = "BB def vs PFR"
+                elif "open raise" in sc_lower: mapped_sc = "Open Raise"
+
+                if mapped_sc not in scenario_map: scenario_map[mapped_sc] = []
+                for sp in sp_dict.keys():
+                    scenario_map[mapped_sc].append((sp, f"{src}|{sc}|{sp}"))
+        all_scenarios = [s for s in _SCENARIOS if s in scenario_map]
+    _scenario_cache = (ranges_db, (scenario_map, all_scenarios))
+    return scenario_map, all_scenarios
+
+def rerun_app():
+    # Колбэк фильтров: от пула зависит всё остальное, перерисовываем приложение целиком
+    st.rerun()
+
+def reset_deal():
+    eng = st.session_state.get("_engine")
+    if eng is not None: eng.skip()
+
+def answer_deal(eng, action):
+    deal = eng.current
+    corr = eng.grade(action)
+    check_auto_sync()
+    st.session_state.last_error = not corr
+    if corr: st.session_state.msg = "✅ Correct"
+    elif deal["defense"]: st.session_state.msg = f"❌ Err! RNG {deal['rng']} -> {deal['correct']}"
+    else: st.session_state.msg = "❌ Err"
+    return corr
+
+def rate_deal(eng, rating):
+    eng.rate(rating)
     check_auto_sync()
 
+def ingest_batch(eng, deals, results, since=None):
+    # Ответы пачки из браузера: те же записи, что save_to_history и update_srs_smart,
+    # но история и SRS - по одной транзакции, синхронизацию будим один раз
+    init_cloud_data()
+    with profiler.phase("batch.ingest"):
+        res = eng.ingest(deals, results, since)
+    check_auto_sync()
+    return res
+
 def load_user_settings():
     init_cloud_data()
     return st.session_state.get("user_settings", {})
@@ -89,11 +246,8 @@ def load_user_settings():
 def save_user_settings(settings):
     init_cloud_data()
     st.session_state["user_settings"] = settings
-    try:
-        # Пишем в фон, даже если Гугл заглючит - в памяти всё останется
-        get_worksheets()["Settings"].update_acell('A1', json.dumps(settings))
-    except:
-        pass
+    get_local_store().save_settings(settings)
+    force_sync()
 
 def save_to_history(record):
     init_cloud_data()
@@ -104,185 +258,170 @@ def save_to_history(record):
         str(record.get("Result", "")),
         str(record.get("CorrectAction", ""))
     ]
-    st.session_state["history_buffer"].append(row)
-    st.session_state["unsaved_count"] += 1
+    get_local_store().add_history(row)
     check_auto_sync()
 
+@st.cache_resource
+def get_sync_worker():
+    db = get_local_store()
+    return sync.SyncWorker(db, get_worksheets, bootstrap=None if db.get_meta("hydrated") else _hydrate_from_sheets)
+
+def _report_sync_error(worker):
+    err = worker.last_error
+    if err and st.session_state.get("_sync_error_seen") != err:
+        st.session_state["_sync_error_seen"] = err
+        if not worker.hydrated.is_set(): st.toast(f"Google Sheets недоступен, работаем локально: {err}")
+        else: st.toast(f"Синхронизация с Google Sheets не удалась (повторим позже): {err}")
+
 def check_auto_sync():
-    # Отправляем пачку каждые 5 действий (2-3 раздачи)
-    if st.session_state["unsaved_count"] >= 5:
-        force_sync()
+    # Пачку собирает и отправляет фоновый поток - UI только будит его
+    if not sheets_enabled(): return
+    worker = get_sync_worker()
+    worker.notify()
+    _report_sync_error(worker)
 
 def force_sync():
-    if st.session_state.get("unsaved_count", 0) == 0: return
-    sheets = get_worksheets()
-    try:
-        # Выгружаем веса
-        if "srs_data" in st.session_state:
-            rows = [["Key", "Weight"]] + [[k, v] for k, v in st.session_state["srs_data"].items()]
-            sheets["SRS"].update(values=rows, range_name="A1")
-
-        # Выгружаем историю пачкой
-        if "history_buffer" in st.session_state and st.session_state["history_buffer"]:
-            sheets["History"].append_rows(st.session_state["history_buffer"])
-            st.session_state["history_buffer"] = []
+    if not sheets_enabled(): return
+    with profiler.phase("force_sync"):
+        worker = get_sync_worker()
+        worker.notify(urgent=True)
+        _report_sync_error(worker)
 
-        st.session_state["unsaved_count"] = 0
-    except:
-        pass
+def _request_history_pull():
+    # Локальная база уже содержит всё своё (включая неотправленное); чужой хвост листа
+    # докачивает фоновый воркер не чаще раза в минуту
+    if sheets_enabled(): get_sync_worker().request_history_pull()
 
-@st.cache_data(ttl=60)
 def load_history():
-    try:
-        vals = get_worksheets()["History"].get_all_values()
-        if not vals or len(vals) < 2:
-            return pd.DataFrame(columns=["Date", "Spot", "Hand", "Result", "CorrectAction"])
-        return pd.DataFrame(vals[1:], columns=vals[0])
-    except:
-        return pd.DataFrame(columns=["Date", "Spot", "Hand", "Result", "CorrectAction"])
+    _request_history_pull()
+    import pandas as pd  # тренажёру pandas не нужен - только истории и статистике
+    rows = get_local_store().history_rows()
+    return pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+
+# --- СТАТИСТИКА (ЧИТАЕМ АГРЕГАТЫ, А НЕ СЫРОЙ ЛОГ) ---
+
+def load_stats_spots():
+    _request_history_pull()
+    return get_local_store().stats_spots()
+
+def load_spot_stats(since=None, spots=None):
+    return get_local_store().spot_stats(since, spots)
+
+def load_history_log(since=None, spots=None, result=None, limit=1000):
+    import pandas as pd
+    rows = get_local_store().history_log(since, spots, result, limit)
+    return pd.DataFrame(rows, columns=["Date", "Spot", "Hand", "CorrectAction", "Result"])
 
 def delete_history(days=None):
-    try:
-        sheets = get_worksheets()
-        if days is None:
-            sheets["History"].clear()
-            sheets["History"].append_row(["Date", "Spot", "Hand", "Result", "CorrectAction"])
-        else:
-            df = load_history()
-            if df.empty: return
-            df["Date"] = pd.to_datetime(df["Date"])
-            now = datetime.now()
-            cutoff = now - timedelta(days=days)
-            df_new = df[df["Date"] >= cutoff] 
-            
-            sheets["History"].clear()
-            rows = [["Date", "Spot", "Hand", "Result", "CorrectAction"]] + df_new.astype(str).values.tolist()
-            sheets["History"].update(values=rows, range_name="A1")
-        
-        load_history.clear()
-        if "history_buffer" in st.session_state:
-            st.session_state["history_buffer"] = []
-    except Exception as e:
-        st.error(f"Ошибка удаления истории: {e}")
+    db = get_local_store()
+    if days is None:
+        db.delete_history()
+    else:
+        cutoff = datetime.now() - timedelta(days=days)
+        db.delete_history(before=cutoff.strftime("%Y-%m-%d %H:%M:%S"))
+    force_sync()
 
 # --- ПАРСИНГ РЕНДЖЕЙ ---
 
-@st.cache_data(ttl=0)
+# Один memmap-пак на процесс: JSON перекомпилируется только при смене sha256 исходника
+@st.cache_resource(show_spinner=False)
+def get_range_pack():
+    return range_pack.load_pack(SPOTS_DIR, PACK_PATH)
+
 def load_ranges():
-    db = {}
-    if not os.path.exists(SPOTS_DIR): return db
-    for file in os.listdir(SPOTS_DIR):
-        if file.endswith('.json'):
-            with open(os.path.join(SPOTS_DIR, file), 'r', encoding='utf-8') as f:
-                try:
-                    data = json.load(f)
-                    src = data.get("source", "Unknown")
-                    sc = data.get("scenario", "Unknown")
-                    if src not in db: db[src] = {}
-                    if sc not in db[src]: db[src][sc] = {}
-                    db[src][sc].update(data.get("spots", {}))
-                except Exception as e:
-                    st.error(f"Ошибка чтения {file}: {e}")
-    return db
-
-ALL_HANDS = []
-for i, r1 in enumerate(RANKS):
-    for j, r2 in enumerate(RANKS):
-        if i < j: ALL_HANDS.append(r1 + r2 + 's'); ALL_HANDS.append(r1 + r2 + 'o')
-        elif i == j: ALL_HANDS.append(r1 + r2)
-
-def get_weight(hand, range_str):
-    if not range_str or not isinstance(range_str, str): return 0.0
-    cleaned = range_str.replace('\n', ' ').replace('\r', '')
-    items = [x.strip() for x in cleaned.split(',')]
-    for item in items:
-        if ':' in item:
-            h_part, w_part = item.split(':')
-            try:
-                weight = float(w_part)
-                if weight <= 1.0: weight *= 100
-            except:
-                weight = 100.0
-        else:
-            h_part = item
-            weight = 100.0
-        if h_part == hand: return weight
-        if len(h_part) == 2 and h_part[0] != h_part[1] and hand.startswith(h_part): return weight
-    return 0.0
-
-def parse_range_to_list(range_str):
-    if not range_str or not isinstance(range_str, str) or "22+" in range_str or range_str == "ALL":
-        return ALL_HANDS.copy()
-        
-    hand_list = []
-    cleaned = range_str.replace('\n', ' ').replace('\r', '')
-    items = [x.strip() for x in cleaned.split(',')]
-    for item in items:
-        if not item: continue
-        h = item.split(':')[0]
-        if h in ALL_HANDS: hand_list.append(h)
-        elif len(h) == 2:
-            if h[0] == h[1]: hand_list.append(h)
-            else: hand_list.extend([h+'s', h+'o'])
-            
-    if not hand_list:
-        return ALL_HANDS.copy()
-        
-    return list(set(hand_list))
+    # Воркер начинает холодное чтение таблицы, пока здесь грузится пак
+    init_cloud_data()
+    if not os.path.exists(SPOTS_DIR): return {}
+    with profiler.phase("load_ranges"):
+        pack = get_range_pack()
+        if pack.is_stale(SPOTS_DIR):
+            get_range_pack.clear()
+            pack = get_range_pack()
+    for file, err in pack.errors:
+        st.error(f"Ошибка чтения {file}: {err}")
+    return pack.db
 
-def render_range_matrix(spot_data, target_hand=None):
+# --- РЕНДЕР МАТРИЦЫ ---
+
+_TARGET_CELL_STYLE = "border:1.5px solid #ffc107;z-index:10;box-shadow: 0 0 4px #ffc107;"
+
+def _matrix_digest(spot_data):
+    ranges = spot_data.get("ranges", spot_data)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([ranges, spot_data.get("stats", {})], ensure_ascii=False, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+def render_range_matrix(spot_data, target_hand=None, spot_key=None):
+    # База сетки рендерится один раз на спот+содержимое, подсветка руки - замена одной клетки
+    with profiler.phase("range_matrix"):
+        html = _render_matrix_base(spot_key, _matrix_digest(spot_data), spot_data)
+        if target_hand:
+            cell = f'">{target_hand}</div>'
+            html = html.replace(cell, _TARGET_CELL_STYLE + cell, 1)
+    return html
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _render_matrix_base(spot_key, digest, _spot_data):
+    spot_data = _spot_data
     ranges = spot_data.get("ranges", spot_data)
     r_call = ranges.get("call", ranges.get("Call", ""))
     r_raise = ranges.get("4bet", ranges.get("3bet", ranges.get("Raise", "")))
     r_full = ranges.get("full", ranges.get("Full", ""))
     
     grid_html = '<div style="display:grid;grid-template-columns:repeat(13,1fr);gap:1px;background:#111;padding:1px;border:1px solid #444;">'
-    for r1 in RANKS:
-        for r2 in RANKS:
-            if RANKS.index(r1) == RANKS.index(r2): h = r1 + r2
-            elif RANKS.index(r1) < RANKS.index(r2): h = r1 + r2 + 's'
-            else: h = r2 + r1 + 'o'
-            
-            w_c = get_weight(h, r_call)
-            w_4 = get_weight(h, r_raise)
-            w_f = get_weight(h, r_full)
-            
-            raise_w = w_4 if w_4 > 0 else w_f
-            call_w = w_c
-            
-            total_w = raise_w + call_w
-            if total_w > 100:
-                raise_w = (raise_w / total_w) * 100
-                call_w = (call_w / total_w) * 100
-            
-            style = "aspect-ratio:1;display:flex;justify-content:center;align-items:center;font-size:7px;cursor:default;color:#fff;"
-            
-            if raise_w == 0 and call_w == 0:
-                bg = "#2c3034"
-                style += "color:#495057;"
-            elif raise_w >= 100:
-                bg = "#d63384"
-            elif call_w >= 100:
-                bg = "#28a745"
-            else:
-                stops = []
-                curr_pct = 0.0
-                if raise_w > 0:
-                    stops.append(f"#d63384 {curr_pct}%")
-                    curr_pct += raise_w
-                    stops.append(f"#d63384 {curr_pct}%")
-                if call_w > 0:
-                    stops.append(f"#28a745 {curr_pct}%")
-                    curr_pct += call_w
-                    stops.append(f"#28a745 {curr_pct}%")
-                if curr_pct < 100:
-                    stops.append(f"#2c3034 {curr_pct}%")
-                    stops.append(f"#2c3034 100%")
-                bg = f"linear-gradient(to right, {', '.join(stops)})"
-            
-            style += f"background:{bg};"
-            if target_hand and h == target_hand: style += "border:1.5px solid #ffc107;z-index:10;box-shadow: 0 0 4px #ffc107;"
-            grid_html += f'<div style="{style}">{h}</div>'
+    rc, r4, rf = compile_range(r_call), compile_range(r_raise), compile_range(r_full)
+    wc, w4, wf = rc.weights.tolist(), r4.weights.tolist(), rf.weights.tolist()
+    # Клетка - среднее по комбо; если масти играются по-разному - пунктир и комбо в подсказке
+    mixed, play = [False] * len(ALL_HANDS), None
+    if rc.mixed or r4.mixed or rf.mixed:
+        cc, c4, cf = combos.compile_combos(r_call), combos.compile_combos(r_raise), combos.compile_combos(r_full)
+        mixed = (cc.mixed_classes() | c4.mixed_classes() | cf.mixed_classes()).tolist()
+        play = np.where(c4.weights > 0, c4.weights, cf.weights) + cc.weights if any(mixed) else None
+    for h, idx in zip(MATRIX_HANDS, MATRIX_INDEX):
+        w_c = wc[idx]
+        w_4 = w4[idx]
+        w_f = wf[idx]
+
+        raise_w = w_4 if w_4 > 0 else w_f
+        call_w = w_c
+        
+        total_w = raise_w + call_w
+        if total_w > 100:
+            raise_w = (raise_w / total_w) * 100
+            call_w = (call_w / total_w) * 100
+        
+        style = "aspect-ratio:1;display:flex;justify-content:center;align-items:center;font-size:7px;cursor:default;color:#fff;"
+        
+        if raise_w == 0 and call_w == 0:
+            bg = "#2c3034"
+            style += "color:#495057;"
+        elif raise_w >= 100:
+            bg = "#d63384"
+        elif call_w >= 100:
+            bg = "#28a745"
+        else:
+            stops = []
+            curr_pct = 0.0
+            if raise_w > 0:
+                stops.append(f"#d63384 {curr_pct}%")
+                curr_pct += raise_w
+                stops.append(f"#d63384 {curr_pct}%")
+            if call_w > 0:
+                stops.append(f"#28a745 {curr_pct}%")
+                curr_pct += call_w
+                stops.append(f"#28a745 {curr_pct}%")
+            if curr_pct < 100:
+                stops.append(f"#2c3034 {curr_pct}%")
+                stops.append(f"#2c3034 100%")
+            bg = f"linear-gradient(to right, {', '.join(stops)})"
+        
+        style += f"background:{bg};"
+        title = ""
+        if mixed[idx]:
+            lo, hi = combos.CLASS_OFFSETS[idx], combos.CLASS_OFFSETS[idx + 1]
+            title = ' title="' + " ".join(f"{c} {w:.0f}" for c, w in zip(combos.ALL_COMBOS[lo:hi], play[lo:hi].tolist())) + '"'
+            style += "text-decoration:underline dotted;"
+        grid_html += f'<div{title} style="{style}">{h}</div>'
     grid_html += '</div>'
 
     stats = spot_data.get("stats", {})
@@ -1,5 +1,25 @@
+import numpy as np
 import streamlit as st
 import utils
+import range_algebra as ra
+from ranges import MATRIX_HANDS, MATRIX_INDEX
+
+_ACTION_LABELS = {"play": "Play (raise + call)", "raise": "Raise", "call": "Call"}
+_MATRIX_INDEX = np.asarray(MATRIX_INDEX, np.intp)
+
+def render_diff_matrix(delta):
+    # A - B по клеткам: розовый - A играет чаще, синий - B, серый - одинаково
+    cells = delta[_MATRIX_INDEX].tolist()
+    html = '<div style="display:grid;grid-template-columns:repeat(13,1fr);gap:1px;background:#111;padding:1px;border:1px solid #444;">'
+    for h, d in zip(MATRIX_HANDS, cells):
+        if abs(d) < 0.5: bg, color = "#2c3034", "#495057"
+        elif d > 0: bg, color = f"rgba(214,51,132,{0.25 + 0.75 * d / 100:.2f})", "#fff"
+        else: bg, color = f"rgba(13,110,253,{0.25 - 0.75 * d / 100:.2f})", "#fff"
+        html += f'<div title="{h}: {d:+.0f}" style="aspect-ratio:1;display:flex;justify-content:center;align-items:center;font-size:7px;color:{color};background:{bg};">{h}</div>'
+    return html + '</div>'
+
+def scenario_spots(ranges_db, sc):
+    return [(f"{src} / {sp}", data) for src, sc_dict in ranges_db.items() for sp, data in sc_dict.get(sc, {}).items()]
 
 def render_popover_selector(ranges_db, suffix, emoji):
     k_sc = f"sc_{suffix}"
@@ -34,8 +54,8 @@ def render_popover_selector(ranges_db, suffix, emoji):
 
     if sc and sp:
         src = next((x[1] for x in sc_map[sc] if x[0] == sp), None)
-        return ranges_db[src][sc][sp]
-    return None
+        return f"{src}|{sc}|{sp}", ranges_db[src][sc][sp]
+    return None, None
 
 def show():
     st.markdown("""
@@ -54,15 +74,43 @@ def show():
     col1, col2 = st.columns(2)
 
     with col1:
-        data_a = render_popover_selector(ranges_db, "A", "🅰️")
+        key_a, data_a = render_popover_selector(ranges_db, "A", "🅰️")
         if data_a:
             st.markdown('<div class="matrix-box">', unsafe_allow_html=True)
-            st.markdown(utils.render_range_matrix(data_a), unsafe_allow_html=True)
+            st.markdown(utils.render_range_matrix(data_a, spot_key=key_a), unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
 
     with col2:
-        data_b = render_popover_selector(ranges_db, "B", "🅱️")
+        key_b, data_b = render_popover_selector(ranges_db, "B", "🅱️")
         if data_b:
             st.markdown('<div class="matrix-box">', unsafe_allow_html=True)
-            st.markdown(utils.render_range_matrix(data_b), unsafe_allow_html=True)
+            st.markdown(utils.render_range_matrix(data_b, spot_key=key_b), unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
+
+    if not data_a: return
+    action = st.radio("Действие", list(_ACTION_LABELS), format_func=_ACTION_LABELS.get, horizontal=True, key="lab_action")
+    w_a = ra.spot_actions(data_a)[action]
+
+    if data_b:
+        w_b = ra.spot_actions(data_b)[action]
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Частота A", f"{ra.frequency(w_a):.1f}%")
+        m2.metric("Частота B", f"{ra.frequency(w_b):.1f}%")
+        m3.metric("Перекрытие", f"{ra.overlap(w_a, w_b):.0f}%", help="Общие комбо / комбо в A или B")
+        m4.metric("A внутри B", f"{ra.coverage(w_a, w_b):.0f}%", help="Какая доля комбо A сыграна и в B")
+        st.markdown("**A − B** (🟪 чаще в A, 🟦 чаще в B)")
+        st.markdown(render_diff_matrix(ra.diff(w_a, w_b)), unsafe_allow_html=True)
+
+    # Все споты сценария A - одна стопка (k, 169), частоты и перекрытия одним проходом
+    sc = key_a.split('|')[1]
+    spots = scenario_spots(ranges_db, sc)
+    with st.expander(f"📊 Все споты сценария {sc} ({len(spots)})", expanded=False):
+        acts = [ra.spot_actions(d) for _, d in spots]
+        stacks = {a: np.stack([x[a] for x in acts]) for a in ra.ACTIONS}
+        st.dataframe({
+            "Спот": [name for name, _ in spots],
+            "Raise %": ra.frequency(stacks["raise"]).round(1),
+            "Call %": ra.frequency(stacks["call"]).round(1),
+            "Play %": ra.frequency(stacks["play"]).round(1),
+            "Перекрытие с A %": ra.overlap(stacks[action], w_a).round(0),
+        }, hide_index=True, use_container_width=True)
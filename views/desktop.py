@@ -1,7 +1,106 @@
 import streamlit as st
-import random
-from datetime import datetime
 import utils
+import profiler
+
+def render_table(data, deal):
+    # HTML стола для раздачи; вызывается и при заготовке очереди раздач
+    src, sc, sp = deal["spot_key"].split('|')
+    # 1. ЧИСТОЕ ЧТЕНИЕ ИЗ JSON (без угадаек!)
+    setup = data.get("setup", {})
+    hero_pos = setup.get("hero_pos", "EP")
+    villain_pos = setup.get("villain_pos")
+    btn_pos = setup.get("btn_pos", "BTN")
+    display_hero_bet = setup.get("hero_bet")
+    display_villain_bet = setup.get("villain_bet")
+    is_3bet_pot = setup.get("is_3bet_pot", False)
+
+    is_defense = deal["defense"]
+    rng = deal["rng"]
+
+    h_val = deal["hand"]; s1, s2 = deal["suits"]
+    c1 = "suit-red" if s1 in '♥' else "suit-blue" if s1 in '♦' else "suit-black"
+    c2 = "suit-red" if s2 in '♥' else "suit-blue" if s2 in '♦' else "suit-black"
+
+    order = ["EP", "MP", "CO", "BTN", "SB", "BB"]
+    try: hero_idx = order.index(hero_pos)
+    except ValueError: hero_idx = 0
+    rot = order[hero_idx:] + order[:hero_idx]
+
+    def get_seat_style(idx):
+        return {0: "bottom: -20px; left: 50%; transform: translateX(-50%);", 1: "bottom: 15%; left: 0%;", 2: "top: 15%; left: 0%;", 
+                3: "top: -20px; left: 50%; transform: translateX(-50%);", 4: "top: 15%; right: 0%;", 5: "bottom: 15%; right: 0%;"}.get(idx, "")
+
+    def get_chip_style(idx):
+        return {0: "bottom: 25%; left: 50%; transform: translateX(-50%);", 1: "bottom: 22%; left: 22%;", 2: "top: 22%; left: 22%;",
+                3: "top: 25%; left: 50%; transform: translateX(-50%);", 4: "top: 22%; right: 22%;", 5: "bottom: 22%; right: 22%;"}.get(idx, "")
+
+    def get_btn_style(idx):
+        return {0: "bottom: 10%; left: 60%;", 1: "bottom: 25%; left: 16%;", 2: "top: 10%; left: 16%;",
+                3: "top: 10%; left: 60%;", 4: "top: 10%; right: 16%;", 5: "bottom: 25%; right: 16%;"}.get(idx, "")
+
+    opp_html = ""; chips_html = ""
+
+    for i in range(1, 6):
+        p = rot[i]
+        
+        # Логика карт
+        has_cards = False
+        if is_defense:
+            if p == villain_pos: has_cards = True
+        else:
+            if order.index(p) > order.index(hero_pos): has_cards = True
+            
+        cls = "seat-active" if has_cards else "seat-folded"
+        cards = '<div class="opp-cards"></div>' if has_cards else ""
+        ss = get_seat_style(i)
+        opp_html += f'<div class="seat {cls}" style="{ss}">{cards}<span class="seat-label">{p}</span></div>'
+        
+        # Логика фишек оппонента и блайндов
+        cs = get_chip_style(i)
+        if is_defense and p == villain_pos and display_villain_bet:
+            bet_txt = f'<div class="bet-txt">{display_villain_bet}bb</div>'
+            if is_3bet_pot:
+                chips_html += f'<div class="chip-container" style="{cs}"><div class="chip-3bet"></div><div class="chip-3bet" style="margin-top:-15px;"></div>{bet_txt}</div>'
+            else:
+                chips_html += f'<div class="chip-container" style="{cs}"><div class="poker-chip"></div><div class="poker-chip" style="margin-top:-10px;"></div>{bet_txt}</div>'
+        elif p in ["SB", "BB"]:
+            if not (is_defense and p == villain_pos):
+                chips_html += f'<div class="chip-container" style="{cs}"><div class="poker-chip"></div></div>'
+        
+        if p == btn_pos:
+            bs = get_btn_style(i)
+            chips_html += f'<div class="dealer-button" style="{bs}">D</div>'
+
+    # Логика фишек Хиро
+    hero_cs = get_chip_style(0)
+    if is_defense and display_hero_bet: 
+        bet_txt = f'<div class="bet-txt">{display_hero_bet}bb</div>'
+        if display_hero_bet == 1.0:
+            chips_html += f'<div class="chip-container" style="{hero_cs}"><div class="poker-chip"></div>{bet_txt}</div>'
+        else:
+            chips_html += f'<div class="chip-container" style="{hero_cs}"><div class="poker-chip"></div><div class="poker-chip" style="margin-top:-10px"></div>{bet_txt}</div>'
+    else:
+        if hero_pos in ["SB", "BB"]: 
+            chips_html += f'<div class="chip-container" style="{hero_cs}"><div class="poker-chip"></div></div>'
+        
+    if rot[0] == btn_pos:
+        hero_bs = get_btn_style(0)
+        chips_html += f'<div class="dealer-button" style="{hero_bs}">D</div>'
+
+    html = f"""
+    <div class="game-area">
+        <div class="table-info"><div class="info-src">{sc}</div><div class="info-spot">{sp}</div></div>
+        {opp_html} {chips_html}
+        <div class="hero-panel">
+            <div style="display:flex;flex-direction:column;align-items:center;"><span style="color:#ffc107;font-weight:bold;font-size:12px;">HERO</span></div>
+            <div class="card"><div class="tl {c1}">{h_val[0]}<br>{s1}</div><div class="cent {c1}">{s1}</div></div>
+            <div class="card"><div class="tl {c2}">{h_val[1]}<br>{s2}</div><div class="cent {c2}">{s2}</div></div>
+            <div class="rng-desktop">{rng}</div>
+        </div>
+    </div>
+    """
+    return html
+
 
 def show():
     st.markdown("""
@@ -39,250 +138,112 @@ def show():
     ranges_db = utils.load_ranges()
     if not ranges_db: st.error("База ренджей пуста. Проверь папку spots_data."); return
     
-    scenario_map = {}
-    for src, sc_dict in ranges_db.items():
-        for sc, sp_dict in sc_dict.items():
-            mapped_sc = sc
-            sc_lower = sc.lower()
-            if "3bet" in sc_lower: mapped_sc = "Def vs 3bet"
-            elif "pfr" in sc_lower or "bbvsbu" in sc_lower or "bb def" in sc_lower: mapped_sc = "BB def vs PFR"
-            elif "open raise" in sc_lower: mapped_sc = "Open Raise"
-            
-            if mapped_sc not in scenario_map: scenario_map[mapped_sc] = []
-            for sp in sp_dict.keys():
-                scenario_map[mapped_sc].append((sp, f"{src}|{sc}|{sp}"))
-    
-    all_scenarios = ["Open Raise", "BB def vs PFR", "Def vs 3bet"]
-    all_scenarios = [s for s in all_scenarios if s in scenario_map]
-
+    # Клик по кнопке перерисовывает только свои фрагменты: CSS, фильтры и стол не трогаем
+    scenario_map, all_scenarios = utils.get_scenario_map(ranges_db)
     with st.sidebar:
-        st.header("⚙️ Фильтры")
-        saved = utils.load_user_settings()
-        
-        saved_sc = [s for s in saved.get("scenarios", []) if s in all_scenarios]
-        sel_sc = st.multiselect("Сценарий", all_scenarios, default=saved_sc if saved_sc else (all_scenarios[:1] if all_scenarios else []))
-        
-        sel_spots_keys = []
-        if sel_sc:
-            st.markdown("**Споты для тренировки:**")
-            saved_spots = saved.get("spots", [])
-            for sc in sel_sc:
-                st.markdown(f"<div style='color:#ffc107; font-size:14px; font-weight:bold; margin-top:8px;'>{sc}</div>", unsafe_allow_html=True)
-                for sp_name, sp_key in scenario_map[sc]:
-                    is_checked = (sp_key in saved_spots) if "spots" in saved else True
-                    if st.checkbox(sp_name, value=is_checked, key=f"d_chk_{sp_key}"):
-                        sel_spots_keys.append(sp_key)
-        
-        if st.button("🚀 Применить настройки", use_container_width=True):
-            utils.save_user_settings({"scenarios": sel_sc, "spots": sel_spots_keys})
-            st.session_state.hand = None
-            st.rerun()
+        settings(scenario_map, all_scenarios)
 
-    pool = sel_spots_keys
+    pool = st.session_state["d_pool"]
     if not pool:
         st.warning("⚠️ Не выбран ни один спот. Отметь галочки в меню слева.")
         st.stop()
 
-    if 'hand' not in st.session_state: st.session_state.hand = None
-    if 'rng' not in st.session_state: st.session_state.rng = 0
-    if 'suits' not in st.session_state: st.session_state.suits = None
-    if 'srs_mode' not in st.session_state: st.session_state.srs_mode = False
-    if 'current_spot_key' not in st.session_state: st.session_state.current_spot_key = None
-    
-    if st.session_state.hand is None or st.session_state.current_spot_key is None or st.session_state.current_spot_key not in pool:
-        chosen = random.choice(pool)
-        st.session_state.current_spot_key = chosen
-        src, sc, sp = chosen.split('|')
-        data = ranges_db[src][sc][sp]
-        r_data = data.get("ranges", data)
-        t_range = r_data.get("training", r_data.get("source", r_data.get("full", "")))
-        poss = utils.parse_range_to_list(t_range)
-        srs = utils.load_srs_data()
-        w = [srs.get(f"{src}_{sc}_{sp}_{h}".replace(" ","_"), 100) for h in poss]
-        st.session_state.hand = random.choices(poss, weights=w, k=1)[0]
-        st.session_state.rng = random.randint(0, 99)
-        ps = ['♠','♥','♦','♣']; s1 = random.choice(ps)
-        st.session_state.suits = [s1, s1 if 's' in st.session_state.hand else random.choice([x for x in ps if x!=s1])]
-        st.session_state.srs_mode = False
-
-    src, sc, sp = st.session_state.current_spot_key.split('|')
-    data = ranges_db[src][sc][sp]
-    r_data = data.get("ranges", data)
-    
-    # 1. ЧИСТОЕ ЧТЕНИЕ ИЗ JSON (без угадаек!)
-    setup = data.get("setup", {})
-    hero_pos = setup.get("hero_pos", "EP")
-    villain_pos = setup.get("villain_pos")
-    btn_pos = setup.get("btn_pos", "BTN")
-    display_hero_bet = setup.get("hero_bet")
-    display_villain_bet = setup.get("villain_bet")
-    is_3bet_pot = setup.get("is_3bet_pot", False)
-
-    # Спот защиты - если есть оппонент или слово call в диапазонах
-    is_defense = bool(villain_pos is not None or "call" in r_data or "Call" in r_data)
+    if 'last_error' not in st.session_state: st.session_state.last_error = False
+    if 'msg' not in st.session_state: st.session_state.msg = None
 
-    rng = st.session_state.rng
-    correct_act = "FOLD"
-    r_call = r_data.get("call", r_data.get("Call", ""))
-    r_raise = r_data.get("4bet", r_data.get("3bet", r_data.get("Raise", "")))
-    r_full = r_data.get("full", r_data.get("Full", ""))
-
-    if is_defense:
-        w_c = utils.get_weight(st.session_state.hand, r_call)
-        w_raise_val = utils.get_weight(st.session_state.hand, r_raise)
-        if rng < w_raise_val: correct_act = "RAISE"
-        elif rng < (w_raise_val + w_c): correct_act = "CALL"
-    else:
-        w = utils.get_weight(st.session_state.hand, r_full)
-        if w > 0: correct_act = "RAISE"
-
-    h_val = st.session_state.hand; s1, s2 = st.session_state.suits
-    c1 = "suit-red" if s1 in '♥' else "suit-blue" if s1 in '♦' else "suit-black"
-    c2 = "suit-red" if s2 in '♥' else "suit-blue" if s2 in '♦' else "suit-black"
+    with profiler.phase("engine"):
+        eng = utils.get_engine(ranges_db, pool, render_table)
 
     col_center, col_right = st.columns([2, 1])
     
     with col_center:
-        order = ["EP", "MP", "CO", "BTN", "SB", "BB"]
-        try: hero_idx = order.index(hero_pos)
-        except ValueError: hero_idx = 0
-        rot = order[hero_idx:] + order[:hero_idx]
+        table(eng)
+        actions(eng)
 
-        def get_seat_style(idx):
-            return {0: "bottom: -20px; left: 50%; transform: translateX(-50%);", 1: "bottom: 15%; left: 0%;", 2: "top: 15%; left: 0%;", 
-                    3: "top: -20px; left: 50%; transform: translateX(-50%);", 4: "top: 15%; right: 0%;", 5: "bottom: 15%; right: 0%;"}.get(idx, "")
-
-        def get_chip_style(idx):
-            return {0: "bottom: 25%; left: 50%; transform: translateX(-50%);", 1: "bottom: 22%; left: 22%;", 2: "top: 22%; left: 22%;",
-                    3: "top: 25%; left: 50%; transform: translateX(-50%);", 4: "top: 22%; right: 22%;", 5: "bottom: 22%; right: 22%;"}.get(idx, "")
-
-        def get_btn_style(idx):
-            return {0: "bottom: 10%; left: 60%;", 1: "bottom: 25%; left: 16%;", 2: "top: 10%; left: 16%;",
-                    3: "top: 10%; left: 60%;", 4: "top: 10%; right: 16%;", 5: "bottom: 25%; right: 16%;"}.get(idx, "")
-
-        opp_html = ""; chips_html = ""
-
-        for i in range(1, 6):
-            p = rot[i]
-            
-            # Логика карт
-            has_cards = False
-            if is_defense:
-                if p == villain_pos: has_cards = True
-            else:
-                if order.index(p) > order.index(hero_pos): has_cards = True
-                
-            cls = "seat-active" if has_cards else "seat-folded"
-            cards = '<div class="opp-cards"></div>' if has_cards else ""
-            ss = get_seat_style(i)
-            opp_html += f'<div class="seat {cls}" style="{ss}">{cards}<span class="seat-label">{p}</span></div>'
-            
-            # Логика фишек оппонента и блайндов
-            cs = get_chip_style(i)
-            if is_defense and p == villain_pos and display_villain_bet:
-                bet_txt = f'<div class="bet-txt">{display_villain_bet}bb</div>'
-                if is_3bet_pot:
-                    chips_html += f'<div class="chip-container" style="{cs}"><div class="chip-3bet"></div><div class="chip-3bet" style="margin-top:-15px;"></div>{bet_txt}</div>'
-                else:
-                    chips_html += f'<div class="chip-container" style="{cs}"><div class="poker-chip"></div><div class="poker-chip" style="margin-top:-10px;"></div>{bet_txt}</div>'
-            elif p in ["SB", "BB"]:
-                if not (is_defense and p == villain_pos):
-                    chips_html += f'<div class="chip-container" style="{cs}"><div class="poker-chip"></div></div>'
-            
-            if p == btn_pos:
-                bs = get_btn_style(i)
-                chips_html += f'<div class="dealer-button" style="{bs}">D</div>'
-
-        # Логика фишек Хиро
-        hero_cs = get_chip_style(0)
-        if is_defense and display_hero_bet: 
-            bet_txt = f'<div class="bet-txt">{display_hero_bet}bb</div>'
-            if display_hero_bet == 1.0:
-                chips_html += f'<div class="chip-container" style="{hero_cs}"><div class="poker-chip"></div>{bet_txt}</div>'
-            else:
-                chips_html += f'<div class="chip-container" style="{hero_cs}"><div class="poker-chip"></div><div class="poker-chip" style="margin-top:-10px"></div>{bet_txt}</div>'
-        else:
-            if hero_pos in ["SB", "BB"]: 
-                chips_html += f'<div class="chip-container" style="{hero_cs}"><div class="poker-chip"></div></div>'
-            
-        if rot[0] == btn_pos:
-            hero_bs = get_btn_style(0)
-            chips_html += f'<div class="dealer-button" style="{hero_bs}">D</div>'
-
-        html = f"""
-        <div class="game-area">
-            <div class="table-info"><div class="info-src">{sc}</div><div class="info-spot">{sp}</div></div>
-            {opp_html} {chips_html}
-            <div class="hero-panel">
-                <div style="display:flex;flex-direction:column;align-items:center;"><span style="color:#ffc107;font-weight:bold;font-size:12px;">HERO</span></div>
-                <div class="card"><div class="tl {c1}">{h_val[0]}<br>{s1}</div><div class="cent {c1}">{s1}</div></div>
-                <div class="card"><div class="tl {c2}">{h_val[1]}<br>{s2}</div><div class="cent {c2}">{s2}</div></div>
-                <div class="rng-desktop">{rng}</div>
-            </div>
-        </div>
-        """
-        st.markdown(html, unsafe_allow_html=True)
-        if is_defense: st.markdown('<div class="rng-hint-box">📉 0..Freq → Action | 📈 Freq..100 → Fold</div>', unsafe_allow_html=True)
-        else: st.markdown("<div style='height:30px;'></div>", unsafe_allow_html=True)
+    with col_right:
+        feedback(eng, ranges_db)
 
-        if not st.session_state.srs_mode:
-            if is_defense:
-                c1, c2, c3 = st.columns(3)
-                with c1:
-                    if st.button("FOLD"):
-                        corr = (correct_act == "FOLD")
-                        st.session_state.last_error = not corr
-                        st.session_state.msg = f"✅ Correct" if corr else f"❌ Err! RNG {rng} -> {correct_act}"
-                        utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                        st.session_state.srs_mode = True; st.rerun()
-                    st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[0].classList.add("fold-btn");</script>', unsafe_allow_html=True)
-                with c2:
-                    if st.button("CALL"):
-                        corr = (correct_act == "CALL")
-                        st.session_state.last_error = not corr
-                        st.session_state.msg = f"✅ Correct" if corr else f"❌ Err! RNG {rng} -> {correct_act}"
-                        utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                        st.session_state.srs_mode = True; st.rerun()
-                    st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[1].classList.add("call-btn");</script>', unsafe_allow_html=True)
-                with c3:
-                    if st.button("RAISE"):
-                        corr = (correct_act == "RAISE")
-                        st.session_state.last_error = not corr
-                        st.session_state.msg = f"✅ Correct" if corr else f"❌ Err! RNG {rng} -> {correct_act}"
-                        utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                        st.session_state.srs_mode = True; st.rerun()
-                    st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[2].classList.add("raise-btn");</script>', unsafe_allow_html=True)
-            else:
-                c1, c2 = st.columns(2)
-                with c1:
-                    if st.button("FOLD"):
-                        corr = (correct_act == "FOLD")
-                        st.session_state.last_error = not corr
-                        st.session_state.msg = "✅ Correct" if corr else "❌ Err"
-                        utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                        st.session_state.srs_mode = True; st.rerun()
-                    st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[0].classList.add("fold-btn");</script>', unsafe_allow_html=True)
-                with c2:
-                    if st.button("RAISE"):
-                        corr = (correct_act == "RAISE")
-                        st.session_state.last_error = not corr
-                        st.session_state.msg = "✅ Correct" if corr else "❌ Err"
-                        utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                        st.session_state.srs_mode = True; st.rerun()
-                    st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[1].classList.add("open-raise-btn");</script>', unsafe_allow_html=True)
+@st.fragment(key="d_settings")
+def settings(scenario_map, all_scenarios):
+    st.header("⚙️ Фильтры")
+    saved = utils.load_user_settings()
+    
+    saved_sc = [s for s in saved.get("scenarios", []) if s in all_scenarios]
+    sel_sc = st.multiselect("Сценарий", all_scenarios, default=saved_sc if saved_sc else (all_scenarios[:1] if all_scenarios else []),
+                            on_change=utils.rerun_app)
+    
+    sel_spots_keys = []
+    if sel_sc:
+        st.markdown("**Споты для тренировки:**")
+        saved_spots = saved.get("spots", [])
+        for sc in sel_sc:
+            st.markdown(f"<div style='color:#ffc107; font-size:14px; font-weight:bold; margin-top:8px;'>{sc}</div>", unsafe_allow_html=True)
+            for sp_name, sp_key in scenario_map[sc]:
+                is_checked = (sp_key in saved_spots) if "spots" in saved else True
+                if st.checkbox(sp_name, value=is_checked, key=f"d_chk_{sp_key}", on_change=utils.rerun_app):
+                    sel_spots_keys.append(sp_key)
+    
+    if st.button("🚀 Применить настройки", use_container_width=True):
+        utils.save_user_settings({"scenarios": sel_sc, "spots": sel_spots_keys})
+        utils.reset_deal()
+        st.rerun()
+    st.session_state["d_pool"] = sel_spots_keys
+
+@st.fragment(key="d_table")
+def table(eng):
+    with profiler.phase("deal"):
+        deal = eng.deal()
+    st.markdown(deal["html"], unsafe_allow_html=True)
+    if deal["defense"]: st.markdown('<div class="rng-hint-box">📉 0..Freq → Action | 📈 Freq..100 → Fold</div>', unsafe_allow_html=True)
+    else: st.markdown("<div style='height:30px;'></div>", unsafe_allow_html=True)
+
+# Сообщение о результате стоит над кнопками оценки, поэтому ответ перерисовывает
+# кнопки и рендж справа, а оценка - ещё и стол с новой раздачей
+_ON_ANSWER = ["d_actions", "d_feedback"]
+_ON_RATE = ["d_table", "d_actions", "d_feedback"]
+
+@st.fragment(key="d_actions")
+def actions(eng):
+    deal = eng.deal()
+    if eng.graded is None:
+        if deal["defense"]:
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                st.button("FOLD", on_click=utils.answer_click, args=(eng, "FOLD", _ON_ANSWER))
+                st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[0].classList.add("fold-btn");</script>', unsafe_allow_html=True)
+            with c2:
+                st.button("CALL", on_click=utils.answer_click, args=(eng, "CALL", _ON_ANSWER))
+                st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[1].classList.add("call-btn");</script>', unsafe_allow_html=True)
+            with c3:
+                st.button("RAISE", on_click=utils.answer_click, args=(eng, "RAISE", _ON_ANSWER))
+                st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[2].classList.add("raise-btn");</script>', unsafe_allow_html=True)
         else:
-            st.info(st.session_state.msg)
-            s1, s2, s3 = st.columns(3)
-            k = f"{src}_{sc}_{sp}".replace(" ","_")
-            if s1.button("HARD", use_container_width=True): utils.update_srs_smart(k, st.session_state.hand, 'hard'); st.session_state.hand = None; st.rerun()
-            if s2.button("NORM", use_container_width=True): utils.update_srs_smart(k, st.session_state.hand, 'normal'); st.session_state.hand = None; st.rerun()
-            if s3.button("EASY", use_container_width=True): utils.update_srs_smart(k, st.session_state.hand, 'easy'); st.session_state.hand = None; st.rerun()
+            c1, c2 = st.columns(2)
+            with c1:
+                st.button("FOLD", on_click=utils.answer_click, args=(eng, "FOLD", _ON_ANSWER))
+                st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[0].classList.add("fold-btn");</script>', unsafe_allow_html=True)
+            with c2:
+                st.button("RAISE", on_click=utils.answer_click, args=(eng, "RAISE", _ON_ANSWER))
+                st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\']")[1].classList.add("open-raise-btn");</script>', unsafe_allow_html=True)
+    else:
+        st.info(st.session_state.msg)
+        s1, s2, s3 = st.columns(3)
+        s1.button("HARD", use_container_width=True, on_click=utils.rate_click, args=(eng, 'hard', _ON_RATE))
+        s2.button("NORM", use_container_width=True, on_click=utils.rate_click, args=(eng, 'normal', _ON_RATE))
+        s3.button("EASY", use_container_width=True, on_click=utils.rate_click, args=(eng, 'easy', _ON_RATE))
+
+@st.fragment(key="d_feedback")
+def feedback(eng, ranges_db):
+    deal = eng.deal()
+    src, sc, sp = deal["spot_key"].split('|')
+    data = ranges_db[src][sc][sp]
+    if eng.graded is not None:
+        st.markdown(f"**{sp}** Range ({deal['correct']})")
+        st.markdown(utils.render_range_matrix(data, deal["hand"], deal["spot_key"]), unsafe_allow_html=True)
+    else:
+        st.markdown(f"<div style='text-align:center;font-weight:bold;margin-bottom:10px;'>{sp}</div>", unsafe_allow_html=True)
+        with st.expander("🫣 Подсмотреть Рендж", expanded=False):
+            st.markdown(utils.render_range_matrix(data, deal["hand"], deal["spot_key"]), unsafe_allow_html=True)
 
-    with col_right:
-        if st.session_state.srs_mode:
-            st.markdown(f"**{sp}** Range ({correct_act})")
-            st.markdown(utils.render_range_matrix(data, st.session_state.hand), unsafe_allow_html=True)
-        else:
-            st.markdown(f"<div style='text-align:center;font-weight:bold;margin-bottom:10px;'>{sp}</div>", unsafe_allow_html=True)
-            with st.expander("🫣 Подсмотреть Рендж", expanded=False):
-                st.markdown(utils.render_range_matrix(data, st.session_state.hand), unsafe_allow_html=True)
+    # Последний фрагмент любого клика - заготавливаем следующие раздачи
+    eng.refill()
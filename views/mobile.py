@@ -1,118 +1,11 @@
 import streamlit as st
-import random
-from datetime import datetime
 import utils
+import profiler
+import batch_drill
 
-def show():
-    st.markdown("""
-    <style>
-        .block-container { padding-top: 3rem !important; padding-bottom: 5rem !important; }
-        .mobile-controls { display: flex; gap: 8px; margin-top: 8px; width: 100%; }
-        .mobile-controls div[data-testid="column"] { flex: 1; min-width: 0; }
-        .mobile-controls button { width: 100%; height: 65px; font-weight: 800; font-size: 18px; border-radius: 12px; border: none; text-transform: uppercase; }
-        .fold-btn button { background: #495057; color: #adb5bd; border: 1px solid #6c757d; }
-        .call-btn button { background: #28a745; color: white; box-shadow: 0 4px 0 #1e7e34; }
-        .raise-btn button { background: #d63384; color: white; box-shadow: 0 4px 0 #a02561; }
-        .open-raise-btn button { background: #2e7d32; color: white; box-shadow: 0 4px 0 #1b5e20; }
-        .mobile-game-area { position: relative; width: 100%; height: 280px; margin: 0 auto; background: radial-gradient(ellipse at center, #1b5e20 0%, #0a2e0b 100%); border: 6px solid #3e2723; border-radius: 140px; box-shadow: 0 4px 15px rgba(0,0,0,0.8); }
-        .mob-info { position: absolute; top: 25%; width: 100%; text-align: center; pointer-events: none; }
-        .mob-info-src { font-size: 10px; color: #888; text-transform: uppercase; }
-        .mob-info-spot { font-size: 22px; font-weight: 900; color: rgba(255,255,255,0.15); }
-        .seat { position: absolute; width: 44px; height: 44px; background: #222; border: 1px solid #444; border-radius: 8px; display: flex; flex-direction: column; justify-content: center; align-items: center; z-index: 5; }
-        .seat-label { font-size: 9px; color: #fff; font-weight: bold; margin-top: auto; margin-bottom: 2px; }
-        .seat-active { border-color: #ffc107; background: #2a2a2a; }
-        .seat-folded { opacity: 0.4; border-color: #333; }
-        .m-pos-1 { bottom: 20%; left: 5%; } .m-pos-2 { top: 20%; left: 5%; } .m-pos-3 { top: -15px; left: 50%; transform: translateX(-50%); } 
-        .m-pos-4 { top: 20%; right: 5%; } .m-pos-5 { bottom: 20%; right: 5%; }
-        .chip-container { position: absolute; z-index: 10; display: flex; flex-direction: column; align-items: center; pointer-events: none; }
-        .chip-mob { width: 14px; height: 14px; background: #111; border: 2px dashed #d32f2f; border-radius: 50%; box-shadow: 1px 1px 2px rgba(0,0,0,0.8); }
-        .chip-3bet { width: 16px; height: 16px; background: #d32f2f; border: 2px solid #fff; border-radius: 50%; box-shadow: 0 2px 5px rgba(0,0,0,0.8); }
-        .dealer-mob { width: 16px; height: 16px; background: #ffc107; border-radius: 50%; color: #000; font-weight: bold; font-size: 9px; display: flex; justify-content: center; align-items: center; border: 1px solid #bfa006; position: absolute; z-index: 11; }
-        .bet-txt { font-size: 10px; font-weight: bold; color: #fff; text-shadow: 1px 1px 2px #000; background: rgba(0,0,0,0.6); padding: 1px 3px; border-radius: 4px; margin-top: -5px; z-index: 20; }
-        .hero-mob { position: absolute; bottom: -20px; left: 50%; transform: translateX(-50%); display: flex; gap: 5px; z-index: 20; background: #222; padding: 5px 10px; border-radius: 12px; border: 1px solid #ffc107; }
-        .card-mob { width: 45px; height: 64px; background: white; border-radius: 4px; position: relative; color: black; box-shadow: 0 2px 5px rgba(0,0,0,0.5); }
-        .tl-mob { position: absolute; top: 1px; left: 3px; font-weight: bold; font-size: 14px; line-height: 1; }
-        .c-mob { position: absolute; top: 55%; left: 50%; transform: translate(-50%,-50%); font-size: 26px; }
-        .suit-red { color: #d32f2f; } .suit-blue { color: #0056b3; } .suit-black { color: #111; }
-        .rng-badge { position: absolute; bottom: 50px; right: -15px; width: 30px; height: 30px; background: #6f42c1; border: 2px solid #fff; border-radius: 50%; color: white; font-weight: bold; font-size: 12px; display: flex; justify-content: center; align-items: center; box-shadow: 0 2px 5px rgba(0,0,0,0.5); z-index: 40; }
-        .rng-hint { text-align: center; color: #888; font-size: 11px; margin-bottom: 5px; font-family: monospace; }
-        .srs-container button { height: 50px; font-size: 13px; background: #343a40; color: #aaa; border: 1px solid #555; }
-    </style>
-    """, unsafe_allow_html=True)
-
-    ranges_db = utils.load_ranges()
-    if not ranges_db: st.error("База ренджей пуста."); return
-
-    scenario_map = {}
-    for src, sc_dict in ranges_db.items():
-        for sc, sp_dict in sc_dict.items():
-            mapped_sc = sc
-            sc_lower = sc.lower()
-            if "3bet" in sc_lower: mapped_sc = "Def vs 3bet"
-            elif "pfr" in sc_lower or "bbvsbu" in sc_lower or "bb def" in sc_lower: mapped_sc = "BB def vs PFR"
-            elif "open raise" in sc_lower: mapped_sc = "Open Raise"
-            
-            if mapped_sc not in scenario_map: scenario_map[mapped_sc] = []
-            for sp in sp_dict.keys():
-                scenario_map[mapped_sc].append((sp, f"{src}|{sc}|{sp}"))
-                
-    all_scenarios = ["Open Raise", "BB def vs PFR", "Def vs 3bet"]
-    all_scenarios = [s for s in all_scenarios if s in scenario_map]
-
-    with st.expander("⚙️ Настройки Фильтров", expanded=False):
-        saved = utils.load_user_settings()
-        
-        saved_sc = [s for s in saved.get("scenarios", []) if s in all_scenarios]
-        sel_sc = st.multiselect("Сценарий", all_scenarios, default=saved_sc if saved_sc else (all_scenarios[:1] if all_scenarios else []))
-        
-        sel_spots_keys = []
-        if sel_sc:
-            st.markdown("**Споты для тренировки:**")
-            saved_spots = saved.get("spots", [])
-            for sc in sel_sc:
-                st.markdown(f"<div style='color:#ffc107; font-size:14px; font-weight:bold; margin-top:8px;'>{sc}</div>", unsafe_allow_html=True)
-                for sp_name, sp_key in scenario_map[sc]:
-                    is_checked = (sp_key in saved_spots) if "spots" in saved else True
-                    if st.checkbox(sp_name, value=is_checked, key=f"m_chk_{sp_key}"):
-                        sel_spots_keys.append(sp_key)
-        
-        if st.button("🚀 Применить", use_container_width=True):
-            utils.save_user_settings({"scenarios": sel_sc, "spots": sel_spots_keys})
-            st.session_state.hand = None; st.rerun()
-
-    pool = sel_spots_keys
-    if not pool:
-        st.warning("⚠️ Не выбран ни один спот. Открой '⚙️ Настройки Фильтров' и поставь галочки.")
-        st.stop()
-
-    if 'hand' not in st.session_state: st.session_state.hand = None
-    if 'rng' not in st.session_state: st.session_state.rng = 0
-    if 'suits' not in st.session_state: st.session_state.suits = None
-    if 'srs_mode' not in st.session_state: st.session_state.srs_mode = False
-    if 'last_error' not in st.session_state: st.session_state.last_error = False
-    if 'msg' not in st.session_state: st.session_state.msg = None
-    if 'current_spot_key' not in st.session_state: st.session_state.current_spot_key = None 
-
-    if st.session_state.hand is None or st.session_state.current_spot_key is None or st.session_state.current_spot_key not in pool:
-        chosen = random.choice(pool)
-        st.session_state.current_spot_key = chosen
-        src, sc, sp = chosen.split('|')
-        data = ranges_db[src][sc][sp]
-        r_data = data.get("ranges", data)
-        t_range = r_data.get("training", r_data.get("source", r_data.get("full", "")))
-        poss = utils.parse_range_to_list(t_range)
-        srs = utils.load_srs_data()
-        w = [srs.get(f"{src}_{sc}_{sp}_{h}".replace(" ","_"), 100) for h in poss]
-        st.session_state.hand = random.choices(poss, weights=w, k=1)[0]
-        st.session_state.rng = random.randint(0, 99)
-        ps = ['♠','♥','♦','♣']; s1 = random.choice(ps)
-        st.session_state.suits = [s1, s1 if 's' in st.session_state.hand else random.choice([x for x in ps if x!=s1])]
-        st.session_state.srs_mode = False
-
-    src, sc, sp = st.session_state.current_spot_key.split('|')
-    data = ranges_db[src][sc][sp]
-    r_data = data.get("ranges", data)
-    
+def render_table(data, deal):
+    # HTML стола для раздачи; вызывается и при заготовке очереди раздач
+    src, sc, sp = deal["spot_key"].split('|')
     # 1. ЧИСТОЕ ЧТЕНИЕ ИЗ JSON
     setup = data.get("setup", {})
     hero_pos = setup.get("hero_pos", "EP")
@@ -122,24 +15,10 @@ def show():
     display_villain_bet = setup.get("villain_bet")
     is_3bet_pot = setup.get("is_3bet_pot", False)
 
-    is_defense = bool(villain_pos is not None or "call" in r_data or "Call" in r_data)
+    is_defense = deal["defense"]
+    rng = deal["rng"]
 
-    rng = st.session_state.rng
-    correct_act = "FOLD"
-    r_call = r_data.get("call", r_data.get("Call", ""))
-    r_raise = r_data.get("4bet", r_data.get("3bet", r_data.get("Raise", "")))
-    r_full = r_data.get("full", r_data.get("Full", ""))
-
-    if is_defense:
-        w_c = utils.get_weight(st.session_state.hand, r_call)
-        w_raise_val = utils.get_weight(st.session_state.hand, r_raise)
-        if rng < w_raise_val: correct_act = "RAISE"
-        elif rng < (w_raise_val + w_c): correct_act = "CALL"
-    else:
-        w = utils.get_weight(st.session_state.hand, r_full)
-        if w > 0: correct_act = "RAISE"
-
-    h_val = st.session_state.hand; s1, s2 = st.session_state.suits
+    h_val = deal["hand"]; s1, s2 = deal["suits"]
     c1 = "suit-red" if s1 in '♥' else "suit-blue" if s1 in '♦' else "suit-black"
     c2 = "suit-red" if s2 in '♥' else "suit-blue" if s2 in '♦' else "suit-black"
 
@@ -217,73 +96,161 @@ def show():
         </div>
     </div>
     """
-    st.markdown(html, unsafe_allow_html=True)
+    return html
+
 
-    if is_defense:
+def show():
+    st.markdown("""
+    <style>
+        .block-container { padding-top: 3rem !important; padding-bottom: 5rem !important; }
+        .mobile-controls { display: flex; gap: 8px; margin-top: 8px; width: 100%; }
+        .mobile-controls div[data-testid="column"] { flex: 1; min-width: 0; }
+        .mobile-controls button { width: 100%; height: 65px; font-weight: 800; font-size: 18px; border-radius: 12px; border: none; text-transform: uppercase; }
+        .fold-btn button { background: #495057; color: #adb5bd; border: 1px solid #6c757d; }
+        .call-btn button { background: #28a745; color: white; box-shadow: 0 4px 0 #1e7e34; }
+        .raise-btn button { background: #d63384; color: white; box-shadow: 0 4px 0 #a02561; }
+        .open-raise-btn button { background: #2e7d32; color: white; box-shadow: 0 4px 0 #1b5e20; }
+        .mobile-game-area { position: relative; width: 100%; height: 280px; margin: 0 auto; background: radial-gradient(ellipse at center, #1b5e20 0%, #0a2e0b 100%); border: 6px solid #3e2723; border-radius: 140px; box-shadow: 0 4px 15px rgba(0,0,0,0.8); }
+        .mob-info { position: absolute; top: 25%; width: 100%; text-align: center; pointer-events: none; }
+        .mob-info-src { font-size: 10px; color: #888; text-transform: uppercase; }
+        .mob-info-spot { font-size: 22px; font-weight: 900; color: rgba(255,255,255,0.15); }
+        .seat { position: absolute; width: 44px; height: 44px; background: #222; border: 1px solid #444; border-radius: 8px; display: flex; flex-direction: column; justify-content: center; align-items: center; z-index: 5; }
+        .seat-label { font-size: 9px; color: #fff; font-weight: bold; margin-top: auto; margin-bottom: 2px; }
+        .seat-active { border-color: #ffc107; background: #2a2a2a; }
+        .seat-folded { opacity: 0.4; border-color: #333; }
+        .m-pos-1 { bottom: 20%; left: 5%; } .m-pos-2 { top: 20%; left: 5%; } .m-pos-3 { top: -15px; left: 50%; transform: translateX(-50%); } 
+        .m-pos-4 { top: 20%; right: 5%; } .m-pos-5 { bottom: 20%; right: 5%; }
+        .chip-container { position: absolute; z-index: 10; display: flex; flex-direction: column; align-items: center; pointer-events: none; }
+        .chip-mob { width: 14px; height: 14px; background: #111; border: 2px dashed #d32f2f; border-radius: 50%; box-shadow: 1px 1px 2px rgba(0,0,0,0.8); }
+        .chip-3bet { width: 16px; height: 16px; background: #d32f2f; border: 2px solid #fff; border-radius: 50%; box-shadow: 0 2px 5px rgba(0,0,0,0.8); }
+        .dealer-mob { width: 16px; height: 16px; background: #ffc107; border-radius: 50%; color: #000; font-weight: bold; font-size: 9px; display: flex; justify-content: center; align-items: center; border: 1px solid #bfa006; position: absolute; z-index: 11; }
+        .bet-txt { font-size: 10px; font-weight: bold; color: #fff; text-shadow: 1px 1px 2px #000; background: rgba(0,0,0,0.6); padding: 1px 3px; border-radius: 4px; margin-top: -5px; z-index: 20; }
+        .hero-mob { position: absolute; bottom: -20px; left: 50%; transform: translateX(-50%); display: flex; gap: 5px; z-index: 20; background: #222; padding: 5px 10px; border-radius: 12px; border: 1px solid #ffc107; }
+        .card-mob { width: 45px; height: 64px; background: white; border-radius: 4px; position: relative; color: black; box-shadow: 0 2px 5px rgba(0,0,0,0.5); }
+        .tl-mob { position: absolute; top: 1px; left: 3px; font-weight: bold; font-size: 14px; line-height: 1; }
+        .c-mob { position: absolute; top: 55%; left: 50%; transform: translate(-50%,-50%); font-size: 26px; }
+        .suit-red { color: #d32f2f; } .suit-blue { color: #0056b3; } .suit-black { color: #111; }
+        .rng-badge { position: absolute; bottom: 50px; right: -15px; width: 30px; height: 30px; background: #6f42c1; border: 2px solid #fff; border-radius: 50%; color: white; font-weight: bold; font-size: 12px; display: flex; justify-content: center; align-items: center; box-shadow: 0 2px 5px rgba(0,0,0,0.5); z-index: 40; }
+        .rng-hint { text-align: center; color: #888; font-size: 11px; margin-bottom: 5px; font-family: monospace; }
+        .srs-container button { height: 50px; font-size: 13px; background: #343a40; color: #aaa; border: 1px solid #555; }
+    </style>
+    """, unsafe_allow_html=True)
+
+    ranges_db = utils.load_ranges()
+    if not ranges_db: st.error("База ренджей пуста."); return
+
+    # Клик по кнопке перерисовывает только свои фрагменты: CSS, фильтры и стол не трогаем
+    scenario_map, all_scenarios = utils.get_scenario_map(ranges_db)
+    settings(scenario_map, all_scenarios)
+
+    pool = st.session_state["m_pool"]
+    if not pool:
+        st.warning("⚠️ Не выбран ни один спот. Открой '⚙️ Настройки Фильтров' и поставь галочки.")
+        st.stop()
+
+    if 'last_error' not in st.session_state: st.session_state.last_error = False
+    if 'msg' not in st.session_state: st.session_state.msg = None
+
+    with profiler.phase("engine"):
+        eng = utils.get_engine(ranges_db, pool, render_table)
+    if st.session_state.get("m_batch_mode"):
+        # Пачка проверяется в браузере: сервер видит один ответ на BATCH_SIZE раздач
+        batch(eng)
+        return
+    table(eng)
+    actions(eng)
+    feedback(eng, ranges_db)
+
+@st.fragment(key="m_settings")
+def settings(scenario_map, all_scenarios):
+    with st.expander("⚙️ Настройки Фильтров", expanded=False):
+        saved = utils.load_user_settings()
+        
+        saved_sc = [s for s in saved.get("scenarios", []) if s in all_scenarios]
+        sel_sc = st.multiselect("Сценарий", all_scenarios, default=saved_sc if saved_sc else (all_scenarios[:1] if all_scenarios else []),
+                                on_change=utils.rerun_app)
+        
+        sel_spots_keys = []
+        if sel_sc:
+            st.markdown("**Споты для тренировки:**")
+            saved_spots = saved.get("spots", [])
+            for sc in sel_sc:
+                st.markdown(f"<div style='color:#ffc107; font-size:14px; font-weight:bold; margin-top:8px;'>{sc}</div>", unsafe_allow_html=True)
+                for sp_name, sp_key in scenario_map[sc]:
+                    is_checked = (sp_key in saved_spots) if "spots" in saved else True
+                    if st.checkbox(sp_name, value=is_checked, key=f"m_chk_{sp_key}", on_change=utils.rerun_app):
+                        sel_spots_keys.append(sp_key)
+        
+        st.toggle(f"⚡ Пачкой по {batch_drill.BATCH_SIZE} (без ожидания сервера)", key="m_batch_mode", on_change=utils.rerun_app)
+
+        if st.button("🚀 Применить", use_container_width=True):
+            utils.save_user_settings({"scenarios": sel_sc, "spots": sel_spots_keys})
+            utils.reset_deal(); st.rerun()
+    st.session_state["m_pool"] = sel_spots_keys
+
+@st.fragment(key="m_batch_frag")
+def batch(eng):
+    batch_drill.show(eng)
+
+@st.fragment(key="m_table")
+def table(eng):
+    with profiler.phase("deal"):
+        deal = eng.deal()
+    st.markdown(deal["html"], unsafe_allow_html=True)
+
+    if deal["defense"]:
         st.markdown('<div class="rng-hint">📉 0..Freq → Action | 📈 Freq..100 → Fold</div>', unsafe_allow_html=True)
 
+_ON_ANSWER = ["m_actions", "m_feedback"]
+_ON_RATE = ["m_table", "m_actions", "m_feedback"]
+
+@st.fragment(key="m_actions")
+def actions(eng):
+    deal = eng.deal()
     st.markdown('<div class="mobile-controls">', unsafe_allow_html=True)
-    if not st.session_state.srs_mode:
-        if is_defense:
+    if eng.graded is None:
+        if deal["defense"]:
             c1, c2, c3 = st.columns(3)
             with c1:
-                if st.button("FOLD", key="f", use_container_width=True):
-                    corr = (correct_act == "FOLD")
-                    st.session_state.last_error = not corr
-                    st.session_state.msg = f"✅ Correct" if corr else f"❌ Err! RNG {rng} -> {correct_act}"
-                    utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                    st.session_state.srs_mode = True; st.rerun()
+                st.button("FOLD", key="f", use_container_width=True, on_click=utils.answer_click, args=(eng, "FOLD", _ON_ANSWER))
                 st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\'] button")[0].classList.add("fold-btn");</script>', unsafe_allow_html=True)
             with c2:
-                if st.button("CALL", key="c", use_container_width=True):
-                    corr = (correct_act == "CALL")
-                    st.session_state.last_error = not corr
-                    st.session_state.msg = f"✅ Correct" if corr else f"❌ Err! RNG {rng} -> {correct_act}"
-                    utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                    st.session_state.srs_mode = True; st.rerun()
+                st.button("CALL", key="c", use_container_width=True, on_click=utils.answer_click, args=(eng, "CALL", _ON_ANSWER))
                 st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\'] button")[1].classList.add("call-btn");</script>', unsafe_allow_html=True)
             with c3:
-                if st.button("RAISE", key="r", use_container_width=True):
-                    corr = (correct_act == "RAISE")
-                    st.session_state.last_error = not corr
-                    st.session_state.msg = f"✅ Correct" if corr else f"❌ Err! RNG {rng} -> {correct_act}"
-                    utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                    st.session_state.srs_mode = True; st.rerun()
+                st.button("RAISE", key="r", use_container_width=True, on_click=utils.answer_click, args=(eng, "RAISE", _ON_ANSWER))
                 st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\'] button")[2].classList.add("raise-btn");</script>', unsafe_allow_html=True)
         else:
             c1, c2 = st.columns(2)
             with c1:
-                if st.button("FOLD", key="f", use_container_width=True):
-                    corr = (correct_act == "FOLD")
-                    st.session_state.last_error = not corr
-                    st.session_state.msg = "✅ Correct" if corr else "❌ Err"
-                    utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                    st.session_state.srs_mode = True; st.rerun()
+                st.button("FOLD", key="f", use_container_width=True, on_click=utils.answer_click, args=(eng, "FOLD", _ON_ANSWER))
                 st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\'] button")[0].classList.add("fold-btn");</script>', unsafe_allow_html=True)
             with c2:
-                if st.button("RAISE", key="r", use_container_width=True):
-                    corr = (correct_act == "RAISE")
-                    st.session_state.last_error = not corr
-                    st.session_state.msg = "✅ Correct" if corr else "❌ Err"
-                    utils.save_to_history({"Date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Spot": sp, "Hand": f"{h_val}", "Result": int(corr), "CorrectAction": correct_act})
-                    st.session_state.srs_mode = True; st.rerun()
+                st.button("RAISE", key="r", use_container_width=True, on_click=utils.answer_click, args=(eng, "RAISE", _ON_ANSWER))
                 st.markdown('<script>parent.document.querySelectorAll("div[data-testid=\'column\'] button")[1].classList.add("open-raise-btn");</script>', unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
-    if st.session_state.srs_mode:
+@st.fragment(key="m_feedback")
+def feedback(eng, ranges_db):
+    deal = eng.deal()
+    if eng.graded is not None:
+        src, sc, sp = deal["spot_key"].split('|')
+        data = ranges_db[src][sc][sp]
         if st.session_state.last_error:
             st.error(st.session_state.msg)
-            with st.expander(f"Show Range ({correct_act})", expanded=True):
-                st.markdown(utils.render_range_matrix(data, st.session_state.hand), unsafe_allow_html=True)
+            with st.expander(f"Show Range ({deal['correct']})", expanded=True):
+                st.markdown(utils.render_range_matrix(data, deal["hand"], deal["spot_key"]), unsafe_allow_html=True)
         else:
             st.success(st.session_state.msg)
-            with st.expander(f"🔍 View Range ({correct_act})", expanded=False):
-                st.markdown(utils.render_range_matrix(data, st.session_state.hand), unsafe_allow_html=True)
-        
+            with st.expander(f"🔍 View Range ({deal['correct']})", expanded=False):
+                st.markdown(utils.render_range_matrix(data, deal["hand"], deal["spot_key"]), unsafe_allow_html=True)
+
         st.markdown('<div class="mobile-controls srs-container">', unsafe_allow_html=True)
         s1, s2, s3 = st.columns(3)
-        k = f"{src}_{sc}_{sp}".replace(" ","_")
-        if s1.button("HARD", use_container_width=True): utils.update_srs_smart(k, st.session_state.hand, 'hard'); st.session_state.hand = None; st.rerun()
-        if s2.button("NORM", use_container_width=True): utils.update_srs_smart(k, st.session_state.hand, 'normal'); st.session_state.hand = None; st.rerun()
-        if s3.button("EASY", use_container_width=True): utils.update_srs_smart(k, st.session_state.hand, 'easy'); st.session_state.hand = None; st.rerun()
+        s1.button("HARD", use_container_width=True, on_click=utils.rate_click, args=(eng, 'hard', _ON_RATE))
+        s2.button("NORM", use_container_width=True, on_click=utils.rate_click, args=(eng, 'normal', _ON_RATE))
+        s3.button("EASY", use_container_width=True, on_click=utils.rate_click, args=(eng, 'easy', _ON_RATE))
         st.markdown('</div>', unsafe_allow_html=True)
+
+    # Последний фрагмент любого клика - заготавливаем следующие раздачи
+    eng.refill()
@@ -6,45 +6,37 @@ import utils
 def show():
     st.markdown("## 📊 Statistics Hub")
     
-    df = utils.load_history()
+    # Список спотов и все цифры берём из агрегатов (спот, рука, день) - сырой лог не сканируем
+    unique_spots = utils.load_stats_spots()
     
-    # Проверка на пустую таблицу или отсутствие нужных колонок
-    if df.empty or "Date" not in df.columns or "Result" not in df.columns:
-        st.info("История пуста. Иди тренируйся, Начальник!")
-        return
-
-    # ЖЕСТКАЯ КОНВЕРТАЦИЯ (Гугл отдает всё строками, нам нужны числа и даты)
-    df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
-    df = df.dropna(subset=["Date"]) # Выкидываем битые строки, если они как-то попали в лог
-    df["Result"] = pd.to_numeric(df["Result"], errors='coerce').fillna(0).astype(int)
-    
-    if df.empty:
+    if not unique_spots:
         st.info("История пуста. Иди тренируйся, Начальник!")
         return
 
     with st.expander("🔍 Фильтры", expanded=True):
         c1, c2, c3 = st.columns(3)
         time_filter = c1.selectbox("Период", ["All Time", "24 Hours", "7 Days", "30 Days", "1 Year"])
-        unique_spots = df["Spot"].unique().tolist()
         spot_filter = c2.multiselect("Споты", unique_spots, default=unique_spots)
         res_filter = c3.selectbox("Результат", ["Все", "Только Ошибки", "Только Верные"])
 
     now = datetime.now()
-    if time_filter == "24 Hours": df = df[df["Date"] >= now - timedelta(days=1)]
-    elif time_filter == "7 Days": df = df[df["Date"] >= now - timedelta(days=7)]
-    elif time_filter == "30 Days": df = df[df["Date"] >= now - timedelta(days=30)]
-    elif time_filter == "1 Year": df = df[df["Date"] >= now - timedelta(days=365)]
-        
-    if spot_filter: df = df[df["Spot"].isin(spot_filter)]
-    if res_filter == "Только Ошибки": df = df[df["Result"] == 0]
-    elif res_filter == "Только Верные": df = df[df["Result"] == 1]
+    days = {"24 Hours": 1, "7 Days": 7, "30 Days": 30, "1 Year": 365}.get(time_filter)
+    since = (now - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S") if days else None
+    spots = spot_filter if spot_filter else None
+    res_value = {"Только Ошибки": 0, "Только Верные": 1}.get(res_filter)
+
+    rows = []
+    for spot, (total, correct) in utils.load_spot_stats(since, spots).items():
+        if res_filter == "Только Ошибки": total, correct = total - correct, 0
+        elif res_filter == "Только Верные": total = correct
+        if total > 0: rows.append((spot, total, correct))
 
-    if df.empty:
+    if not rows:
         st.warning("Нет данных по выбранным фильтрам.")
         return
 
-    total_hands = len(df)
-    correct_hands = df["Result"].sum()
+    total_hands = sum(r[1] for r in rows)
+    correct_hands = sum(r[2] for r in rows)
     accuracy = int((correct_hands / total_hands) * 100) if total_hands > 0 else 0
 
     st.markdown("### Общая сводка")
@@ -56,18 +48,15 @@ def show():
     st.divider()
 
     st.markdown("### 📉 Худшие споты")
-    if not df.empty:
-        stats = df.groupby("Spot")["Result"].agg(['count', 'sum', 'mean']).reset_index()
-        stats["Errors"] = stats["count"] - stats["sum"]
-        stats["Accuracy"] = (stats["mean"] * 100).astype(int)
-        worst = stats.sort_values(by="Errors", ascending=False).head(10)
-        st.dataframe(worst[["Spot", "Errors", "Accuracy", "count"]].rename(columns={"count": "Total"}), use_container_width=True, hide_index=True)
+    stats = pd.DataFrame(rows, columns=["Spot", "count", "sum"])
+    stats["Errors"] = stats["count"] - stats["sum"]
+    stats["Accuracy"] = (stats["sum"] * 100 // stats["count"]).astype(int)
+    worst = stats.sort_values(by="Errors", ascending=False).head(10)
+    st.dataframe(worst[["Spot", "Errors", "Accuracy", "count"]].rename(columns={"count": "Total"}), use_container_width=True, hide_index=True)
 
-    with st.expander("📜 Полный лог (нажми, чтобы открыть)"):
-        d = df.copy()
-        d["Result"] = d["Result"].apply(lambda x: "✅" if x==1 else "❌")
-        d = d.sort_values("Date", ascending=False)
-        d["Date"] = d["Date"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    with st.expander("📜 Полный лог (последние 1000, нажми, чтобы открыть)"):
+        d = utils.load_history_log(since, spots, res_value)
+        d["Result"] = d["Result"].apply(lambda x: "✅" if x in ("1", "1.0") else "❌")
         st.dataframe(d[["Date", "Spot", "Hand", "CorrectAction", "Result"]], use_container_width=True, hide_index=True)
 
     st.divider()